@@ -0,0 +1,393 @@
+import argparse
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+
+import zstandard
+from sqlalchemy import bindparam, create_engine, text
+
+import metrics
+
+engine = create_engine("sqlite:///data/db/news.db")
+
+# Article text lives outside news_items: news_bodies(news_id, dict_id,
+# raw_len, body) holds each body as a zstd frame, compressed with the newest
+# shared dictionary in article_dicts (dict_id 0 = no dictionary; otherwise
+# the dictionary's own zstd id). news_items.body stays in the schema for old
+# writers but is NULL once ensure() has moved the text out, so the scans the
+# game and pipeline run over news_items never page through article text.
+#
+# The full-text index news_fts is contentless (the text is not stored a
+# second time). SQLite can not decompress, so the news_items triggers only
+# queue the change in fts_pending, with the values the index holds for that
+# row. sync() then applies the queue from Python: it removes the old entry
+# and indexes the current headline and body. put() and ensure() call it,
+# so writers that go through them never leave the index behind.
+LEVEL = 9
+DICT_SIZE = 64 * 1024
+DICT_SAMPLES = 20_000      # bodies sampled to train a dictionary
+DICT_MIN_SAMPLES = 1_000   # below this a dictionary does not pay for itself
+CHUNK = 500                # ids per IN (...) lookup
+BULK_ROWS = 20_000         # rows per step when moving or re-indexing everything
+
+FTS_TABLE = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS news_fts USING fts5(
+      headline, body, symbol_id, source,
+      content='',
+      tokenize='porter unicode61'
+    )
+"""
+# AFTER INSERT: not indexed yet. AFTER UPDATE/DELETE: the index holds the old
+# values -- unless the row is already queued, in which case the queued
+# values are still the indexed ones (OR IGNORE keeps them).
+FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS news_fts_ai AFTER INSERT ON news_items BEGIN
+      INSERT OR IGNORE INTO fts_pending(news_id, indexed) VALUES (new.id, 0);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS news_fts_ad AFTER DELETE ON news_items BEGIN
+      INSERT OR IGNORE INTO fts_pending(news_id, indexed, headline, symbol_id, source)
+      VALUES (old.id, 1, old.headline, old.symbol_id, old.source);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS news_fts_au AFTER UPDATE OF headline, symbol_id, source ON news_items BEGIN
+      INSERT OR IGNORE INTO fts_pending(news_id, indexed, headline, symbol_id, source)
+      VALUES (old.id, 1, old.headline, old.symbol_id, old.source);
+    END
+    """,
+]
+FTS_INSERT = text("INSERT INTO news_fts(rowid, headline, body, symbol_id, source) VALUES (:id, :h, :b, :sid, :src)")
+FTS_DELETE = text("""
+    INSERT INTO news_fts(news_fts, rowid, headline, body, symbol_id, source)
+    VALUES ('delete', :id, :h, :b, :sid, :src)
+""")
+
+_cctx: Dict[int, zstandard.ZstdCompressor] = {}
+_dctx: Dict[int, zstandard.ZstdDecompressor] = {}
+
+
+def _in(sql: str):
+    return text(sql).bindparams(bindparam("ids", expanding=True))
+
+
+def _chunks(ids: List[int]) -> Iterable[List[int]]:
+    for i in range(0, len(ids), CHUNK):
+        yield ids[i:i + CHUNK]
+
+
+# ---- compression ----
+def _dict(conn, dict_id: int) -> Optional[zstandard.ZstdCompressionDict]:
+    if not dict_id:
+        return None
+    data = conn.execute(text("SELECT data FROM article_dicts WHERE id = :id"), {"id": dict_id}).scalar()
+    if data is None:
+        raise KeyError(f"article_dicts has no dictionary {dict_id}")
+    return zstandard.ZstdCompressionDict(bytes(data))
+
+
+def _decompressor(conn, dict_id: int) -> zstandard.ZstdDecompressor:
+    d = _dctx.get(dict_id)
+    if d is None:
+        zd = _dict(conn, dict_id)
+        d = _dctx[dict_id] = zstandard.ZstdDecompressor(dict_data=zd) if zd else zstandard.ZstdDecompressor()
+    return d
+
+
+def current_dict(conn) -> int:
+    return int(conn.execute(text(
+        "SELECT COALESCE((SELECT id FROM article_dicts ORDER BY created_at DESC LIMIT 1), 0)")).scalar())
+
+
+def compressor(conn, dict_id: Optional[int] = None):
+    """(dict_id, ZstdCompressor) -- the newest dictionary unless one is given."""
+    dict_id = current_dict(conn) if dict_id is None else dict_id
+    c = _cctx.get(dict_id)
+    if c is None:
+        zd = _dict(conn, dict_id)
+        c = _cctx[dict_id] = zstandard.ZstdCompressor(level=LEVEL, dict_data=zd) if zd else zstandard.ZstdCompressor(level=LEVEL)
+    return dict_id, c
+
+
+def get_many(conn, ids: Iterable[int]) -> Dict[int, str]:
+    """{news_id: body} for the ids that have one, decompressed in bulk."""
+    ids = [int(i) for i in ids]
+    out: Dict[int, str] = {}
+    q = _in("SELECT news_id, dict_id, body FROM news_bodies WHERE news_id IN :ids")
+    with metrics.timer("articles.get_many"):
+        for part in _chunks(ids):
+            for nid, dict_id, blob in conn.execute(q, {"ids": part}):
+                out[int(nid)] = _decompressor(conn, int(dict_id)).decompress(blob).decode("utf-8")
+    metrics.count("articles.decompressed", len(out))
+    return out
+
+
+def _write_blobs(conn, bodies: Dict[int, str]) -> None:
+    """Store bodies as-is (no index bookkeeping); empty text removes the row."""
+    dict_id, c = compressor(conn)
+    rows, empty = [], []
+    with metrics.timer("articles.compress"):
+        for nid, s in bodies.items():
+            if not s:
+                empty.append(int(nid))
+                continue
+            raw = s.encode("utf-8")
+            rows.append({"id": int(nid), "d": dict_id, "n": len(raw), "b": c.compress(raw)})
+    if rows:
+        conn.execute(text("INSERT OR REPLACE INTO news_bodies(news_id, dict_id, raw_len, body) VALUES (:id, :d, :n, :b)"), rows)
+    for part in _chunks(empty):
+        conn.execute(_in("DELETE FROM news_bodies WHERE news_id IN :ids"), {"ids": part})
+
+
+# ---- writes that keep news_fts in step ----
+def put(conn, bodies: Dict[int, str]) -> int:
+    """
+    Set article bodies ({news_id: text}); unchanged ones are skipped. The
+    old entry of each changed row leaves news_fts while its old text is at
+    hand, and the row is re-indexed by sync(). Returns rows changed.
+    """
+    old = get_many(conn, bodies)
+    changed = {int(i): (s or "") for i, s in bodies.items() if (s or "") != old.get(int(i), "")}
+    if changed:
+        _replace(conn, changed, old)
+    sync(conn)   # also picks up rows inserted without a body
+    return len(changed)
+
+
+def _replace(conn, changed: Dict[int, str], old: Dict[int, str]) -> None:
+    ids = list(changed)
+    queued = {}
+    current = {}
+    for part in _chunks(ids):
+        for r in conn.execute(_in("SELECT news_id, indexed, headline, symbol_id, source FROM fts_pending WHERE news_id IN :ids"),
+                              {"ids": part}):
+            queued[int(r[0])] = r
+        for r in conn.execute(_in("SELECT id, headline, symbol_id, source FROM news_items WHERE id IN :ids"), {"ids": part}):
+            current[int(r[0])] = r
+    gone = []
+    for nid in ids:
+        if nid in queued:
+            src = queued[nid][2:] if queued[nid][1] else None   # queued: the index holds the queued values, if any
+        else:
+            src = current[nid][1:] if nid in current else None  # otherwise the current ones
+        if src is not None:
+            gone.append({"id": nid, "h": src[0], "b": old.get(nid, ""), "sid": src[1], "src": src[2]})
+    if gone:
+        conn.execute(FTS_DELETE, gone)
+    conn.execute(text("INSERT OR REPLACE INTO fts_pending(news_id, indexed) VALUES (:id, 0)"), [{"id": i} for i in ids])
+    _write_blobs(conn, changed)
+
+
+def sync(conn) -> int:
+    """Apply fts_pending: drop stale index entries, index current rows, drop bodies of deleted rows."""
+    pending = conn.execute(text("SELECT news_id, indexed, headline, symbol_id, source FROM fts_pending")).fetchall()
+    if not pending:
+        return 0
+    ids = [int(r[0]) for r in pending]
+    with metrics.timer("articles.fts_sync"):
+        bodies = get_many(conn, ids)
+        stale = [{"id": int(r[0]), "h": r[2], "b": bodies.get(int(r[0]), ""), "sid": r[3], "src": r[4]}
+                 for r in pending if r[1]]
+        if stale:
+            conn.execute(FTS_DELETE, stale)
+        live = []
+        for part in _chunks(ids):
+            live += conn.execute(_in("SELECT id, headline, symbol_id, source FROM news_items WHERE id IN :ids"),
+                                 {"ids": part}).fetchall()
+        if live:
+            conn.execute(FTS_INSERT, [{"id": int(r[0]), "h": r[1], "b": bodies.get(int(r[0]), ""), "sid": r[2], "src": r[3]}
+                                      for r in live])
+        dead = sorted(set(ids) - {int(r[0]) for r in live})
+        for part in _chunks(ids):
+            conn.execute(_in("DELETE FROM fts_pending WHERE news_id IN :ids"), {"ids": part})
+        for part in _chunks(dead):
+            conn.execute(_in("DELETE FROM news_bodies WHERE news_id IN :ids"), {"ids": part})
+    return len(ids)
+
+
+def reindex(conn) -> int:
+    """Rebuild news_fts from news_items + news_bodies."""
+    conn.execute(text("INSERT INTO news_fts(news_fts) VALUES ('delete-all')"))
+    conn.execute(text("DELETE FROM fts_pending"))
+    n, last = 0, 0
+    while True:
+        rows = conn.execute(text("""
+            SELECT id, headline, symbol_id, source FROM news_items WHERE id > :last ORDER BY id LIMIT :lim
+        """), {"last": last, "lim": BULK_ROWS}).fetchall()
+        if not rows:
+            break
+        bodies = get_many(conn, [r[0] for r in rows])
+        conn.execute(FTS_INSERT, [{"id": int(r[0]), "h": r[1], "b": bodies.get(int(r[0]), ""), "sid": r[2], "src": r[3]}
+                                  for r in rows])
+        n += len(rows)
+        last = int(rows[-1][0])
+    conn.execute(text("INSERT INTO news_fts(news_fts) VALUES ('optimize')"))
+    return n
+
+
+# ---- dictionaries ----
+def train_dict(conn, size: int = DICT_SIZE, samples: int = DICT_SAMPLES, seed: int = 7) -> Optional[int]:
+    """
+    Train a shared dictionary on a random sample of bodies (stored or still
+    in news_items.body) and make it the one new bodies use. None if there
+    are too few bodies to train on.
+    """
+    stored = {int(r[0]) for r in conn.execute(text("SELECT news_id FROM news_bodies"))}
+    plain = [int(r[0]) for r in conn.execute(text("SELECT id FROM news_items WHERE COALESCE(body, '') != ''"))]
+    pool = sorted(stored) + [i for i in plain if i not in stored]
+    pick = random.Random(seed).sample(pool, min(samples, len(pool)))
+    if len(pick) < DICT_MIN_SAMPLES:
+        return None
+    texts = list(get_many(conn, [i for i in pick if i in stored]).values())
+    for part in _chunks([i for i in pick if i not in stored]):
+        texts += [r[0] for r in conn.execute(_in("SELECT body FROM news_items WHERE id IN :ids"), {"ids": part})]
+    with metrics.timer("articles.train_dict"):
+        zd = zstandard.train_dictionary(size, [t.encode("utf-8") for t in texts if t], level=LEVEL)
+    conn.execute(text("INSERT OR REPLACE INTO article_dicts(id, created_at, samples, size, data) VALUES (:id, :ts, :n, :sz, :d)"),
+                 {"id": zd.dict_id(), "ts": time.time(), "n": len(texts), "sz": len(zd.as_bytes()), "d": zd.as_bytes()})
+    return zd.dict_id()
+
+
+def recompress(conn) -> int:
+    """Re-encode every stored body with the current dictionary (text and index unchanged)."""
+    dict_id = current_dict(conn)
+    n, last = 0, 0
+    while True:
+        ids = [int(r[0]) for r in conn.execute(text("""
+            SELECT news_id FROM news_bodies WHERE news_id > :last AND dict_id != :d ORDER BY news_id LIMIT :lim
+        """), {"last": last, "d": dict_id, "lim": BULK_ROWS})]
+        if not ids:
+            break
+        _write_blobs(conn, get_many(conn, ids))
+        n += len(ids)
+        last = ids[-1]
+    return n
+
+
+# ---- schema / migration ----
+def ensure(conn) -> dict:
+    """
+    Bring a DB up to date: create news_fts and its triggers (replacing the
+    older index that read body from news_items), move any text still in
+    news_items.body into news_bodies -- training a dictionary first when
+    there is enough of it -- and apply queued index changes. Idempotent.
+    """
+    stats = {"moved": 0, "indexed": 0}
+    old = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'news_fts'")).scalar()
+    fresh = old is None
+    if old is not None and "content=''" not in old.replace('"', "'").replace(" ", ""):
+        for t in ("news_fts_ai", "news_fts_ad", "news_fts_au"):
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {t}"))
+        conn.execute(text("DROP TABLE news_fts"))
+        fresh = True
+    conn.execute(text(FTS_TABLE))
+    for s in FTS_TRIGGERS:
+        conn.execute(text(s))
+
+    if conn.execute(text("SELECT 1 FROM news_items WHERE COALESCE(body, '') != '' LIMIT 1")).fetchone():
+        if not current_dict(conn):
+            try:
+                train_dict(conn)
+            except zstandard.ZstdError as e:   # e.g. bodies too alike or too short
+                print(f"article_store: no dictionary ({e}); compressing without one")
+        last = 0
+        while True:
+            rows = conn.execute(text("""
+                SELECT id, body FROM news_items WHERE id > :last AND body IS NOT NULL ORDER BY id LIMIT :lim
+            """), {"last": last, "lim": BULK_ROWS}).fetchall()
+            if not rows:
+                break
+            if fresh:
+                _write_blobs(conn, {int(r[0]): r[1] for r in rows})
+            else:
+                # the live index saw these rows with an empty body
+                _replace(conn, {int(r[0]): r[1] for r in rows}, get_many(conn, [r[0] for r in rows]))
+            ids = [int(r[0]) for r in rows]
+            for part in _chunks(ids):
+                conn.execute(_in("UPDATE news_items SET body = NULL WHERE id IN :ids"), {"ids": part})
+            stats["moved"] += len(rows)
+            last = ids[-1]
+
+    if fresh:
+        stats["indexed"] = reindex(conn)
+    else:
+        stats["indexed"] = sync(conn)
+    return stats
+
+
+def stats(conn) -> dict:
+    n, raw, packed = conn.execute(text(
+        "SELECT COUNT(*), COALESCE(SUM(raw_len), 0), COALESCE(SUM(LENGTH(body)), 0) FROM news_bodies")).fetchone()
+    plain = conn.execute(text("SELECT COUNT(*) FROM news_items WHERE COALESCE(body, '') != ''")).scalar()
+    dicts = conn.execute(text("SELECT id, created_at, samples, size FROM article_dicts ORDER BY created_at")).fetchall()
+    per_dict = dict(conn.execute(text("SELECT dict_id, COUNT(*) FROM news_bodies GROUP BY dict_id")).fetchall())
+    return {"bodies": n, "raw_bytes": raw, "stored_bytes": packed, "ratio": raw / packed if packed else 0.0,
+            "plain_in_news_items": plain, "pending_index": conn.execute(text("SELECT COUNT(*) FROM fts_pending")).scalar(),
+            "dicts": [{"id": d[0], "created_at": d[1], "samples": d[2], "size": d[3], "bodies": per_dict.get(d[0], 0)}
+                      for d in dicts],
+            "no_dict_bodies": per_dict.get(0, 0)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compressed article bodies (news_bodies) and the news_fts index over them.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("migrate", help="move news_items.body into news_bodies and rebuild news_fts (idempotent)")
+    p.add_argument("--vacuum", action="store_true", help="VACUUM afterwards so the file actually shrinks")
+    sub.add_parser("stats", help="sizes and compression ratio")
+    p = sub.add_parser("train-dict", help="train a new shared dictionary from stored bodies")
+    p.add_argument("--size", type=int, default=DICT_SIZE)
+    p.add_argument("--recompress", action="store_true", help="re-encode existing bodies with it")
+    sub.add_parser("sync", help="apply queued index changes")
+    sub.add_parser("reindex", help="rebuild news_fts from scratch")
+    p = sub.add_parser("show", help="print stored bodies")
+    p.add_argument("ids", type=int, nargs="+")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    if args.cmd == "show":
+        with engine.begin() as conn:
+            bodies = get_many(conn, args.ids)
+        for i in args.ids:
+            print(f"--- {i}\n{bodies.get(i, '(no body)')}")
+        return
+    if args.cmd == "stats":
+        with engine.begin() as conn:
+            s = stats(conn)
+        print(f"{s['bodies']:,} bodies: {s['raw_bytes'] / 1e6:.1f} MB -> {s['stored_bytes'] / 1e6:.1f} MB "
+              f"(x{s['ratio']:.1f}); {s['no_dict_bodies']:,} without a dictionary; "
+              f"{s['plain_in_news_items']:,} still in news_items.body; {s['pending_index']:,} queued for news_fts")
+        for d in s["dicts"]:
+            when = time.strftime("%Y-%m-%d %H:%M", time.localtime(d["created_at"]))
+            print(f"  dict {d['id']}: {d['size'] / 1024:.0f} KiB from {d['samples']:,} samples, {when}, {d['bodies']:,} bodies")
+        return
+
+    with engine.begin() as conn:
+        if args.cmd == "migrate":
+            from init_db import DDL   # the new tables; imported here since init_db imports this module
+            for s in (x.strip() for x in DDL.split(";")):
+                if s:
+                    conn.execute(text(s))
+            s = ensure(conn)
+            print(f"Moved {s['moved']:,} bodies, indexed {s['indexed']:,} rows")
+        elif args.cmd == "train-dict":
+            dict_id = train_dict(conn, size=args.size)
+            if dict_id is None:
+                raise SystemExit(f"Fewer than {DICT_MIN_SAMPLES} bodies; not training a dictionary.")
+            print(f"Trained dictionary {dict_id}")
+            if args.recompress:
+                print(f"Re-encoded {recompress(conn):,} bodies")
+        elif args.cmd == "sync":
+            print(f"Applied {sync(conn):,} queued index changes")
+        elif args.cmd == "reindex":
+            print(f"Indexed {reindex(conn):,} rows")
+    if args.cmd == "migrate" and args.vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        print("Vacuumed.")
+    print(f"done in {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
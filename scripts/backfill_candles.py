@@ -1,8 +1,9 @@
+import io
 import time
 from datetime import datetime, timezone
 import pandas as pd
-from pandas_datareader import data as pdr
 from sqlalchemy import create_engine, text
+import http_cache
 
 engine = create_engine("sqlite:///data/db/news.db")
 
@@ -15,10 +16,21 @@ def get_symbols():
     with engine.begin() as conn:
         return conn.execute(text("SELECT id, symbol FROM symbols")).fetchall()
 
-def fetch_daily_stooq(symbol: str, start="2024-01-01"):
-    # Stooq uses e.g. "aapl.us"
-    stooq_symbol = f"{symbol.lower()}.us"
-    df = pdr.DataReader(stooq_symbol, "stooq", start=start)
+STOOQ_URL = "https://stooq.com/q/d/l/"
+
+def fetch_daily_stooq(stooq_symbol: str, start="2024-01-01"):
+    # the same CSV download pandas_datareader's "stooq" reader makes, through the response cache
+    params = {
+        "s": stooq_symbol,
+        "i": "d",
+        "d1": start.replace("-", ""),
+        "d2": time.strftime("%Y%m%d", time.gmtime()),
+    }
+    # d2 is always today: key on symbol and start only, the endpoint TTL handles freshness
+    body = http_cache.get_text("stooq.daily", STOOQ_URL, params, volatile=("d2",))
+    if not body.startswith("Date"):
+        raise ValueError(body.strip()[:80] or "empty response")  # e.g. "No data"
+    df = pd.read_csv(io.StringIO(body), parse_dates=["Date"], index_col="Date")
     # df index is date, columns: Open High Low Close Volume
     df = df.sort_index()
     return df
@@ -33,7 +45,7 @@ def main():
             stooq_sym = f"{sym.lower()}.us"
 
         try:
-            df = pdr.DataReader(stooq_sym, "stooq", start="2024-01-01").sort_index()
+            df = fetch_daily_stooq(stooq_sym, start="2024-01-01")
         except Exception as e:
             print("FAILED", sym, e)
             continue
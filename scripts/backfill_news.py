@@ -1,10 +1,57 @@
-import os, time, requests
-from sqlalchemy import create_engine, text
+import os, time
+from sqlalchemy import bindparam, create_engine, text
 from tqdm import tqdm
+from init_db import ensure_provider_key
+import article_store
+import http_cache
 
 TOKEN = os.getenv("FINNHUB_TOKEN")
+PROVIDER = "finnhub"
+SETTLED_DAYS = 3  # provider responses for windows older than this are cached with no expiry
 engine = create_engine("sqlite:///data/db/news.db")
 
+# idempotent: re-running an overlapping window updates rows in place instead
+# of duplicating them (needs the unique index from init_db.py). The key is
+# (provider, provider_id, symbol_id): an article returned for several symbols
+# gets one row per symbol, so each keeps its own features and labels.
+# The body is not part of the row: put_bodies() stores it compressed
+# (article_store.py) once the upsert has given the article an id.
+UPSERT = text("""
+    INSERT INTO news_items(provider, provider_id, symbol_id, sector_id, headline, source, url, published_at, ingested_at)
+    VALUES(:prov,:pid,:sid,NULL,:h,:src,:url,:pub,:ing)
+    ON CONFLICT(provider, provider_id, symbol_id) DO UPDATE SET
+        headline = excluded.headline,
+        source = excluded.source,
+        url = excluded.url,
+        published_at = excluded.published_at
+    WHERE news_items.headline IS NOT excluded.headline
+       OR news_items.source IS NOT excluded.source
+       OR news_items.url IS NOT excluded.url
+       OR news_items.published_at IS NOT excluded.published_at
+""")
+
+ID_LOOKUP = text("SELECT provider_id, symbol_id, id FROM news_items WHERE provider = :prov AND provider_id IN :pids") \
+    .bindparams(bindparam("pids", expanding=True))
+
+def provider_id(it):
+    """Dedupe id of a Finnhub-shaped item: its id, else its url; None when it has neither."""
+    pid = it.get("id") or it.get("url")
+    return str(pid) if pid else None
+
+def put_bodies(conn, rows):
+    """Store the bodies of just-upserted UPSERT rows (unchanged ones are skipped)."""
+    by_prov = {}
+    for r in rows:
+        by_prov.setdefault(r["prov"], {})[(r["pid"], r["sid"])] = r["b"]
+    bodies = {}
+    for prov, texts in by_prov.items():
+        pids = sorted({pid for pid, _ in texts})
+        for i in range(0, len(pids), article_store.CHUNK):
+            for pid, sid, nid in conn.execute(ID_LOOKUP, {"prov": prov, "pids": pids[i:i + article_store.CHUNK]}):
+                if (pid, sid) in texts:
+                    bodies[int(nid)] = texts[(pid, sid)]
+    return article_store.put(conn, bodies)
+
 def get_symbols():
     with engine.begin() as conn:
         rows = conn.execute(text("SELECT id, symbol FROM symbols WHERE symbol != 'SPY'")).fetchall()
@@ -12,37 +59,54 @@ def get_symbols():
 
 def fetch_company_news(symbol, _from, to):
     url = "https://finnhub.io/api/v1/company-news"
-    r = requests.get(url, params={"symbol": symbol, "from": _from, "to": to, "token": TOKEN}, timeout=30)
-    r.raise_for_status()
-    return r.json()
+    # a window that closed a few days ago will not change: keep it for good
+    closed = time.time() - time.mktime(time.strptime(to, "%Y-%m-%d")) > SETTLED_DAYS * 86400
+    return http_cache.get_json("finnhub.company-news", url,
+                               {"symbol": symbol, "from": _from, "to": to, "token": TOKEN},
+                               ttl=http_cache.FOREVER if closed else None)
 
 def main():
     # backfill window (YYYY-MM-DD)
     _from = "2025-10-01"
     to = "2025-12-30"
 
+    with engine.begin() as conn:
+        if not ensure_provider_key(conn):
+            raise SystemExit("news_items has duplicate articles; run compact_news.py first.")
+
     syms = get_symbols()
     now = int(time.time())
+    with engine.begin() as conn:
+        n0 = conn.execute(text("SELECT COUNT(*) FROM news_items")).scalar()
 
     for symbol_id, sym in tqdm(syms):
-        items = fetch_company_news(sym, _from, to)
-        with engine.begin() as conn:
-            for it in items:
-                conn.execute(text("""
-                    INSERT INTO news_items(provider_id, symbol_id, sector_id, headline, body, source, url, published_at, ingested_at)
-                    VALUES(:pid,:sid,NULL,:h,:b,:src,:url,:pub,:ing)
-                """), {
-                    "pid": str(it.get("id") or it.get("url")),
-                    "sid": symbol_id,
-                    "h": it.get("headline"),
-                    "b": it.get("summary") or it.get("text") or "",
-                    "src": it.get("source"),
-                    "url": it.get("url"),
-                    "pub": int(it.get("datetime", 0)),
-                    "ing": now
-                })
-        time.sleep(0.3)  # be nice to rate limits
-    print("Done backfill news.")
+        try:
+            items = fetch_company_news(sym, _from, to)
+        except http_cache.CacheMiss as e:
+            print("OFFLINE, not cached:", e)
+            continue
+        rows = [{
+            "prov": PROVIDER,
+            "pid": provider_id(it),
+            "sid": symbol_id,
+            "h": it.get("headline"),
+            "b": it.get("summary") or it.get("text") or "",
+            "src": it.get("source"),
+            "url": it.get("url"),
+            "pub": int(it.get("datetime", 0)),
+            "ing": now
+        } for it in items if provider_id(it)]   # no id and no url: nothing to dedupe on
+        if rows:
+            # one executemany per symbol
+            with engine.begin() as conn:
+                conn.execute(UPSERT, rows)
+                put_bodies(conn, rows)
+        if not http_cache.last_hit:
+            time.sleep(0.3)  # be nice to rate limits (replays from the cache skip it)
+
+    with engine.begin() as conn:
+        n1 = conn.execute(text("SELECT COUNT(*) FROM news_items")).scalar()
+    print(f"Done backfill news. {n1 - n0} new items.")
 
 if __name__ == "__main__":
     main()
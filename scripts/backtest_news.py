@@ -0,0 +1,203 @@
+import argparse
+import time
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from intraday_store import IntradayStore
+
+engine = create_engine("sqlite:///data/db/news.db")
+
+# price_candles.ts is the UTC midnight of the session; its close prints at
+# ~20:00 UTC, so a headline can only trade on closes after that time
+CLOSE_OFFSET_SEC = 20 * 3600
+HORIZONS = (1, 2, 3, 5, 10, 20)   # holding period in sessions
+COST_BPS = 5.0                    # round-trip cost per unit notional
+TS_SPAN = 1 << 40                 # > any unix ts; packs (symbol_id, ts) into one sortable key
+
+
+def load_predictions() -> pd.DataFrame:
+    with engine.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT n.id, n.symbol_id, n.source, n.published_at, p.direction, p.impact_score
+            FROM news_predictions p
+            JOIN news_items n ON n.id = p.news_id
+            WHERE n.symbol_id IS NOT NULL AND n.published_at > 0 AND p.direction != 0
+        """)).fetchall()
+    return pd.DataFrame(rows, columns=["news_id", "symbol_id", "source", "published_at", "direction", "impact"])
+
+
+def load_candles():
+    """(symbol_id, ts, close) as NumPy arrays sorted by (symbol_id, ts)."""
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT symbol_id, ts, close FROM price_candles ORDER BY symbol_id, ts")).fetchall()
+    if not rows:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0)
+    a = np.array(rows, dtype=float)
+    return a[:, 0].astype(np.int64), a[:, 1].astype(np.int64), a[:, 2]
+
+
+def forward_returns(sym_c, ts_c, close, sym_n, pub_n, horizons: Sequence[int]) -> np.ndarray:
+    """
+    Log return from the first close after each headline to the close
+    `h` sessions later, for every horizon at once: shape (n_news, n_h),
+    NaN where the symbol has no such candles. One searchsorted over packed
+    (symbol_id, ts) keys does the as-of join for all symbols.
+    """
+    key_c = sym_c * TS_SPAN + ts_c
+    key_n = sym_n * TS_SPAN + (pub_n - CLOSE_OFFSET_SEC)
+    entry = np.searchsorted(key_c, key_n, side="right")
+
+    n_c = len(close)
+    h = np.asarray(horizons, dtype=np.int64)
+    exit_ = entry[:, None] + h[None, :]
+    e_ok = entry < n_c
+    e_idx = np.where(e_ok, entry, 0)
+    x_ok = exit_ < n_c
+    x_idx = np.where(x_ok, exit_, 0)
+    valid = (e_ok & (sym_c[e_idx] == sym_n))[:, None] & x_ok & (sym_c[x_idx] == sym_n[:, None])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.log(close[x_idx] / close[e_idx][:, None])
+    return np.where(valid, r, np.nan)
+
+
+def intraday_forward_returns(store: IntradayStore, symbols: np.ndarray, pub_n: np.ndarray, minutes: Sequence[int]) -> np.ndarray:
+    """Same shape as forward_returns(), from minute bars; horizons are minutes."""
+    r = np.full((len(pub_n), len(minutes)), np.nan)
+    for s in pd.unique(symbols):
+        sel = np.flatnonzero(symbols == s)
+        r[sel] = store.forward_returns(s, pub_n[sel], minutes)
+    return r
+
+
+def sweep(impact: np.ndarray, signed_r: np.ndarray, thresholds: np.ndarray, n_days: float,
+          horizons: Sequence[int], cost: float) -> pd.DataFrame:
+    """
+    Every (threshold, horizon) rule "trade when impact >= threshold, hold h
+    sessions". Trades are sorted by impact once, so each threshold is a
+    prefix and its totals are a cumulative sum lookup -- cost is one pass
+    over the trades regardless of how many thresholds are swept.
+    """
+    order = np.argsort(-impact, kind="stable")
+    imp_sorted = impact[order]
+    r = signed_r[order]
+    ok = ~np.isnan(r)
+    net = np.where(ok, r - cost, 0.0)
+
+    zeros = np.zeros((1, r.shape[1]))
+    c_pnl = np.vstack([zeros, np.cumsum(net, axis=0)])
+    c_n = np.vstack([zeros, np.cumsum(ok, axis=0)])
+    c_hit = np.vstack([zeros, np.cumsum(ok & (net > 0), axis=0)])
+
+    # number of trades with impact >= thr (imp_sorted is descending)
+    k = np.searchsorted(-imp_sorted, -np.asarray(thresholds), side="right")
+    pnl, n, hit = c_pnl[k], c_n[k], c_hit[k]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = pd.DataFrame({
+            "threshold": np.repeat(thresholds, len(horizons)),
+            "horizon": np.tile(horizons, len(thresholds)),
+            "trades": n.ravel().astype(np.int64),
+            "pnl": pnl.ravel(),
+            "mean": (pnl / n).ravel(),
+            "hit_rate": (hit / n).ravel(),
+            "turnover": (n / max(n_days, 1.0)).ravel(),   # round trips per day
+        })
+    return out
+
+
+def breakdown(df: pd.DataFrame, net: np.ndarray, by: str, n_days: float) -> pd.DataFrame:
+    """P&L, hit rate and turnover per group for one rule (net has NaN for no-trade)."""
+    ok = ~np.isnan(net)
+    codes, labels = pd.factorize(df[by])
+    n = np.bincount(codes, weights=ok, minlength=len(labels))
+    pnl = np.bincount(codes, weights=np.where(ok, net, 0.0), minlength=len(labels))
+    hit = np.bincount(codes, weights=ok & (net > 0), minlength=len(labels))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = pd.DataFrame({by: labels, "trades": n.astype(np.int64), "pnl": pnl, "mean": pnl / n,
+                            "hit_rate": hit / n, "turnover": n / max(n_days, 1.0)})
+    return out[out["trades"] > 0].sort_values("pnl", ascending=False)
+
+
+def run(horizons=HORIZONS, thresholds=None, cost_bps: float = COST_BPS,
+        intraday: bool = False) -> Dict[str, pd.DataFrame]:
+    """Daily backtest, or with intraday=True horizons are minutes over the intraday bar store."""
+    preds = load_predictions()
+    if preds.empty:
+        raise SystemExit("Need news_predictions; run score_news.py first.")
+    if not intraday:
+        sym_c, ts_c, close = load_candles()
+        if not len(close):
+            raise SystemExit("Need price_candles; run backfill_candles.py first.")
+    if thresholds is None:
+        thresholds = np.round(np.linspace(0.0, 1.0, 101), 4)
+
+    with engine.begin() as conn:
+        symbols = dict(conn.execute(text("SELECT id, symbol FROM symbols")).fetchall())
+    preds["symbol"] = preds["symbol_id"].map(symbols)
+    preds["source"] = preds["source"].fillna("?")
+
+    pub = preds["published_at"].to_numpy(np.int64)
+    if intraday:
+        r = intraday_forward_returns(IntradayStore(), preds["symbol"].to_numpy(), pub, horizons)
+        # only the days the bar store covers
+        n_days = len(np.unique(pub[np.isfinite(r).any(axis=1)] // 86400))
+    else:
+        r = forward_returns(sym_c, ts_c, close, preds["symbol_id"].to_numpy(np.int64), pub, horizons)
+        n_days = len(np.unique(ts_c))
+    signed = r * preds["direction"].to_numpy(float)[:, None]
+    cost = cost_bps / 1e4
+
+    grid = sweep(preds["impact"].to_numpy(float), signed, thresholds, n_days, horizons, cost)
+
+    # per-symbol / per-source view of the best rule with a meaningful sample
+    enough = grid[grid["trades"] >= max(30, int(0.01 * len(preds)))]
+    best = (enough if len(enough) else grid).sort_values("mean", ascending=False).iloc[0]
+    h_i = list(horizons).index(int(best["horizon"]))
+    take = preds["impact"].to_numpy(float) >= best["threshold"]
+    net = np.where(take, signed[:, h_i] - cost, np.nan)
+    return {
+        "grid": grid,
+        "best": best.to_frame().T,
+        "by_symbol": breakdown(preds, net, "symbol", n_days),
+        "by_source": breakdown(preds, net, "source", n_days),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Vectorized backtest of news_predictions against price_candles.")
+    ap.add_argument("--horizons", default=",".join(map(str, HORIZONS)), help="holding periods in sessions (minutes with --intraday)")
+    ap.add_argument("--intraday", action="store_true", help="use minute bars from intraday_store.py, e.g. --horizons 5,15,60")
+    ap.add_argument("--thresholds", type=int, default=101, help="impact thresholds swept evenly over [0, 1]")
+    ap.add_argument("--cost-bps", type=float, default=COST_BPS)
+    ap.add_argument("--out", default=None, help="write the full grid to this CSV")
+    args = ap.parse_args()
+
+    horizons = tuple(int(h) for h in args.horizons.split(","))
+    t0 = time.perf_counter()
+    res = run(horizons, np.linspace(0.0, 1.0, args.thresholds), args.cost_bps, args.intraday)
+    dt = time.perf_counter() - t0
+
+    grid = res["grid"]
+    print(f"{len(grid)} rules in {dt:.2f}s\n")
+    with pd.option_context("display.width", 160, "display.max_rows", 40, "display.float_format", "{:.5f}".format):
+        print("Top rules by mean P&L per trade:")
+        print(grid[grid["trades"] > 0].sort_values("mean", ascending=False).head(10).to_string(index=False))
+        b = res["best"].iloc[0]
+        unit = "minutes" if args.intraday else "sessions"
+        print(f"\nBest rule: impact >= {b['threshold']:.2f}, hold {int(b['horizon'])} {unit}")
+        print("\nBy symbol:")
+        print(res["by_symbol"].head(20).to_string(index=False))
+        print("\nBy source:")
+        print(res["by_source"].to_string(index=False))
+
+    if args.out:
+        grid.to_csv(args.out, index=False)
+        print(f"\nWrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # draw_candles renders off-screen
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+SEED = 7
+CASE_SEC = 0.5          # target wall time per (benchmark, size) case
+MIN_SAMPLES = 5         # timed calls per case, however slow the op
+REGRESSION_PCT = 10.0   # ops/sec drop vs. baseline that counts as a regression
+
+# name -> (setup(size) -> op, default sizes, size label)
+BENCHES: Dict[str, Tuple[Callable, Tuple[int, ...], str]] = {}
+
+
+def bench(name: str, sizes: Tuple[int, ...], unit: str):
+    """
+    Register a benchmark. The decorated setup(size) builds its fixture from
+    fixed seeds and returns a zero-arg op; the runner only times the op.
+    """
+    def deco(setup):
+        BENCHES[name] = (setup, sizes, unit)
+        return setup
+    return deco
+
+
+# -------------------------
+# engine
+# -------------------------
+def _engine_with_shocks(n: int):
+    from mode_a_engine import ModeAEngine
+
+    # long half-life so the shocks stay live for the whole case
+    eng = ModeAEngine(mid0=200.0, seed=SEED, half_life=1e9)
+    rng = random.Random(SEED)
+    for _ in range(n):
+        eng.add_news(direction=rng.choice((-1, 0, 1)), impact=rng.uniform(0.0, 0.5), now=0.0)
+    return eng
+
+
+@bench("engine.tick", sizes=(0, 10, 200), unit="shocks")
+def _b_tick(n):
+    eng = _engine_with_shocks(n)
+    clock = [0.0]
+
+    def op():
+        clock[0] += eng.dt
+        eng.tick(clock[0])
+    return op
+
+
+@bench("engine.quotes", sizes=(0, 10, 200), unit="shocks")
+def _b_quotes(n):
+    eng = _engine_with_shocks(n)
+    return lambda: eng.quotes(1.0)
+
+
+@bench("engine.buy_sell", sizes=(0, 10, 200), unit="shocks")
+def _b_buy_sell(n):
+    eng = _engine_with_shocks(n)
+
+    def op():
+        eng.buy(qty=1, now=1.0)
+        eng.sell(qty=1, now=1.0)
+    return op
+
+
+@bench("game_engine.tick_update_prices", sizes=(10, 100, 1000), unit="symbols")
+def _b_tick_update_prices(n):
+    import game_engine as ge
+
+    random.seed(SEED)
+    prices = {f"S{i}": 100.0 + i for i in range(n)}
+    sectors = {f"S{i}": f"sec{i % 11}" for i in range(n)}
+    # roughly one live shock per ten names, plus a few sector-wide ones
+    shocks = [ge.Shock(f"S{random.randrange(n)}", None, random.choice((-1, 1)), random.random(), 0)
+              for _ in range(max(1, n // 10))]
+    shocks += [ge.Shock(None, f"sec{k}", random.choice((-1, 1)), random.random(), 0) for k in range(5)]
+    return lambda: ge.tick_update_prices(prices, shocks, now_ts=60, sectors=sectors)
+
+
+# -------------------------
+# UI
+# -------------------------
+@bench("ui.update_candles", sizes=(60, 300, 2000), unit="candles")
+def _b_update_candles(n):
+    import ui_py_game_mode as ui
+    from candle_buffer import CandleRing
+
+    ring = CandleRing(interval_sec=1.0, capacity=n, window=n)
+    rng = np.random.default_rng(SEED)
+    path = (200.0 + np.cumsum(rng.normal(0.0, 0.02, 1 << 16))).tolist()
+    state = [0]
+
+    def op():
+        k = state[0]
+        state[0] = k + 1
+        ui.update_candles(ring, k * 0.05, path[k & 0xFFFF])
+    return op
+
+
+@bench("ui.draw_candles", sizes=(60, 300, 500), unit="candles")
+def _b_draw_candles(n):
+    import pygame
+    import ui_py_game_mode as ui
+    from candle_buffer import CandleRing
+
+    pygame.init()
+    screen = pygame.Surface((1100, 700))
+    rect = pygame.Rect(ui.CHART_RECT)
+    ring = CandleRing(interval_sec=1.0, capacity=n, window=n)
+    rng = np.random.default_rng(SEED)
+    for k, p in enumerate(200.0 + np.cumsum(rng.normal(0.0, 0.02, n * 20))):
+        ring.update(k * 0.05, float(p))
+    return lambda: ui.draw_candles(screen, ring, rect, window=n)
+
+
+# -------------------------
+# DB / pipeline
+# -------------------------
+SOURCES = ("CNBC", "DowJones", "SeekingAlpha", "Reuters")
+DAY = 86400
+
+
+def _make_db(path: str, n: int) -> None:
+    """Synthetic news.db: 2 symbols + SPY, n scored/featured headlines, daily candles."""
+    from init_db import DDL
+
+    eng = create_engine(f"sqlite:///{path}")
+    rng = np.random.default_rng(SEED)
+    t_start = 1_600_000_000 - 1_600_000_000 % DAY
+    n_days = max(3, n // 50 + 2)
+    with eng.begin() as conn:
+        for s in (x.strip() for x in DDL.split(";")):
+            if s:
+                conn.execute(text(s))
+        conn.execute(text("INSERT INTO symbols(id, symbol) VALUES (1,'AMZN'), (2,'AAPL'), (3,'SPY')"))
+        conn.execute(text("INSERT INTO price_candles(symbol_id, ts, close, volume) VALUES (:sid, :ts, :c, 0)"), [
+            {"sid": sid, "ts": t_start + d * DAY, "c": float(100 + sid + rng.normal())}
+            for sid in (1, 2, 3) for d in range(n_days)
+        ])
+        pub = t_start + rng.integers(0, (n_days - 2) * DAY, n)
+        conn.execute(text("""
+            INSERT INTO news_items(id, symbol_id, headline, body, source, published_at)
+            VALUES (:id, :sid, :h, '', :src, :pub)
+        """), [
+            {"id": i + 1, "sid": 1 + i % 2, "h": f"Company {'beats' if i % 3 else 'misses'} estimates {i}",
+             "src": SOURCES[i % len(SOURCES)], "pub": int(pub[i])}
+            for i in range(n)
+        ])
+        conn.execute(text("""
+            INSERT INTO news_features(news_id, p_pos, p_neg, p_neu, sentiment_score, hour, dow)
+            VALUES (:id, 0.5, 0.3, 0.2, 0.2, 14, 2)
+        """), [{"id": i + 1} for i in range(n)])
+        conn.execute(text("""
+            INSERT INTO news_predictions(news_id, predicted_y, impact_score, direction, created_at)
+            VALUES (:id, 0.01, :imp, :d, 0)
+        """), [{"id": i + 1, "imp": float(rng.uniform()), "d": int(rng.choice((-1, 1)))} for i in range(n)])
+    eng.dispose()
+
+
+_TMP_DIRS: List[str] = []
+
+
+def _temp_db(n: int, name: str = "news.db") -> str:
+    d = tempfile.mkdtemp(prefix="bench_db_")
+    _TMP_DIRS.append(d)
+    path = os.path.join(d, name)
+    _make_db(path, n)
+    return path
+
+
+@bench("ui.fetch_scored_pool", sizes=(1000, 10000, 100000), unit="rows")
+def _b_fetch_scored_pool(n):
+    import ui_py_game_mode as ui
+
+    ui.db = create_engine(f"sqlite:///{_temp_db(n)}")
+    return lambda: ui.fetch_scored_pool(1, ui.NEWS_POOL_SIZE)
+
+
+@bench("build_labels.main", sizes=(100, 1000), unit="rows")
+def _b_build_labels(n):
+    import build_labels
+
+    build_labels.engine = eng = create_engine(f"sqlite:///{_temp_db(n)}")
+
+    def op():
+        with eng.begin() as conn:
+            conn.execute(text("DELETE FROM train_rows"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            build_labels.main()
+    return op
+
+
+class _StubImpactModel:
+    def predict(self, X, symbol_ids=None):
+        return X[:, 0] * 0.01
+
+
+@bench("score_news.main", sizes=(100, 500), unit="rows")
+def _b_score_news(n):
+    import score_news
+
+    # time the loop around the models, not FinBERT itself
+    score_news.load_models = lambda: None
+    score_news.finbert_probs = lambda s: (0.5, 0.3, 0.2)
+    score_news.impact_model = _StubImpactModel()
+    score_news.engine = eng = create_engine(f"sqlite:///{_temp_db(n)}")
+
+    def op():
+        with eng.begin() as conn:
+            conn.execute(text("DELETE FROM news_predictions"))
+        with contextlib.redirect_stdout(io.StringIO()):
+            score_news.main()
+    return op
+
+
+# -------------------------
+# order book (see bench_order_book.py for the standalone version)
+# -------------------------
+@bench("order_book.submit_batch", sizes=(100, 1000), unit="orders/batch")
+def _b_order_book(n):
+    from bench_order_book import MID0, make_orders
+    from order_book import MM_OWNER, OrderBook
+
+    orders = make_orders(n * 200, np.random.default_rng(SEED))
+    book = OrderBook(MID0, order_capacity=n * 400)
+    state = [0]
+
+    def op():
+        i = state[0] % 200
+        state[0] += 1
+        if i == 0:
+            book.__init__(MID0, order_capacity=n * 400)
+        book.requote(MM_OWNER, MID0 - 0.01, MID0 + 0.01, 0.2)
+        book.submit_batch(orders[i * n:(i + 1) * n])
+        book.drain_fills()
+    return op
+
+
+# -------------------------
+# runner
+# -------------------------
+def measure(op: Callable[[], None], case_sec: float = CASE_SEC) -> dict:
+    """
+    Time every call on its own (perf_counter_ns) until case_sec of op time
+    has been spent, so p50/p90/p99 are per-op latencies and the tail is not
+    averaged away. Each sample carries the timer's own ~0.1 us.
+    """
+    op()  # warm-up (imports, caches, first allocation)
+    clock = time.perf_counter_ns
+    ns = []
+    total, budget = 0, int(case_sec * 1e9)
+    while total < budget or len(ns) < MIN_SAMPLES:
+        t0 = clock()
+        op()
+        dt = clock() - t0
+        ns.append(dt)
+        total += dt
+    us = np.array(ns, dtype=np.float64) * 1e-3
+    return {
+        "ops_per_sec": len(ns) / (total * 1e-9),
+        "p50_us": float(np.percentile(us, 50)),
+        "p90_us": float(np.percentile(us, 90)),
+        "p99_us": float(np.percentile(us, 99)),
+        "samples": len(ns),
+    }
+
+
+def run(names: List[str], size_override: Dict[str, Tuple[int, ...]], case_sec: float) -> List[dict]:
+    results = []
+    for name in names:
+        setup, sizes, unit = BENCHES[name]
+        for size in size_override.get(name, sizes):
+            r = {"name": name, "size": size, "unit": unit}
+            r.update(measure(setup(size), case_sec))
+            results.append(r)
+            print(f"{name:34s} {unit}={size:<7d} {r['ops_per_sec']:14,.1f} ops/s  "
+                  f"p50={r['p50_us']:10.2f}us  p99={r['p99_us']:10.2f}us")
+    return results
+
+
+def compare(results: List[dict], baseline: dict, threshold_pct: float) -> int:
+    """Print ops/sec change vs. baseline; returns the number of regressions."""
+    base = {(r["name"], r["size"]): r for r in baseline["results"]}
+    bad = 0
+    print(f"\nvs. baseline ({baseline['meta'].get('created', '?')}):")
+    for r in results:
+        b = base.get((r["name"], r["size"]))
+        if b is None:
+            continue
+        pct = 100.0 * (r["ops_per_sec"] / b["ops_per_sec"] - 1.0)
+        flag = ""
+        if pct < -threshold_pct:
+            flag = "  REGRESSION"
+            bad += 1
+        print(f"{r['name']:34s} {r['unit']}={r['size']:<7d} {pct:+7.1f}%{flag}")
+    return bad
+
+
+def _parse_sizes(specs: List[str]) -> Dict[str, Tuple[int, ...]]:
+    # "engine.tick=0,50" -> {"engine.tick": (0, 50)}
+    out = {}
+    for s in specs:
+        name, _, sizes = s.partition("=")
+        out[name] = tuple(int(x) for x in sizes.split(","))
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Microbenchmarks for the engine, UI and pipeline hot paths.")
+    ap.add_argument("--filter", default="", help="only benchmarks whose name contains this")
+    ap.add_argument("--sizes", nargs="*", default=[], help="override sizes, e.g. engine.tick=0,50")
+    ap.add_argument("--case-sec", type=float, default=CASE_SEC)
+    ap.add_argument("--out", default=None, help="write results JSON here")
+    ap.add_argument("--baseline", default=None, help="compare against a previous results JSON")
+    ap.add_argument("--threshold", type=float, default=REGRESSION_PCT, help="regression threshold in percent")
+    ap.add_argument("--list", action="store_true")
+    args = ap.parse_args()
+
+    if args.list:
+        for name, (_, sizes, unit) in BENCHES.items():
+            print(f"{name:34s} {unit}: {sizes}")
+        return
+
+    names = [n for n in BENCHES if args.filter in n]
+    try:
+        results = run(names, _parse_sizes(args.sizes), args.case_sec)
+    finally:
+        for d in _TMP_DIRS:
+            shutil.rmtree(d, ignore_errors=True)
+
+    doc = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "seed": SEED,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(doc, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import time
+import numpy as np
+from order_book import OrderBook, ORDER_DTYPE, BUY, SELL, LIMIT, MARKET, CANCEL, MM_OWNER
+
+MID0 = 200.0
+N_ORDERS = 200_000
+BATCH = 1_000          # orders per simulated tick
+N_OWNERS = 1_000
+SEED = 7
+
+
+def make_orders(n: int, rng: np.random.Generator) -> np.ndarray:
+    """Random order flow: ~60% limits near the touch, ~25% markets, ~15% cancels."""
+    orders = np.zeros(n, dtype=ORDER_DTYPE)
+    u = rng.random(n)
+    orders["kind"] = np.where(u < 0.60, LIMIT, np.where(u < 0.85, MARKET, CANCEL))
+    orders["side"] = np.where(rng.random(n) < 0.5, BUY, SELL)
+    # limits rest 0..20 ticks behind the touch on their own side
+    offs = rng.integers(1, 21, n) * 0.01
+    orders["px"] = np.where(orders["side"] == BUY, MID0 - offs, MID0 + offs)
+    orders["qty"] = rng.integers(1, 50, n)
+    orders["owner"] = rng.integers(2, 2 + N_OWNERS, n)
+    # cancels target some earlier order id (may already be gone, like real flow)
+    orders["oid"] = (np.arange(n) * rng.random(n)).astype(np.int64)
+    return orders
+
+
+def run(batch: bool) -> float:
+    rng = np.random.default_rng(SEED)
+    orders = make_orders(N_ORDERS, rng)
+    book = OrderBook(MID0)
+
+    t0 = time.perf_counter()
+    for i in range(0, N_ORDERS, BATCH):
+        book.requote(MM_OWNER, MID0 - 0.01, MID0 + 0.01, 0.2)
+        chunk = orders[i:i + BATCH]
+        if batch:
+            book.submit_batch(chunk)
+        else:
+            for o in chunk:
+                if o["kind"] == LIMIT:
+                    book.limit(int(o["side"]), float(o["px"]), int(o["qty"]), int(o["owner"]))
+                elif o["kind"] == MARKET:
+                    book.market(int(o["side"]), int(o["qty"]), int(o["owner"]))
+                else:
+                    book.cancel(int(o["oid"]))
+        book.drain_fills()
+    return N_ORDERS / (time.perf_counter() - t0)
+
+
+def main():
+    print(f"orders={N_ORDERS} batch={BATCH} owners={N_OWNERS}")
+    print(f"single calls: {run(batch=False):12,.0f} orders/sec")
+    print(f"submit_batch: {run(batch=True):12,.0f} orders/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,16 @@
+import argparse
 import math
+import time
+import numpy as np
 from sqlalchemy import create_engine, text
+import metrics
+from init_db import ensure_label_key
+from intraday_store import IntradayStore
 
 engine = create_engine("sqlite:///data/db/news.db")
 BETA = 1.0  # start simple
 
+@metrics.timed("db.next_close")
 def next_close(symbol_id, ts):
     # pick next candle on/after ts
     with engine.begin() as conn:
@@ -16,16 +23,63 @@ def next_close(symbol_id, ts):
         return None
     return float(row[0]), int(row[1])
 
-def main():
+def intraday_labels(news, spy_id, horizon_min: int, store: IntradayStore):
+    """
+    Labels from minute bars: |abnormal log return| from the first bar closed
+    after published_at to horizon_min minutes later, one as-of search per
+    symbol for all of its headlines.
+    """
     with engine.begin() as conn:
+        names = dict(conn.execute(text("SELECT id, symbol FROM symbols")).fetchall())
+    nid = np.array([int(r[0]) for r in news], dtype=np.int64)
+    sid = np.array([int(r[1]) for r in news], dtype=np.int64)
+    pub = np.array([int(r[2]) for r in news], dtype=np.int64)
+
+    if len(store.days(names[spy_id])):
+        r_mkt = store.forward_returns(names[spy_id], pub, [horizon_min])[:, 0]
+    else:
+        print("No intraday SPY bars; labels use raw (not market-adjusted) returns.")
+        r_mkt = np.zeros(len(pub))
+
+    rows = []
+    now = int(time.time())
+    for s in np.unique(sid):
+        sel = np.flatnonzero(sid == s)
+        r_stock = store.forward_returns(names[int(s)], pub[sel], [horizon_min])[:, 0]
+        y = np.abs(r_stock - BETA * r_mkt[sel])
+        for k in np.flatnonzero(np.isfinite(y)):
+            i = sel[k]
+            rows.append({"nid": int(nid[i]), "sid": int(s), "t0": int(pub[i]), "h": horizon_min, "y": float(y[k]),
+                         "now": now})
+
+    if rows:
+        with engine.begin() as conn:
+            conn.execute(text("""
+                INSERT OR REPLACE INTO train_rows(news_id, symbol_id, t0, horizon_min, y, updated_at)
+                VALUES(:nid,:sid,:t0,:h,:y,:now)
+            """), rows)
+    metrics.count("labels.rows", len(rows))
+    return len(rows)
+
+def main(horizon_min: int = 1440):
+    if horizon_min > 1440:
+        raise SystemExit("--horizon is at most 1440 minutes (the next daily close)")
+    with engine.begin() as conn:
+        ensure_label_key(conn)   # old DBs: one label per news_id, no updated_at
         spy_id = conn.execute(text("SELECT id FROM symbols WHERE symbol='SPY'")).fetchone()[0]
         news = conn.execute(text("""
             SELECT id, symbol_id, published_at
             FROM news_items
             WHERE symbol_id IS NOT NULL AND published_at > 0
               AND id IN (SELECT news_id FROM news_features)
-              AND id NOT IN (SELECT news_id FROM train_rows)
-        """)).fetchall()
+              AND id NOT IN (SELECT news_id FROM train_rows WHERE horizon_min = :h)
+        """), {"h": horizon_min}).fetchall()
+
+    # each horizon is labelled on its own; train_regressor/export pick one with --horizon
+    if horizon_min < 1440:
+        added = intraday_labels(news, spy_id, horizon_min, IntradayStore())
+        print("Added", added, f"train rows ({horizon_min}m horizon)")
+        return
 
     added = 0
     for news_id, symbol_id, pub in news:
@@ -52,12 +106,17 @@ def main():
 
         with engine.begin() as conn:
             conn.execute(text("""
-                INSERT OR REPLACE INTO train_rows(news_id, symbol_id, t0, horizon_min, y)
-                VALUES(:nid,:sid,:t0,:h,:y)
-            """), {"nid": int(news_id), "sid": int(symbol_id), "t0": int(t0_day), "h": 1440, "y": float(y)})
+                INSERT OR REPLACE INTO train_rows(news_id, symbol_id, t0, horizon_min, y, updated_at)
+                VALUES(:nid,:sid,:t0,:h,:y,:now)
+            """), {"nid": int(news_id), "sid": int(symbol_id), "t0": int(t0_day), "h": 1440, "y": float(y),
+                  "now": int(time.time())})
         added += 1
+        metrics.count("labels.rows")
 
     print("Added", added, "train rows")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="Build train_rows labels from candles.")
+    ap.add_argument("--horizon", type=int, default=1440,
+                    help="minutes; 1440 = next daily close, smaller values use the intraday bar store")
+    main(ap.parse_args().horizon)
@@ -0,0 +1,124 @@
+from collections import deque
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+
+
+class CandleRing:
+    """
+    Fixed-capacity OHLC ring buffer built from ticks.
+
+    Columns live in preallocated NumPy arrays (no per-candle objects), and the
+    high/low of the last `window` candles is tracked with monotonic deques, so
+    both update() and hi_lo() are O(1) amortized no matter how long the round runs.
+    """
+
+    def __init__(self, interval_sec: float = 1.0, capacity: int = 300, window: int = 60):
+        self.interval = float(interval_sec)
+        self.window = int(window)
+        self.capacity = max(int(capacity), self.window)
+
+        self.t0 = np.zeros(self.capacity, dtype=np.float64)
+        self.o = np.zeros(self.capacity, dtype=np.float64)
+        self.h = np.zeros(self.capacity, dtype=np.float64)
+        self.l = np.zeros(self.capacity, dtype=np.float64)
+        self.c = np.zeros(self.capacity, dtype=np.float64)
+
+        # total candles ever opened; the live candle has sequence number count - 1
+        self.count = 0
+
+        # monotonic deques of candle sequence numbers (front = window max / min)
+        self._max_q = deque()
+        self._min_q = deque()
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    def _slot(self, seq: int) -> int:
+        return seq % self.capacity
+
+    def _push_high(self, seq: int, price: float) -> None:
+        q = self._max_q
+        while q and self.h[self._slot(q[-1])] <= price:
+            q.pop()
+        q.append(seq)
+
+    def _push_low(self, seq: int, price: float) -> None:
+        q = self._min_q
+        while q and self.l[self._slot(q[-1])] >= price:
+            q.pop()
+        q.append(seq)
+
+    def _evict(self) -> None:
+        first = self.count - self.window
+        while self._max_q and self._max_q[0] < first:
+            self._max_q.popleft()
+        while self._min_q and self._min_q[0] < first:
+            self._min_q.popleft()
+
+    def update(self, now: float, price: float) -> None:
+        price = float(price)
+        if self.count and now < self.t0[self._slot(self.count - 1)] + self.interval:
+            seq = self.count - 1
+            i = self._slot(seq)
+            # a live candle's high only rises and its low only falls, so the
+            # deques stay valid if we re-push it whenever it sets a new extreme
+            if price > self.h[i]:
+                self.h[i] = price
+                self._push_high(seq, price)
+            if price < self.l[i]:
+                self.l[i] = price
+                self._push_low(seq, price)
+            self.c[i] = price
+            return
+
+        seq = self.count
+        i = self._slot(seq)
+        self.t0[i] = now - (now % self.interval)
+        self.o[i] = self.h[i] = self.l[i] = self.c[i] = price
+        self.count += 1
+        self._push_high(seq, price)
+        self._push_low(seq, price)
+        self._evict()
+
+    def hi_lo(self) -> Tuple[float, float]:
+        """High/low across the display window (O(1))."""
+        if not self.count:
+            return 0.0, 0.0
+        return (
+            float(self.h[self._slot(self._max_q[0])]),
+            float(self.l[self._slot(self._min_q[0])]),
+        )
+
+    def view(self, n: int = None):
+        """
+        Returns (o, h, l, c) arrays for the last n candles, oldest first.
+        Copies at most n rows; the ring itself is never shifted.
+        """
+        size = len(self)
+        n = size if n is None else min(int(n), size)
+        if n <= 0:
+            empty = np.empty(0)
+            return empty, empty, empty, empty
+        idx = np.arange(self.count - n, self.count) % self.capacity
+        return self.o[idx], self.h[idx], self.l[idx], self.c[idx]
+
+
+class MultiResCandles:
+    """Several CandleRings (e.g. 0.2s / 1s / 5s) fed from the same tick stream."""
+
+    def __init__(self, intervals: Iterable[float], capacity: int = 300, window: int = 60):
+        self.rings: Dict[float, CandleRing] = {
+            float(iv): CandleRing(interval_sec=iv, capacity=capacity, window=window)
+            for iv in intervals
+        }
+
+    def update(self, now: float, price: float) -> None:
+        for ring in self.rings.values():
+            ring.update(now, price)
+
+    def __getitem__(self, interval: float) -> CandleRing:
+        return self.rings[float(interval)]
+
+    def intervals(self):
+        return list(self.rings.keys())
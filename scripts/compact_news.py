@@ -0,0 +1,131 @@
+import argparse
+import os
+import time
+
+from sqlalchemy import create_engine, text
+
+import article_store
+from init_db import ensure_label_key, ensure_provider_key
+
+engine = create_engine("sqlite:///data/db/news.db")
+
+# tables keyed by news_id that follow an article when its duplicates merge
+DEPENDENT_TABLES = ("news_features", "train_rows", "news_predictions")
+
+# the provider ensure_provider_key backfills into rows from before the column
+DERIVED_PROVIDER = "CASE WHEN provider_id LIKE 'synth-%' THEN 'synth' ELSE 'finnhub' END"
+
+
+def find_duplicates(conn, provider: str = "provider") -> int:
+    """
+    Fill temp table dup_map(old_id -> keep_id): every copy of a (provider,
+    provider_id, symbol_id) article except the oldest row, which is kept.
+    Copies of an article under different symbols are not duplicates. provider is
+    the SQL expression to group on (a derived one lets a dry run work
+    without adding the column).
+    """
+    conn.execute(text("DROP TABLE IF EXISTS temp.dup_map"))
+    conn.execute(text("CREATE TEMP TABLE dup_map (old_id INTEGER PRIMARY KEY, keep_id INTEGER NOT NULL)"))
+    conn.execute(text(f"""
+        INSERT INTO temp.dup_map(old_id, keep_id)
+        WITH n AS (
+            SELECT id, {provider} AS provider, provider_id, symbol_id FROM news_items WHERE provider_id IS NOT NULL
+        )
+        SELECT n.id, k.keep_id
+        FROM n
+        JOIN (
+            SELECT provider, provider_id, symbol_id, MIN(id) AS keep_id
+            FROM n
+            GROUP BY provider, provider_id, symbol_id
+            HAVING COUNT(*) > 1
+        ) k ON k.provider = n.provider AND k.provider_id = n.provider_id AND k.symbol_id IS n.symbol_id
+        WHERE n.id != k.keep_id
+    """))
+    return conn.execute(text("SELECT COUNT(*) FROM temp.dup_map")).scalar()
+
+
+def compact(dry_run: bool = False) -> dict:
+    """
+    Merge duplicate articles into their oldest copy in one transaction:
+      - dependent rows (features, labels, predictions) of a duplicate move
+        to the kept id when it has none of its own, then the rest are dropped;
+      - an empty body on the kept row is filled from the longest duplicate one;
+      - duplicates are deleted, then dropped from news_fts and news_bodies
+        (article_store.sync);
+      - the unique (provider, provider_id, symbol_id) index is created.
+    """
+    stats = {}
+    with (engine.connect() if dry_run else engine.begin()) as conn:
+        if dry_run:
+            # read-only: ensure_provider_key's ALTER TABLE would commit on its own,
+            # so group old rows on the provider it would backfill instead
+            cols = [r[1] for r in conn.execute(text("PRAGMA table_info(news_items)")).fetchall()]
+            stats["provider_column"] = "provider" in cols
+            provider = f"COALESCE(provider, {DERIVED_PROVIDER})" if stats["provider_column"] else DERIVED_PROVIDER
+            stats["duplicates"] = find_duplicates(conn, provider)
+        else:
+            ensure_provider_key(conn)   # adds the provider column on old DBs; no index yet if dups exist
+            ensure_label_key(conn)
+            stats["duplicates"] = find_duplicates(conn)
+        stats["articles"] = conn.execute(text("SELECT COUNT(DISTINCT keep_id) FROM temp.dup_map")).scalar()
+        for t in DEPENDENT_TABLES:
+            stats[f"{t}_rows"] = conn.execute(text(
+                f"SELECT COUNT(*) FROM {t} WHERE news_id IN (SELECT old_id FROM temp.dup_map)")).scalar()
+        if dry_run or not stats["duplicates"]:
+            if not dry_run:
+                ensure_provider_key(conn)
+            return stats
+
+        for t in DEPENDENT_TABLES:
+            # OR IGNORE: the kept id's own row (or the first duplicate moved) wins;
+            # a moved label is stamped so export_training_set writes it again
+            touch = ", updated_at = :now" if t == "train_rows" else ""
+            conn.execute(text(f"""
+                UPDATE OR IGNORE {t}
+                SET news_id = (SELECT keep_id FROM temp.dup_map WHERE old_id = {t}.news_id){touch}
+                WHERE news_id IN (SELECT old_id FROM temp.dup_map)
+            """), {"now": int(time.time())})
+            conn.execute(text(f"DELETE FROM {t} WHERE news_id IN (SELECT old_id FROM temp.dup_map)"))
+
+        pairs = conn.execute(text("SELECT old_id, keep_id FROM temp.dup_map")).fetchall()
+        bodies = article_store.get_many(conn, {int(i) for p in pairs for i in p})
+        fill = {}
+        for old_id, keep_id in pairs:
+            b = bodies.get(int(old_id), "")
+            if not bodies.get(int(keep_id)) and len(b) > len(fill.get(int(keep_id), "")):
+                fill[int(keep_id)] = b
+        article_store.put(conn, fill)
+        stats["deleted"] = conn.execute(text(
+            "DELETE FROM news_items WHERE id IN (SELECT old_id FROM temp.dup_map)")).rowcount
+        article_store.sync(conn)
+        if not ensure_provider_key(conn):
+            raise RuntimeError("duplicates remain after compaction")
+    return stats
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Merge duplicate news_items and enforce unique (provider, provider_id, symbol_id).")
+    ap.add_argument("--dry-run", action="store_true", help="only report what would be merged")
+    ap.add_argument("--vacuum", action="store_true", help="VACUUM afterwards to return the space to the OS")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    s = compact(args.dry_run)
+    verb = "Would remove" if args.dry_run else "Removed"
+    print(f"{verb} {s['duplicates']} duplicate rows of {s['articles']} articles "
+          f"(features {s['news_features_rows']}, labels {s['train_rows_rows']}, "
+          f"predictions {s['news_predictions_rows']} remapped or dropped) in {time.perf_counter() - t0:.1f}s")
+    if args.dry_run and not s["provider_column"]:
+        print("news_items has no provider column yet; a real run adds it (grouped here on the derived provider)")
+    if args.dry_run or not s["duplicates"]:
+        return
+    if args.vacuum:
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+        print("Vacuumed.")
+    if os.path.isdir("data/train_set"):
+        print("merged ids stay in the Parquet training set: rebuild it with export_training_set.py --rebuild")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+import argparse
+import json
+import os
+import shutil
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+from sqlalchemy import create_engine, text
+
+import metrics
+
+engine = create_engine("sqlite:///data/db/news.db")
+
+# The joined train_rows x news_features matrix as Parquet, partitioned by the
+# month of t0:  data/train_set/month=YYYY-MM/part-<export>-<block>-<first_id>-<last_id>.parquet
+# Each export only appends rows whose train_rows.updated_at is past the mark
+# kept in _state.json, so a rebuilt label is written again and readers keep
+# the copy with the newest updated_at. An export holds a single label
+# horizon, recorded in the state as horizon_min.
+ROOT = "data/train_set"
+STATE_FILE = "_state.json"
+FEATURES = ["sentiment_score", "p_pos", "p_neg", "p_neu", "hour", "dow"]   # model input order
+KEYS = ["news_id", "symbol_id", "t0", "horizon_min", "updated_at"]
+LABEL = "y"
+FETCH_ROWS = 200_000   # rows per DB round trip while exporting
+HORIZON_MIN = 1440     # train_rows horizon exported unless --horizon says otherwise
+
+SELECT = """
+    SELECT tr.news_id, tr.symbol_id, tr.t0, tr.horizon_min, tr.updated_at, tr.y,
+           nf.sentiment_score, nf.p_pos, nf.p_neg, nf.p_neu, nf.hour, nf.dow
+    FROM train_rows tr
+    JOIN news_features nf ON nf.news_id = tr.news_id
+    WHERE tr.horizon_min = :h
+"""
+
+
+def _load_state(root: str) -> dict:
+    p = os.path.join(root, STATE_FILE)
+    if not os.path.exists(p):
+        return {"max_updated_at": -1, "rows": 0}   # rows from before updated_at carry 0
+    with open(p) as f:
+        return json.load(f)
+
+
+def _save_state(root: str, state: dict) -> None:
+    tmp = os.path.join(root, STATE_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, os.path.join(root, STATE_FILE))
+
+
+def dataset(root: str = ROOT) -> Optional[ds.Dataset]:
+    if not os.path.isdir(root) or not any(n.startswith("month=") for n in os.listdir(root)):
+        return None
+    return ds.dataset(root, format="parquet", partitioning="hive")
+
+
+def exported_ids(root: str = ROOT) -> np.ndarray:
+    d = dataset(root)
+    if d is None:
+        return np.zeros(0, np.int64)
+    return np.unique(d.to_table(columns=["news_id"]).column("news_id").to_numpy())
+
+
+def export_horizon(root: str = ROOT) -> Optional[int]:
+    """Label horizon of the export under root; None when nothing was exported yet."""
+    if dataset(root) is None:
+        return None
+    return int(_load_state(root).get("horizon_min", 1440))
+
+
+def _latest(nid: np.ndarray, upd: np.ndarray) -> np.ndarray:
+    """Index of the newest copy of each news_id, in news_id order."""
+    order = np.lexsort((upd, nid))
+    last = np.append(nid[order][1:] != nid[order][:-1], True)
+    return order[last]
+
+
+def _write(root: str, rows: List[tuple], tag: str) -> int:
+    """Write one fetched block, one file per month it touches."""
+    cols = list(zip(*rows))
+    arrays = {name: np.array(vals, dtype=np.int64 if name in KEYS else np.float64)   # None -> NaN
+              for name, vals in zip(KEYS + [LABEL] + FEATURES, cols)}
+
+    month = np.datetime_as_string(arrays["t0"].astype("datetime64[s]"), unit="M")
+    for m in np.unique(month):
+        sel = month == m
+        ids = arrays["news_id"][sel]
+        table = pa.table({k: v[sel] for k, v in arrays.items()})
+        d = os.path.join(root, f"month={m}")
+        os.makedirs(d, exist_ok=True)
+        path = os.path.join(d, f"part-{tag}-{ids.min():012d}-{ids.max():012d}.parquet")
+        with metrics.timer("export.write"):
+            pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return len(rows)
+
+
+def export(root: str = ROOT, horizon_min: int = HORIZON_MIN) -> int:
+    """
+    Append rows written (train_rows.updated_at) after the last export:
+    new labels, labels built late for older headlines and labels rebuilt
+    since. Rows stamped in the current second wait for the next export, so
+    a write landing in that second is not skipped. Only labels at
+    horizon_min are exported; an export of another horizon under the same
+    root is refused.
+    """
+    os.makedirs(root, exist_ok=True)
+    state = _load_state(root)
+    have = export_horizon(root)
+    if have is not None and "max_updated_at" not in state:
+        raise SystemExit(f"{root} was exported by news_id high-water mark and can not see rebuilt labels; "
+                         f"export again with --rebuild.")
+    if have is not None and have != horizon_min:
+        raise SystemExit(f"{root} already holds {have}-minute labels; export {horizon_min} with --rebuild "
+                         f"or to another --root.")
+    wm = int(state["max_updated_at"])
+    now = int(time.time())
+
+    added = 0
+    with engine.connect() as conn:
+        res = conn.execute(text(SELECT + " AND tr.updated_at > :wm AND tr.updated_at < :now"
+                                         " ORDER BY tr.updated_at, tr.news_id"),
+                           {"wm": wm, "now": now, "h": horizon_min})
+        block = 0
+        while True:
+            rows = res.fetchmany(FETCH_ROWS)
+            if not rows:
+                break
+            added += _write(root, rows, f"{now:010d}-{block:04d}")
+            block += 1
+
+    state.update(max_updated_at=now - 1, horizon_min=horizon_min, rows=state["rows"] + added, updated=now)
+    _save_state(root, state)
+    metrics.count("export.rows", added)
+    return added
+
+
+def load_matrix(root: str = ROOT, columns: Sequence[str] = FEATURES) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (X, y, news_id) sorted by news_id, reading only the needed columns.
+    Arrow decodes each column straight into a contiguous buffer -- no
+    per-row Python objects -- and X is built from those buffers in one copy.
+    Rows with a missing feature are dropped, as train_regressor did.
+    """
+    d = dataset(root)
+    if d is None:
+        raise SystemExit(f"No training set under {root}; run export_training_set.py first.")
+    t = d.to_table(columns=["news_id", "updated_at", LABEL] + list(columns))
+    # a rebuilt label (or an export interrupted before its state was saved)
+    # leaves older copies behind; keep the newest
+    keep = _latest(t.column("news_id").to_numpy(), t.column("updated_at").to_numpy())
+    nid = t.column("news_id").to_numpy()[keep]
+    X = np.column_stack([t.column(c).to_numpy() for c in columns])[keep]
+    y = t.column(LABEL).to_numpy()[keep]
+    ok = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    return X[ok], y[ok], nid[ok]
+
+
+def iter_batches(root: str = ROOT, columns: Sequence[str] = FEATURES, id_range: Tuple[int, int] = (0, 1 << 62),
+                 batch_rows: int = FETCH_ROWS) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (X, y) blocks file by file, restricted to lo <= news_id < hi; for
+    out-of-core training. Only the newest copy of each news_id is yielded,
+    as in load_matrix; the ids and stamps are read up front to find it.
+    """
+    d = dataset(root)
+    if d is None:
+        return
+    lo, hi = id_range
+    flt = (ds.field("news_id") >= lo) & (ds.field("news_id") < hi)
+    t = d.to_table(columns=["news_id", "updated_at"], filter=flt)
+    keep = _latest(t.column("news_id").to_numpy(), t.column("updated_at").to_numpy())
+    ids = t.column("news_id").to_numpy()[keep]
+    newest = t.column("updated_at").to_numpy()[keep]
+    taken = np.zeros(len(ids), bool)
+    for b in d.to_batches(columns=["news_id", "updated_at", LABEL] + list(columns), filter=flt, batch_size=batch_rows):
+        if not b.num_rows:
+            continue
+        k = np.searchsorted(ids, b.column("news_id").to_numpy(zero_copy_only=False))
+        mine = (b.column("updated_at").to_numpy(zero_copy_only=False) == newest[k]) & ~taken[k]
+        taken[k[mine]] = True
+        X = np.column_stack([b.column(c).to_numpy(zero_copy_only=False) for c in columns])
+        y = b.column(LABEL).to_numpy(zero_copy_only=False)
+        ok = mine & np.isfinite(X).all(axis=1) & np.isfinite(y)
+        yield X[ok], y[ok]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Incrementally export the training matrix to partitioned Parquet.")
+    ap.add_argument("--root", default=ROOT)
+    ap.add_argument("--rebuild", action="store_true", help="drop the existing export first")
+    ap.add_argument("--horizon", type=int, default=HORIZON_MIN, help="label horizon in minutes to export (default 1440)")
+    args = ap.parse_args()
+
+    if args.rebuild and os.path.isdir(args.root):
+        shutil.rmtree(args.root)
+    t0 = time.perf_counter()
+    n = export(args.root, args.horizon)
+    state = _load_state(args.root)
+    print(f"Exported {n} new rows in {time.perf_counter() - t0:.2f}s "
+          f"({state['rows']} total, labels written up to {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(state['max_updated_at']))}) "
+          f"-> {args.root}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,43 @@
 import time
 import pandas as pd
 from sqlalchemy import create_engine, text
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import stub_models
+import article_store
+import metrics
 
 engine = create_engine("sqlite:///data/db/news.db")
 MODEL = "ProsusAI/finbert"
 
-tok = AutoTokenizer.from_pretrained(MODEL)
-mdl = AutoModelForSequenceClassification.from_pretrained(MODEL)
-mdl.eval()
+FEATURES_UPSERT = text("""
+    INSERT OR REPLACE INTO news_features
+    (news_id, p_pos, p_neg, p_neu, sentiment_score, source, hour, dow, is_market_hours)
+    VALUES (:nid,:pp,:pn,:pneu,:s,:src,:hr,:dw,:mh)
+""")
 
-device = "cuda" if torch.cuda.is_available() else "cpu"
-mdl.to(device)
+# loaded on first use; NEWS_STUB_MODELS=1 swaps in stub_models.finbert_probs
+tok = None
+mdl = None
+device = "cpu"
+
+def load_models():
+    global tok, mdl, device
+    if mdl is not None or stub_models.enabled():
+        return
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    import torch
+
+    tok = AutoTokenizer.from_pretrained(MODEL)
+    mdl = AutoModelForSequenceClassification.from_pretrained(MODEL)
+    mdl.eval()
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    mdl.to(device)
 
 def finbert_probs(texts):
+    if stub_models.enabled():
+        return stub_models.finbert_probs(texts)
+    import torch
+
     with torch.no_grad():
         enc = tok(texts, padding=True, truncation=True, max_length=256, return_tensors="pt")
         enc = {k: v.to(device) for k, v in enc.items()}
@@ -24,46 +47,47 @@ def finbert_probs(texts):
     # ProsusAI/finbert order: [negative, neutral, positive]
     return probs
 
+def feature_params(news_id, p, src, pub) -> dict:
+    """FEATURES_UPSERT parameters for one item; p is a [neg, neu, pos] row."""
+    p_neg, p_neu, p_pos = float(p[0]), float(p[1]), float(p[2])
+    t = time.gmtime(int(pub))  # UTC
+    return {"nid": int(news_id), "pp": p_pos, "pn": p_neg, "pneu": p_neu, "s": p_pos - p_neg,
+            "src": src, "hr": t.tm_hour, "dw": t.tm_wday, "mh": 0}
+
 def main(batch=16):
     with engine.begin() as conn:
         rows = conn.execute(text("""
-            SELECT id, headline, body, source, published_at
+            SELECT id, headline, source, published_at
             FROM news_items
             WHERE id NOT IN (SELECT news_id FROM news_features)
               AND published_at > 0
         """)).fetchall()
+        bodies = article_store.get_many(conn, [r[0] for r in rows])
 
     if not rows:
         print("No new news_items to featurize.")
         return
 
-    df = pd.DataFrame(rows, columns=["news_id","headline","body","source","published_at"])
+    load_models()
+    df = pd.DataFrame(rows, columns=["news_id","headline","source","published_at"])
+    df["body"] = df["news_id"].map(bodies)
     df["text"] = (df["headline"].fillna("") + ". " + df["body"].fillna("")).str.slice(0, 2000)
 
     out = []
     for i in range(0, len(df), batch):
         chunk = df.iloc[i:i+batch]
-        probs = finbert_probs(chunk["text"].tolist())
+        with metrics.timer("features.finbert_batch"):
+            probs = finbert_probs(chunk["text"].tolist())
+        metrics.count("features.items", len(chunk))
 
         for (news_id, src, pub), p in zip(
             chunk[["news_id","source","published_at"]].itertuples(index=False),
             probs
         ):
-            p_neg, p_neu, p_pos = float(p[0]), float(p[1]), float(p[2])
-            s = p_pos - p_neg
-            t = time.gmtime(int(pub))  # UTC
-            out.append((int(news_id), p_pos, p_neg, p_neu, s, src, t.tm_hour, t.tm_wday, 0))
+            out.append(feature_params(news_id, p, src, pub))
 
-    with engine.begin() as conn:
-        for row in out:
-            conn.execute(text("""
-                INSERT OR REPLACE INTO news_features
-                (news_id, p_pos, p_neg, p_neu, sentiment_score, source, hour, dow, is_market_hours)
-                VALUES (:nid,:pp,:pn,:pneu,:s,:src,:hr,:dw,:mh)
-            """), {
-                "nid": row[0], "pp": row[1], "pn": row[2], "pneu": row[3],
-                "s": row[4], "src": row[5], "hr": row[6], "dw": row[7], "mh": row[8]
-            })
+    with metrics.timer("db.features_write"), engine.begin() as conn:
+        conn.execute(FEATURES_UPSERT, out)
 
     print(f"Wrote features for {len(out)} items. device={device}")
 
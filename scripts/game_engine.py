@@ -26,12 +26,15 @@ def tick_update_prices(
     sigma_per_min: float = 0.0015,
     alpha: float = 0.003,
     half_life_min: float = 9.0,
+    sectors: Optional[Dict[str, str]] = None,
 ) -> Dict[str, float]:
     """
     Updates each symbol price in-place style:
     P_{t+1} = P_t * exp( drift + noise )
     drift = sum_i alpha * dir_i * impact_i * decay(age)
     noise ~ N(0, sigma_per_min) per minute
+    sectors (symbol -> sector name) scopes sector shocks to their own names;
+    shocks without a sector, or calls without a sector map, stay global.
     """
     half_life_sec = half_life_min * 60.0
     # scale noise for dt (sigma is per 60s)
@@ -50,8 +53,9 @@ def tick_update_prices(
                     continue
                 drift += alpha * sh.direction * sh.impact * decay
             else:
-                # sector/global shocks: apply if sector matches (if you track sectors per symbol)
-                # For now: treat as global shock
+                # sector/global shocks: apply if sector matches
+                if sh.sector is not None and sectors is not None and sectors.get(sym) != sh.sector:
+                    continue
                 drift += 0.6 * alpha * sh.direction * sh.impact * decay
 
         eps = random.gauss(0.0, 1.0)
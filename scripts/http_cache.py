@@ -0,0 +1,165 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Optional, Sequence
+
+import requests
+
+import metrics
+
+# On-disk cache of raw provider responses, shared by the backfill scripts.
+#
+#   data/http_cache/<endpoint>/<k[:2]>/<k>.gz
+#
+# k is the sha256 of the endpoint, URL and sorted query parameters (secrets
+# such as the API token are left out, so rotating a token keeps the cache).
+# Each file is gzip: one JSON metadata line, then the response body as sent.
+# Entries expire per endpoint (TTLS); ranges wholly in the past never change
+# and can be cached with ttl=FOREVER. NEWS_HTTP_OFFLINE=1 serves only from
+# the cache, stale or not, and raises CacheMiss for anything else.
+CACHE_DIR = os.getenv("NEWS_HTTP_CACHE_DIR", "data/http_cache")
+OFFLINE_ENV = "NEWS_HTTP_OFFLINE"
+SECRET_PARAMS = ("token", "apikey", "api_key")
+FOREVER = float("inf")
+
+TTLS = {
+    "finnhub.company-news": 6 * 3600,
+    "stooq.daily": 12 * 3600,
+}
+DEFAULT_TTL = 3600
+TIMEOUT = 30
+
+last_hit = False  # whether the most recent get() was served from the cache (callers skip rate-limit sleeps)
+
+
+class CacheMiss(Exception):
+    """Offline mode and the request is not in the cache."""
+
+
+def offline() -> bool:
+    return os.getenv(OFFLINE_ENV, "") not in ("", "0")
+
+
+def cache_key(endpoint: str, url: str, params: Optional[Dict] = None, volatile: Sequence[str] = ()) -> str:
+    p = {k: str(v) for k, v in (params or {}).items() if k not in SECRET_PARAMS and k not in volatile}
+    blob = json.dumps([endpoint, url, sorted(p.items())], separators=(",", ":"))
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+
+def _path(endpoint: str, key: str) -> str:
+    return os.path.join(CACHE_DIR, endpoint, key[:2], key + ".gz")
+
+
+def _read(path: str):
+    with gzip.open(path, "rb") as f:
+        meta = json.loads(f.readline())
+        return meta, f.read()
+
+
+def _write(path: str, meta: dict, body: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp, "wb", compresslevel=6) as f:
+        f.write(json.dumps(meta).encode() + b"\n")
+        f.write(body)
+    os.replace(tmp, path)
+
+
+def get(endpoint: str, url: str, params: Optional[Dict] = None, ttl: Optional[float] = None,
+        refresh: bool = False, volatile: Sequence[str] = ()) -> bytes:
+    """
+    Body of GET url?params, from the cache when a fresh entry exists.
+    `volatile` params are sent but not keyed on (e.g. an end date of
+    "today"), so the entry stays findable; its TTL decides freshness.
+    Only 200 responses are stored; other statuses raise as requests would.
+    """
+    global last_hit
+    ttl = TTLS.get(endpoint, DEFAULT_TTL) if ttl is None else ttl
+    key = cache_key(endpoint, url, params, volatile)
+    path = _path(endpoint, key)
+
+    if not refresh and os.path.exists(path):
+        meta, body = _read(path)
+        if offline() or time.time() - meta["fetched_at"] < ttl:
+            metrics.count("http.cache_hit")
+            last_hit = True
+            return body
+    if offline():
+        shown = {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS}
+        raise CacheMiss(f"{endpoint}: {url} {shown}")
+
+    metrics.count("http.cache_miss")
+    last_hit = False
+    with metrics.timer(f"http.{endpoint}"):
+        r = requests.get(url, params=params, timeout=TIMEOUT)
+    r.raise_for_status()
+    meta = {"endpoint": endpoint, "url": url, "fetched_at": time.time(), "ttl": None if ttl == FOREVER else ttl,
+            "content_type": r.headers.get("Content-Type", ""), "bytes": len(r.content)}
+    _write(path, meta, r.content)
+    return r.content
+
+
+def get_json(endpoint: str, url: str, params: Optional[Dict] = None, **kw):
+    return json.loads(get(endpoint, url, params, **kw))
+
+
+def get_text(endpoint: str, url: str, params: Optional[Dict] = None, **kw) -> str:
+    return get(endpoint, url, params, **kw).decode("utf-8", errors="replace")
+
+
+def _entries(endpoint: Optional[str] = None):
+    if not os.path.isdir(CACHE_DIR):
+        return
+    for ep in sorted(os.listdir(CACHE_DIR)):
+        if endpoint and ep != endpoint:
+            continue
+        for dirpath, _, files in os.walk(os.path.join(CACHE_DIR, ep)):
+            for fn in files:
+                if fn.endswith(".gz"):
+                    yield ep, os.path.join(dirpath, fn)
+
+
+def stats() -> Dict[str, dict]:
+    out: Dict[str, dict] = {}
+    for ep, path in _entries():
+        s = out.setdefault(ep, {"entries": 0, "disk_bytes": 0})
+        s["entries"] += 1
+        s["disk_bytes"] += os.path.getsize(path)
+    return out
+
+
+def purge(endpoint: Optional[str] = None, expired_only: bool = True) -> int:
+    now = time.time()
+    n = 0
+    for ep, path in _entries(endpoint):
+        if expired_only:
+            meta, _ = _read(path)
+            ttl = meta.get("ttl", TTLS.get(ep, DEFAULT_TTL))
+            if ttl is None or now - meta["fetched_at"] < ttl:
+                continue
+        os.remove(path)
+        n += 1
+    return n
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Inspect or prune the provider response cache.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="entries and disk use per endpoint")
+    p = sub.add_parser("purge", help="delete expired entries (or everything with --all)")
+    p.add_argument("--endpoint", default=None)
+    p.add_argument("--all", action="store_true")
+    args = ap.parse_args()
+
+    if args.cmd == "stats":
+        for ep, s in stats().items():
+            print(f"{ep:24s} {s['entries']:7d} entries  {s['disk_bytes'] / 1e6:8.1f} MB  ttl {TTLS.get(ep, DEFAULT_TTL)}s")
+    else:
+        print(f"Removed {purge(args.endpoint, expired_only=not args.all)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import pygame
+
+Color = Tuple[int, int, int]
+
+
+class TextCache:
+    """
+    LRU cache of rendered text surfaces keyed by (text, font, color).
+    font.render is the expensive part of drawing a label; most labels repeat
+    the same strings (static captions, unchanged numbers) frame after frame.
+    """
+
+    def __init__(self, max_items: int = 512):
+        self.max_items = int(max_items)
+        self._surfs: "OrderedDict[tuple, pygame.Surface]" = OrderedDict()
+
+    def render(self, text_s: str, font, color: Color) -> pygame.Surface:
+        key = (text_s, id(font), color)
+        surf = self._surfs.get(key)
+        if surf is not None:
+            self._surfs.move_to_end(key)
+            return surf
+        surf = font.render(text_s, True, color)
+        self._surfs[key] = surf
+        if len(self._surfs) > self.max_items:
+            self._surfs.popitem(last=False)
+        return surf
+
+
+# shared by the HUD and any ad-hoc labels (chart price labels etc.)
+text_cache = TextCache()
+
+
+def wrap_text(text_s: str, font, max_width: int):
+    """Simple word-wrap for pygame text surfaces."""
+    words = text_s.split(" ")
+    lines = []
+    cur = ""
+    for w in words:
+        test = (cur + " " + w).strip()
+        if font.size(test)[0] <= max_width:
+            cur = test
+        else:
+            if cur:
+                lines.append(cur)
+            cur = w
+    if cur:
+        lines.append(cur)
+    return lines
+
+
+class Label:
+    def __init__(self, pos: Tuple[int, int], font, color: Color, text_s: str = ""):
+        self.pos = pos
+        self.font = font
+        self.color = color
+        self.text = text_s
+        self.rect: Optional[pygame.Rect] = None  # area covered on screen last draw
+        self.dirty = True
+
+    def set(self, text_s: str) -> None:
+        if text_s != self.text:
+            self.text = text_s
+            self.dirty = True
+
+    def _swap_rect(self, new_rect: pygame.Rect) -> List[pygame.Rect]:
+        # the dirty area covers both the old and the new extent of the widget
+        dirty = new_rect if self.rect is None else self.rect.union(new_rect)
+        self.rect = new_rect
+        self.dirty = False
+        return [dirty]
+
+    def draw(self, screen, bg: Color) -> List[pygame.Rect]:
+        if self.rect is not None:
+            screen.fill(bg, self.rect)
+        surf = text_cache.render(self.text, self.font, self.color)
+        return self._swap_rect(screen.blit(surf, self.pos))
+
+
+class TextBlock(Label):
+    """Word-wrapped multi-line text; re-wraps only when the text changes."""
+
+    def __init__(self, pos, font, color, max_width: int, max_lines: int = 3, line_h: int = 26, text_s: str = ""):
+        super().__init__(pos, font, color, text_s)
+        self.max_width = int(max_width)
+        self.max_lines = int(max_lines)
+        self.line_h = int(line_h)
+
+    def draw(self, screen, bg: Color) -> List[pygame.Rect]:
+        lines = wrap_text(self.text, self.font, self.max_width)[: self.max_lines]
+        if self.rect is not None:
+            screen.fill(bg, self.rect)
+        x, y = self.pos
+        new_rect = pygame.Rect(x, y, 0, 0)
+        for i, line in enumerate(lines):
+            # rendered once per headline, so skip the cache and keep it for labels
+            r = screen.blit(self.font.render(line, True, self.color), (x, y + i * self.line_h))
+            new_rect.union_ip(r)
+        return self._swap_rect(new_rect)
+
+
+class Hud:
+    """
+    Retained-mode HUD: widgets keep their last text and on-screen rect, and
+    draw() repaints only the ones whose text changed, returning the dirty
+    rects to hand to pygame.display.update().
+    """
+
+    def __init__(self, bg: Color):
+        self.bg = bg
+        self.widgets: Dict[str, Label] = {}
+
+    def label(self, name: str, pos, font, color: Color, text_s: str = "") -> Label:
+        w = Label(pos, font, color, text_s)
+        self.widgets[name] = w
+        return w
+
+    def text_block(self, name: str, pos, font, color: Color, max_width: int, **kw) -> TextBlock:
+        w = TextBlock(pos, font, color, max_width, **kw)
+        self.widgets[name] = w
+        return w
+
+    def set(self, name: str, text_s: str) -> None:
+        self.widgets[name].set(text_s)
+
+    def invalidate(self) -> None:
+        for w in self.widgets.values():
+            w.dirty = True
+
+    def draw(self, screen) -> List[pygame.Rect]:
+        dirty = []
+        for w in self.widgets.values():
+            if w.dirty:
+                dirty.extend(w.draw(screen, self.bg))
+        return dirty
+
+
+class MetricsOverlay:
+    """
+    Toggleable box of timer percentiles from a metrics.Registry. Text is
+    re-rendered at most every refresh_sec so the overlay itself stays cheap.
+    """
+
+    def __init__(self, rect, font, reg, names, bg: Color, refresh_sec: float = 0.25):
+        self.rect = pygame.Rect(rect)
+        self.font = font
+        self.reg = reg
+        self.names = list(names)
+        self.bg = bg
+        self.refresh_sec = float(refresh_sec)
+        self.visible = False
+        self._shown = False   # drawn on screen right now
+        self._next = 0.0
+
+    def toggle(self) -> None:
+        self.visible = not self.visible
+        self._next = 0.0
+
+    def draw(self, screen, now: float) -> List[pygame.Rect]:
+        if not self.visible:
+            if self._shown:
+                screen.fill(self.bg, self.rect)
+                self._shown = False
+                return [self.rect]
+            return []
+        if now < self._next:
+            return []
+        self._next = now + self.refresh_sec
+
+        screen.fill((30, 30, 38), self.rect)
+        pygame.draw.rect(screen, (70, 70, 85), self.rect, 1)
+        x, y = self.rect.x + 8, self.rect.y + 6
+        line_h = self.font.get_linesize()
+        header = f"{'ms':14s}{'p50':>7s}{'p90':>7s}{'p99':>7s}"
+        screen.blit(text_cache.render(header, self.font, (150, 150, 165)), (x, y))
+        for name in self.names:
+            y += line_h
+            h = self.reg.hists.get(name)
+            if h is None or not h.count:
+                row = f"{name:14s}{'-':>7s}{'-':>7s}{'-':>7s}"
+            else:
+                row = f"{name:14s}" + "".join(f"{h.quantile(q) * 1e3:7.2f}" for q in (0.5, 0.9, 0.99))
+            # numbers change constantly; render directly rather than filling the shared cache
+            screen.blit(self.font.render(row, True, (200, 230, 200)), (x, y))
+        self._shown = True
+        return [self.rect]
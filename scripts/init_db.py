@@ -1,6 +1,7 @@
 # scripts/init_db.py
 from pathlib import Path
 from sqlalchemy import create_engine, text
+from news_search import ensure_fts
 
 DB_PATH = Path("data/db/news.db")
 
@@ -21,11 +22,12 @@ CREATE TABLE IF NOT EXISTS symbols (
 
 CREATE TABLE IF NOT EXISTS news_items (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
+  provider TEXT,         -- e.g. 'finnhub', unique together with provider_id
   provider_id TEXT,
   symbol_id INTEGER,
   sector_id INTEGER,
   headline TEXT,
-  body TEXT,
+  body TEXT,             -- legacy: text lives compressed in news_bodies (article_store.py)
   source TEXT,
   url TEXT,
   published_at INTEGER,  -- unix seconds (UTC)
@@ -57,11 +59,13 @@ CREATE TABLE IF NOT EXISTS news_features (
 );
 
 CREATE TABLE IF NOT EXISTS train_rows (
-  news_id INTEGER PRIMARY KEY,
+  news_id INTEGER,
   symbol_id INTEGER,
   t0 INTEGER,
-  horizon_min INTEGER,
+  horizon_min INTEGER,    -- one label per headline and horizon
   y REAL,
+  updated_at INTEGER NOT NULL DEFAULT 0,   -- unix seconds of the last write (export_training_set)
+  PRIMARY KEY(news_id, horizon_min),
   FOREIGN KEY(news_id) REFERENCES news_items(id),
   FOREIGN KEY(symbol_id) REFERENCES symbols(id)
 );
@@ -75,6 +79,32 @@ CREATE TABLE IF NOT EXISTS news_predictions (
   FOREIGN KEY(news_id) REFERENCES news_items(id)
 );
 
+-- article text, zstd-compressed (see article_store.py)
+CREATE TABLE IF NOT EXISTS news_bodies (
+  news_id INTEGER PRIMARY KEY,
+  dict_id INTEGER NOT NULL DEFAULT 0,  -- article_dicts.id, 0 = no dictionary
+  raw_len INTEGER,
+  body BLOB,
+  FOREIGN KEY(news_id) REFERENCES news_items(id)
+);
+
+CREATE TABLE IF NOT EXISTS article_dicts (
+  id INTEGER PRIMARY KEY,   -- the dictionary's own zstd id
+  created_at REAL,
+  samples INTEGER,
+  size INTEGER,
+  data BLOB
+);
+
+-- news_fts changes waiting for article_store.sync()
+CREATE TABLE IF NOT EXISTS fts_pending (
+  news_id INTEGER PRIMARY KEY,
+  indexed INTEGER NOT NULL,  -- 1: news_fts holds the values below
+  headline TEXT,
+  symbol_id INTEGER,
+  source TEXT
+);
+
 -- Indexes for speed
 CREATE INDEX IF NOT EXISTS idx_news_items_symbol_id ON news_items(symbol_id);
 CREATE INDEX IF NOT EXISTS idx_news_items_published_at ON news_items(published_at);
@@ -83,6 +113,69 @@ CREATE INDEX IF NOT EXISTS idx_train_rows_symbol_id ON train_rows(symbol_id);
 CREATE INDEX IF NOT EXISTS idx_news_pred_created_at ON news_predictions(created_at);
 """
 
+def ensure_provider_key(conn) -> bool:
+    """
+    Add news_items.provider to DBs created before it existed, and the unique
+    (provider, provider_id, symbol_id) index that makes ingestion idempotent
+    (one row per symbol an article was returned for). The index can not be
+    built while duplicates remain; returns False (run compact_news.py) in
+    that case.
+    """
+    cols = [r[1] for r in conn.execute(text("PRAGMA table_info(news_items)")).fetchall()]
+    if "provider" not in cols:
+        conn.execute(text("ALTER TABLE news_items ADD COLUMN provider TEXT"))
+    # rows from before the column: finnhub backfills (and synth_corpus test data)
+    conn.execute(text("""
+        UPDATE news_items
+        SET provider = CASE WHEN provider_id LIKE 'synth-%' THEN 'synth' ELSE 'finnhub' END
+        WHERE provider IS NULL
+    """))
+    dup = conn.execute(text("""
+        SELECT 1 FROM news_items WHERE provider_id IS NOT NULL
+        GROUP BY provider, provider_id, symbol_id HAVING COUNT(*) > 1 LIMIT 1
+    """)).fetchone()
+    if dup:
+        return False
+    # DBs indexed on (provider, provider_id) alone: widen the key
+    if len(conn.execute(text("PRAGMA index_info(ux_news_items_provider)")).fetchall()) == 2:
+        conn.execute(text("DROP INDEX ux_news_items_provider"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_news_items_provider ON news_items(provider, provider_id, symbol_id)"))
+    return True
+
+def ensure_label_key(conn) -> None:
+    """
+    Re-key train_rows by (news_id, horizon_min) on DBs created when news_id
+    alone was the key, so labels for several horizons can coexist. Rows
+    without a horizon came from the daily build (1440). Also adds
+    updated_at (0 for rows written before it) and its index.
+    """
+    cols = conn.execute(text("PRAGMA table_info(train_rows)")).fetchall()
+    if [r[1] for r in sorted(cols, key=lambda r: r[5]) if r[5]] == ["news_id"]:
+        conn.execute(text("ALTER TABLE train_rows RENAME TO train_rows_v1"))
+        conn.execute(text("""
+            CREATE TABLE train_rows (
+              news_id INTEGER,
+              symbol_id INTEGER,
+              t0 INTEGER,
+              horizon_min INTEGER,
+              y REAL,
+              updated_at INTEGER NOT NULL DEFAULT 0,
+              PRIMARY KEY(news_id, horizon_min),
+              FOREIGN KEY(news_id) REFERENCES news_items(id),
+              FOREIGN KEY(symbol_id) REFERENCES symbols(id)
+            )
+        """))
+        conn.execute(text("""
+            INSERT INTO train_rows(news_id, symbol_id, t0, horizon_min, y)
+            SELECT news_id, symbol_id, t0, COALESCE(horizon_min, 1440), y FROM train_rows_v1
+        """))
+        conn.execute(text("DROP TABLE train_rows_v1"))
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_train_rows_symbol_id ON train_rows(symbol_id)"))
+    elif "updated_at" not in [r[1] for r in cols]:
+        conn.execute(text("ALTER TABLE train_rows ADD COLUMN updated_at INTEGER NOT NULL DEFAULT 0"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_train_rows_updated_at ON train_rows(updated_at)"))
+
 def main():
     DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
@@ -94,6 +187,11 @@ def main():
     with engine.begin() as conn:
         for s in stmts:
             conn.execute(text(s))
+        # full-text index + sync triggers (not splittable on ';')
+        ensure_fts(conn)
+        ensure_label_key(conn)
+        if not ensure_provider_key(conn):
+            print("news_items has duplicate (provider, provider_id, symbol_id) rows; run compact_news.py to merge them.")
 
     print(f"DB initialized: {DB_PATH}")
 
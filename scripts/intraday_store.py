@@ -0,0 +1,254 @@
+import argparse
+import json
+import math
+import os
+import shutil
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Minute bars live outside SQLite, one directory per (symbol, UTC date):
+#   data/intraday/<SYMBOL>/<YYYY-MM-DD>/{ts,open,high,low,close,volume}.npy
+# Each column is a plain .npy array, sorted by ts (bar start, unix seconds),
+# so a day loads as zero-copy memory maps and as-of lookups are a binary
+# search over the ts column.
+ROOT = "data/intraday"
+BAR_SEC = 60
+DAY = 86400
+COLUMNS = ("ts", "open", "high", "low", "close", "volume")
+DTYPES = {"ts": np.int64, "open": np.float64, "high": np.float64, "low": np.float64, "close": np.float64, "volume": np.float64}
+MAX_OPEN_DAYS = 512   # memory-mapped partitions kept open at once
+
+
+def day_str(day: int) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(int(day) * DAY))
+
+
+def day_num(s: str) -> int:
+    return int(pd.Timestamp(s, tz="UTC").timestamp()) // DAY
+
+
+class IntradayStore:
+    def __init__(self, root: str = ROOT):
+        self.root = root
+        self._days: Dict[str, np.ndarray] = {}      # symbol -> sorted day numbers
+        self._open: "OrderedDict[Tuple[str, int], Dict[str, np.ndarray]]" = OrderedDict()
+
+    # ---- layout ----
+    def _dir(self, symbol: str, day: int) -> str:
+        return os.path.join(self.root, symbol, day_str(day))
+
+    def symbols(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def days(self, symbol: str) -> np.ndarray:
+        d = self._days.get(symbol)
+        if d is None:
+            p = os.path.join(self.root, symbol)
+            names = [n for n in os.listdir(p) if not n.startswith(".")] if os.path.isdir(p) else []
+            d = self._days[symbol] = np.array(sorted(day_num(n) for n in names), dtype=np.int64)
+        return d
+
+    # ---- write ----
+    def write_day(self, symbol: str, day: int, cols: Dict[str, np.ndarray]) -> None:
+        """Replace one (symbol, day) partition; written to a temp dir, then renamed into place."""
+        order = np.argsort(cols["ts"], kind="stable")
+        final = self._dir(symbol, day)
+        tmp = final + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        for c in COLUMNS:
+            np.save(os.path.join(tmp, c + ".npy"), np.ascontiguousarray(np.asarray(cols[c], dtype=DTYPES[c])[order]))
+        self._open.pop((symbol, day), None)
+        if os.path.isdir(final):
+            shutil.rmtree(final)
+        os.replace(tmp, final)
+        self._days.pop(symbol, None)
+
+    def append_bars(self, symbol: str, bars: pd.DataFrame) -> int:
+        """
+        Merge bars (columns ts/open/high/low/close/volume) into the store,
+        one partition per UTC date touched. Later bars win on duplicate ts.
+        """
+        if bars.empty:
+            return 0
+        bars = bars.sort_values("ts", kind="stable")
+        for day, part in bars.groupby(bars["ts"].to_numpy(np.int64) // DAY):
+            old = self.day(symbol, int(day))
+            if old is not None:
+                part = pd.concat([pd.DataFrame({c: np.asarray(old[c]) for c in COLUMNS}), part[list(COLUMNS)]])
+            part = part.drop_duplicates("ts", keep="last")
+            self.write_day(symbol, int(day), {c: part[c].to_numpy() for c in COLUMNS})
+        return len(bars)
+
+    # ---- read ----
+    def day(self, symbol: str, day: int) -> Optional[Dict[str, np.ndarray]]:
+        """Memory-mapped columns of one partition (None if absent)."""
+        key = (symbol, int(day))
+        cols = self._open.get(key)
+        if cols is not None:
+            self._open.move_to_end(key)
+            return cols
+        d = self._dir(symbol, day)
+        if not os.path.isdir(d):
+            return None
+        cols = {c: np.load(os.path.join(d, c + ".npy"), mmap_mode="r") for c in COLUMNS}
+        self._open[key] = cols
+        if len(self._open) > MAX_OPEN_DAYS:
+            self._open.popitem(last=False)
+        return cols
+
+    def asof(self, symbol: str, ts: np.ndarray, col: str = "close") -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Value of `col` from the last bar that had closed by each ts
+        (bar start + BAR_SEC <= ts), looking back across earlier dates when
+        needed. Returns (values, bar_ts); NaN / -1 where there is no such bar.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        vals = np.full(len(ts), np.nan)
+        bar_ts = np.full(len(ts), -1, dtype=np.int64)
+        days = self.days(symbol)
+        if not len(days) or not len(ts):
+            return vals, bar_ts
+
+        cutoff = ts - BAR_SEC
+        # partition holding (or last before) each query's day
+        p = np.searchsorted(days, cutoff // DAY, side="right") - 1
+        for pi in np.unique(p[p >= 0]):
+            sel = np.flatnonzero(p == pi)
+            k = pi
+            while k >= 0 and len(sel):
+                cols = self.day(symbol, int(days[k]))
+                i = np.searchsorted(cols["ts"], cutoff[sel], side="right") - 1
+                hit = i >= 0
+                vals[sel[hit]] = cols[col][i[hit]]
+                bar_ts[sel[hit]] = cols["ts"][i[hit]]
+                sel = sel[~hit]   # before the first bar of this day: try the previous date
+                k -= 1
+        return vals, bar_ts
+
+    def first_after(self, symbol: str, ts: np.ndarray, col: str = "close") -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Value of `col` from the first bar that closes at or after each ts
+        (bar start + BAR_SEC >= ts), looking ahead to later dates when
+        needed. Returns (values, bar_ts); NaN / -1 where there is no such bar.
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        vals = np.full(len(ts), np.nan)
+        bar_ts = np.full(len(ts), -1, dtype=np.int64)
+        days = self.days(symbol)
+        if not len(days) or not len(ts):
+            return vals, bar_ts
+
+        start = ts - BAR_SEC   # earliest bar start that qualifies
+        # partition holding (or first after) each query's day
+        p = np.searchsorted(days, start // DAY, side="left")
+        for pi in np.unique(p[p < len(days)]):
+            sel = np.flatnonzero(p == pi)
+            k = pi
+            while k < len(days) and len(sel):
+                cols = self.day(symbol, int(days[k]))
+                i = np.searchsorted(cols["ts"], start[sel], side="left")
+                hit = i < len(cols["ts"])
+                vals[sel[hit]] = cols[col][i[hit]]
+                bar_ts[sel[hit]] = cols["ts"][i[hit]]
+                sel = sel[~hit]   # after the last bar of this day: try the next date
+                k += 1
+        return vals, bar_ts
+
+    def forward_returns(self, symbol: str, ts: np.ndarray, minutes) -> np.ndarray:
+        """
+        Log return for each horizon m, shape (n, len(minutes)): from the first
+        bar that closes at or after ts to the last bar closed by ts + m. NaN
+        unless that exit bar closes inside [ts, ts + m] in the entry bar's
+        session (a headline outside the session gets no return, not 0).
+        """
+        ts = np.asarray(ts, dtype=np.int64)
+        p0, b0 = self.first_after(symbol, ts)
+        out = np.full((len(ts), len(minutes)), np.nan)
+        last_day = self.days(symbol)[-1] if len(self.days(symbol)) else -1
+        for j, m in enumerate(minutes):
+            t1 = ts + int(m) * 60
+            p1, b1 = self.asof(symbol, t1)
+            ok = (b0 >= 0) & (b1 >= b0) & (b1 + BAR_SEC >= ts) & (b1 // DAY == b0 // DAY)
+            # past the end of the stored history the as-of price would be stale
+            ok &= (t1 - BAR_SEC) // DAY <= last_day
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[ok, j] = np.log(p1[ok] / p0[ok])
+        return out
+
+
+def check() -> None:
+    """Label sanity on a throwaway store: no look-ahead, no label outside the session."""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as root:
+        store = IntradayStore(root)
+        day0 = 19_000 * DAY
+        open_ts = day0 + 14 * 3600 + 1800           # 14:30 UTC, 390 one-minute bars
+        ts = open_ts + BAR_SEC * np.arange(390)
+        close = 100.0 + np.arange(390, dtype=float)  # +1 per bar
+        store.append_bars("CHK", pd.DataFrame({"ts": ts, "open": close, "high": close, "low": close,
+                                               "close": close, "volume": 1.0}))
+        # published 10:30 into the session (mid-bar): entry is the bar closing after it, not before
+        pub = open_ts + 630
+        r = store.forward_returns("CHK", np.array([pub]), [5])[0, 0]
+        want = math.log(close[14] / close[10])       # bars closing at 14:41 and 14:45
+        assert abs(r - want) < 1e-12, (r, want)
+        # overnight (after the close, and before the next open): no label
+        for t in (open_ts + 390 * BAR_SEC + 3600, day0 + DAY + 3600):
+            r = store.forward_returns("CHK", np.array([t]), [15, 60])
+            assert np.isnan(r).all(), (t, r)
+    print("intraday_store: checks passed")
+
+
+def import_csv(store: IntradayStore, symbol: str, path: str) -> int:
+    """CSV with a unix `ts` (or parseable `datetime`) column plus open/high/low/close/volume."""
+    df = pd.read_csv(path)
+    df.columns = [c.strip().lower() for c in df.columns]
+    if "ts" not in df.columns:
+        df["ts"] = pd.to_datetime(df["datetime"], utc=True).astype("int64") // 10**9
+    if "volume" not in df.columns:
+        df["volume"] = 0.0
+    return store.append_bars(symbol.upper(), df[list(COLUMNS)])
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Partitioned columnar store for intraday (minute) bars.")
+    ap.add_argument("--root", default=ROOT)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("import", help="merge a CSV of minute bars for one symbol")
+    p.add_argument("symbol")
+    p.add_argument("csv")
+    p = sub.add_parser("info", help="list symbols, partitions and bar counts")
+    p = sub.add_parser("asof", help="print the as-of close for a symbol at unix ts")
+    p.add_argument("symbol")
+    p.add_argument("ts", type=int, nargs="+")
+    sub.add_parser("check", help="run the label sanity checks on a throwaway store")
+    args = ap.parse_args()
+
+    if args.cmd == "check":
+        check()
+        return
+    store = IntradayStore(args.root)
+    if args.cmd == "import":
+        n = import_csv(store, args.symbol, args.csv)
+        print(f"Imported {n} bars for {args.symbol.upper()}")
+    elif args.cmd == "info":
+        for s in store.symbols():
+            days = store.days(s)
+            bars = sum(len(store.day(s, int(d))["ts"]) for d in days)
+            print(f"{s:8s} {len(days):5d} days  {bars:9d} bars  {day_str(days[0]) if len(days) else ''}..{day_str(days[-1]) if len(days) else ''}")
+    else:
+        vals, bar_ts = store.asof(args.symbol.upper(), np.array(args.ts))
+        for t, v, b in zip(args.ts, vals, bar_ts):
+            print(json.dumps({"ts": t, "close": None if np.isnan(v) else float(v), "bar_ts": int(b)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Headline direction from a weighted phrase lexicon.
+#
+# Phrases are matched on whole words ("miss" does not fire inside
+# "mission"); a trailing "*" makes the last word a prefix ("downgrade*"
+# matches downgrades/downgraded). All phrases compile into one token trie,
+# so a scan costs a few dict lookups per token whatever the lexicon size.
+# A negation cue ("not", "fails to", ...) flips the sign of terms that
+# start within NEGATION_WINDOW tokens after it.
+LEXICON_PATH = "data/lexicon.json"   # optional override, same shape as DEFAULT_LEXICON
+
+DEFAULT_LEXICON = {
+    "terms": {
+        # positive
+        "beat": 1.0, "beats": 1.0, "tops estimates": 1.0, "raises guidance": 1.0, "raised guidance": 1.0,
+        "upgrade*": 1.0, "record revenue": 1.0, "surge*": 1.0, "jump*": 1.0, "soar*": 1.0, "rall*": 0.8,
+        "wins": 1.0, "strong demand": 1.0, "margins expand": 0.8, "buyback": 0.5,
+        # negative
+        "miss": -1.0, "misses": -1.0, "missed": -1.0, "misses estimates": -1.0, "cuts guidance": -1.0,
+        "cut guidance": -1.0, "downgrade*": -1.0, "lawsuit*": -1.0, "probe": -1.0, "recall*": -1.0,
+        "plunge*": -1.0, "falls": -1.0, "fell": -1.0, "weak demand": -1.0, "tumble*": -1.0, "slump*": -1.0,
+        "investigation": -0.8, "bankrupt*": -1.5,
+    },
+    "negations": ["not", "no", "never", "without", "fails to", "failed to", "denies",
+                  "don't", "doesn't", "didn't", "won't", "isn't", "aren't", "wasn't", "weren't",
+                  "hasn't", "haven't", "hadn't", "can't", "couldn't", "shouldn't", "wouldn't"],
+    "negation_window": 3,
+    "threshold": 0.5,
+}
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# trie node keys besides child words: value stored at the end of a phrase
+_END = "\0end"
+_PREFIX = "\0prefix"   # {word-prefix: node} for phrases whose last word ends in *
+
+
+def _normalize(s: str) -> str:
+    # curly apostrophes (common in wire copy) would split "doesn’t" in two
+    return (s or "").replace("\u2019", "'").lower()
+
+
+def tokenize(s: str) -> List[str]:
+    return _TOKEN.findall(_normalize(s))
+
+
+class Lexicon:
+    def __init__(self, terms: Dict[str, float], negations: Sequence[str] = (),
+                 negation_window: int = 3, threshold: float = 0.5):
+        self.window = int(negation_window)
+        self.threshold = float(threshold)
+        self.n_terms = len(terms)
+        self.root: dict = {}
+        self.max_prefix = 0
+        for phrase, w in terms.items():
+            self._add(phrase, ("term", float(w)))
+        for phrase in negations:
+            self._add(phrase, ("neg", 0.0))
+
+    @classmethod
+    def from_config(cls, cfg: dict) -> "Lexicon":
+        return cls(cfg["terms"], cfg.get("negations", ()), cfg.get("negation_window", 3), cfg.get("threshold", 0.5))
+
+    @classmethod
+    def load(cls, path: str = LEXICON_PATH) -> "Lexicon":
+        """The JSON lexicon at path if it exists, else DEFAULT_LEXICON."""
+        if path and os.path.exists(path):
+            with open(path) as f:
+                return cls.from_config(json.load(f))
+        return cls.from_config(DEFAULT_LEXICON)
+
+    def _add(self, phrase: str, value: Tuple[str, float]) -> None:
+        words = tokenize(phrase)
+        if not words:
+            return
+        node = self.root
+        for w in words[:-1]:
+            node = node.setdefault(w, {})
+        last = words[-1]
+        if phrase.rstrip().endswith("*"):
+            node = node.setdefault(_PREFIX, {}).setdefault(last, {})
+            self.max_prefix = max(self.max_prefix, len(last))
+        else:
+            node = node.setdefault(last, {})
+        node[_END] = value
+
+    def _step(self, node: dict, tok: str) -> List[dict]:
+        """Children of node reached by tok: the exact word, then any word-prefix entries."""
+        out = []
+        nxt = node.get(tok)
+        if nxt is not None:
+            out.append(nxt)
+        pre = node.get(_PREFIX)
+        if pre is not None:
+            for k in range(min(len(tok), self.max_prefix), 0, -1):
+                p = pre.get(tok[:k])
+                if p is not None:
+                    out.append(p)
+        return out
+
+    def matches(self, tokens: Sequence[str]) -> List[Tuple[int, int, str, float]]:
+        """
+        Leftmost-longest matches as (start, end, kind, weight); a term inside
+        a negation window carries its flipped weight.
+        """
+        out = []
+        neg_until = -1
+        i, n = 0, len(tokens)
+        while i < n:
+            best = None
+            frontier = [self.root]
+            j = i
+            while frontier and j < n:
+                nxt = []
+                for node in frontier:
+                    nxt.extend(self._step(node, tokens[j]))
+                j += 1
+                for node in nxt:
+                    if _END in node:
+                        best = (j, node[_END])
+                        break
+                frontier = nxt
+            if best is None:
+                i += 1
+                continue
+            end, (kind, w) = best
+            if kind == "neg":
+                neg_until = end - 1 + self.window
+            else:
+                out.append((i, end, kind, -w if i <= neg_until else w))
+            i = end
+        return out
+
+    def score(self, headline: str) -> float:
+        return sum(m[3] for m in self.matches(tokenize(headline)))
+
+    def direction(self, headline: str) -> int:
+        s = self.score(headline)
+        return 1 if s >= self.threshold else (-1 if s <= -self.threshold else 0)
+
+    def score_many(self, headlines: Iterable[str]) -> np.ndarray:
+        """Scores for a batch: one tokenizer pass over the whole batch, then one trie walk per headline."""
+        headlines = list(headlines)
+        joined = _normalize("\n".join((h or "").replace("\n", " ") for h in headlines))
+        out = np.zeros(len(headlines))
+        line = 0
+        toks: List[str] = []
+        pos = 0
+        for m in _TOKEN.finditer(joined):
+            # headline boundaries: count newlines skipped since the last token
+            nl = joined.count("\n", pos, m.start())
+            if nl:
+                out[line] = sum(x[3] for x in self.matches(toks))
+                line += nl
+                toks = []
+            toks.append(m.group())
+            pos = m.end()
+        if headlines:
+            out[line] = sum(x[3] for x in self.matches(toks))
+        return out
+
+    def classify(self, headlines: Iterable[str]) -> np.ndarray:
+        """Direction (-1, 0, +1) per headline, as int8."""
+        s = self.score_many(headlines)
+        return np.where(s >= self.threshold, 1, np.where(s <= -self.threshold, -1, 0)).astype(np.int8)
+
+
+_default: Optional[Lexicon] = None
+
+
+def default() -> Lexicon:
+    """Process-wide lexicon, loaded once from LEXICON_PATH (or the built-in one)."""
+    global _default
+    if _default is None:
+        _default = Lexicon.load(LEXICON_PATH)
+    return _default
+
+
+def check() -> None:
+    """Assert contracted negations flip the sign, straight or curly apostrophe, per headline and in a batch."""
+    lex = Lexicon.from_config(DEFAULT_LEXICON)
+    assert lex.direction("Acme beats estimates") == 1
+    negated = ("Acme didn't beat estimates", "Acme doesn\u2019t beat estimates", "Acme did not beat estimates")
+    for h in negated:
+        assert lex.direction(h) == -1, h
+    batch = ("Acme beats estimates",) + negated
+    assert lex.classify(batch).tolist() == [lex.direction(h) for h in batch], lex.classify(batch).tolist()
+    print("lexicon check ok")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Score headline direction with the phrase lexicon.")
+    ap.add_argument("headlines", nargs="*", help="headlines to score (default: read lines from stdin)")
+    ap.add_argument("--lexicon", default=LEXICON_PATH)
+    ap.add_argument("--dump-default", action="store_true", help="print the built-in lexicon as JSON")
+    ap.add_argument("--check", action="store_true", help="run the built-in sanity checks")
+    args = ap.parse_args()
+
+    if args.check:
+        check()
+        return
+    if args.dump_default:
+        print(json.dumps(DEFAULT_LEXICON, indent=2))
+        return
+    lex = Lexicon.load(args.lexicon)
+    if args.headlines:
+        for h in args.headlines:
+            toks = tokenize(h)
+            hits = [(" ".join(toks[a:b]), w) for a, b, _, w in lex.matches(toks)]
+            print(f"{lex.direction(h):+d}  {lex.score(h):+.2f}  {h}  {hits}")
+        return
+
+    lines = sys.stdin.read().splitlines()
+    t0 = time.perf_counter()
+    d = lex.classify(lines)
+    dt = time.perf_counter() - t0
+    print(f"{len(lines)} headlines in {dt:.2f}s ({len(lines) / max(dt, 1e-9):,.0f}/s): "
+          f"+1 {int((d > 0).sum())}  0 {int((d == 0).sum())}  -1 {int((d < 0).sum())}")
+
+
+if __name__ == "__main__":
+    main()
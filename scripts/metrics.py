@@ -0,0 +1,255 @@
+import atexit
+import functools
+import json
+import math
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+
+# Lightweight in-process instrumentation: named timers (log-bucket
+# histograms) and counters. Off unless NEWS_METRICS=1 or enable() is called;
+# NEWS_METRICS_OUT=path.json dumps a snapshot at exit ("{pid}" in the path is
+# replaced, for multi-process runs) and NEWS_METRICS_PORT=9100 serves
+# /metrics (Prometheus text) and /metrics.json from a background thread.
+ENV_ON = "NEWS_METRICS"
+ENV_OUT = "NEWS_METRICS_OUT"
+ENV_PORT = "NEWS_METRICS_PORT"
+PROM_PREFIX = "newstrader_"
+
+# buckets: BUCKETS_PER_OCTAVE per power of two from 2**MIN_EXP s (~60 ns)
+# to 2**(MIN_EXP + OCTAVES) s (~4.7 h); percentiles are within ~5%
+BUCKETS_PER_OCTAVE = 8
+MIN_EXP = -24
+OCTAVES = 38
+N_BUCKETS = BUCKETS_PER_OCTAVE * OCTAVES
+
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+class Histogram:
+    """Fixed log-bucket histogram of durations in seconds; observe() is O(1)."""
+
+    __slots__ = ("name", "counts", "count", "total", "max")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, sec: float) -> None:
+        if sec > 0.0:
+            i = int((math.log2(sec) - MIN_EXP) * BUCKETS_PER_OCTAVE)
+            i = 0 if i < 0 else (N_BUCKETS - 1 if i >= N_BUCKETS else i)
+        else:
+            i = 0
+        self.counts[i] += 1
+        self.count += 1
+        self.total += sec
+        if sec > self.max:
+            self.max = sec
+
+    def observe_many(self, secs: Iterable[float]) -> None:
+        for s in secs:
+            self.observe(s)
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                # geometric middle of the bucket
+                return min(self.max, 2.0 ** (MIN_EXP + (i + 0.5) / BUCKETS_PER_OCTAVE))
+        return self.max
+
+    def summary(self) -> dict:
+        out = {"count": self.count, "sum": self.total, "mean": self.total / self.count if self.count else 0.0, "max": self.max}
+        for q in QUANTILES:
+            out[f"p{int(q * 100)}"] = self.quantile(q)
+        return out
+
+
+class Counter:
+    """Monotonic item count; rate is over the span between first and last add()."""
+
+    __slots__ = ("name", "total", "first_ts", "last_ts")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.total = 0
+        self.first_ts = None
+        self.last_ts = None
+
+    def add(self, n: int = 1) -> None:
+        now = time.perf_counter()
+        if self.first_ts is None:
+            self.first_ts = now
+        self.last_ts = now
+        self.total += n
+
+    def rate(self) -> float:
+        if self.first_ts is None or self.last_ts == self.first_ts:
+            return 0.0
+        return self.total / (self.last_ts - self.first_ts)
+
+
+class _Timer:
+    __slots__ = ("h", "t0")
+
+    def __init__(self, h: Optional[Histogram]):
+        self.h = h
+
+    def __enter__(self):
+        if self.h is not None:
+            self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.h is not None:
+            self.h.observe(time.perf_counter() - self.t0)
+        return False
+
+
+class Registry:
+    def __init__(self):
+        self.enabled = False
+        self.started = time.time()
+        self.hists: Dict[str, Histogram] = {}
+        self.counters: Dict[str, Counter] = {}
+        self._server = None
+
+    def hist(self, name: str) -> Histogram:
+        h = self.hists.get(name)
+        if h is None:
+            h = self.hists[name] = Histogram(name)
+        return h
+
+    def counter(self, name: str) -> Counter:
+        c = self.counters.get(name)
+        if c is None:
+            c = self.counters[name] = Counter(name)
+        return c
+
+    def timer(self, name: str) -> _Timer:
+        """`with REG.timer("db.query"):` -- a no-op while disabled."""
+        return _Timer(self.hist(name) if self.enabled else None)
+
+    def count(self, name: str, n: int = 1) -> None:
+        if self.enabled:
+            self.counter(name).add(n)
+
+    def timed(self, name: str):
+        """Decorator form of timer()."""
+        def deco(fn):
+            @functools.wraps(fn)
+            def wrapper(*a, **kw):
+                if not self.enabled:
+                    return fn(*a, **kw)
+                t0 = time.perf_counter()
+                try:
+                    return fn(*a, **kw)
+                finally:
+                    self.hist(name).observe(time.perf_counter() - t0)
+            return wrapper
+        return deco
+
+    # ---- export ----
+    def snapshot(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "started": self.started,
+            "uptime_sec": time.time() - self.started,
+            "timers": {n: h.summary() for n, h in sorted(self.hists.items())},
+            "counters": {n: {"total": c.total, "per_sec": c.rate()} for n, c in sorted(self.counters.items())},
+        }
+
+    def to_json(self, path: str) -> None:
+        path = path.replace("{pid}", str(os.getpid()))
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for n, h in sorted(self.hists.items()):
+            m = PROM_PREFIX + _prom_name(n) + "_seconds"
+            lines.append(f"# TYPE {m} summary")
+            for q in QUANTILES:
+                lines.append(f'{m}{{quantile="{q}"}} {h.quantile(q):.9g}')
+            lines.append(f"{m}_sum {h.total:.9g}")
+            lines.append(f"{m}_count {h.count}")
+        for n, c in sorted(self.counters.items()):
+            m = PROM_PREFIX + _prom_name(n)
+            lines.append(f"# TYPE {m}_total counter")
+            lines.append(f"{m}_total {c.total}")
+            lines.append(f"# TYPE {m}_per_second gauge")
+            lines.append(f"{m}_per_second {c.rate():.9g}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Scrape endpoint on a daemon thread: /metrics and /metrics.json."""
+        if self._server is not None:
+            return
+        reg = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body, ctype = json.dumps(reg.snapshot()).encode(), "application/json"
+                elif self.path.startswith("/metrics"):
+                    body, ctype = reg.to_prometheus().encode(), "text/plain; version=0.0.4"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, int(port)), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+
+def _prom_name(name: str) -> str:
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+# process-wide registry used by the scripts
+REG = Registry()
+hist = REG.hist
+timer = REG.timer
+timed = REG.timed
+count = REG.count
+
+
+def enable() -> None:
+    REG.enabled = True
+
+
+def configure_from_env() -> None:
+    """Honour NEWS_METRICS / NEWS_METRICS_OUT / NEWS_METRICS_PORT (runs on import)."""
+    if os.getenv(ENV_ON, "") not in ("", "0") or os.getenv(ENV_OUT) or os.getenv(ENV_PORT):
+        enable()
+    out = os.getenv(ENV_OUT)
+    if out:
+        atexit.register(REG.to_json, out)
+    port = os.getenv(ENV_PORT)
+    if port:
+        try:
+            REG.serve(int(port))
+        except OSError as e:
+            # e.g. a child process of a script that already owns the port
+            print(f"metrics: not serving on :{port} ({e})")
+
+
+configure_from_env()
@@ -1,6 +1,7 @@
 import math, random, time
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from order_book import BUY, SELL, MM_OWNER, PLAYER_OWNER, NPC_OWNER, OrderBook
 
 @dataclass
 class NewsShock:
@@ -23,7 +24,12 @@ class ModeAEngine:
         half_life: float = 5.0,        # seconds (faster decay = more HFT feel)
         base_spread: float = 0.02,
         fee_per_share: float = 0.001,
-        slip0: float = 0.03            # more slippage during high-impact news
+        slip0: float = 0.03,           # more slippage during high-impact news
+        seed: Optional[int] = None,    # fixed seed => reproducible price path
+        book: Optional[OrderBook] = None,  # route fills through a limit order book
+        flow_lambda: float = 2e-5,     # mid move per share of net crowd flow
+        flow_spread: float = 1e-6,     # spread widening per share of recent |flow|
+        flow_half_life: float = 1.0    # seconds
     ):
         self.mid = float(mid0)
         self.dt = float(dt)
@@ -34,8 +40,24 @@ class ModeAEngine:
         self.fee = float(fee_per_share)
         self.slip0 = float(slip0)
 
+        self.rng = random.Random(seed)
+
+        self.flow_lambda = float(flow_lambda)
+        self.flow_spread = float(flow_spread)
+        self.flow_decay = math.exp(-math.log(2.0) / float(flow_half_life) * self.dt)
+        self.flow_level = 0.0   # decayed sum of |net crowd flow|
+        self.last_drift = 0.0   # news drift used by the last tick (crowd reads it)
+
         self.shocks: List[NewsShock] = []
         self.player = Player()
+        self.last_filled = 0    # shares the last buy/sell filled (fewer than asked if the book ran dry)
+
+        # optional order book: the engine's spread/impact model becomes a
+        # liquidity ladder posted by MM_OWNER, and fills walk real depth
+        self.book = book
+        self.fills = None
+        if self.book is not None:
+            self.book.requote(MM_OWNER, self.mid - base_spread / 2.0, self.mid + base_spread / 2.0, 0.0)
 
     def _decay(self, age: float) -> float:
         # exponential decay with half-life
@@ -65,7 +87,7 @@ class ModeAEngine:
             now = time.time()
 
         imp = self._impact_level(now)
-        spread = self.base_spread * (1.0 + 3.0 * imp)
+        spread = self.base_spread * (1.0 + 3.0 * imp) + self.flow_spread * self.flow_level
         bid = self.mid - spread / 2.0
         ask = self.mid + spread / 2.0
         return bid, ask, spread, imp
@@ -81,7 +103,19 @@ class ModeAEngine:
             now = time.time()
 
         self._cleanup_shocks(now)
+        drift = self._news_drift(now)
+
+        # volatility scales with active impact (including direction=0 news)
+        _, _, _, imp = self.quotes(now)
+        sigma = self.base_sigma * (1.0 + 2.5 * imp)
+
+        eps = self.rng.gauss(0.0, 1.0)
+        d_mid = drift * self.dt + sigma * math.sqrt(self.dt) * eps
+        self.mid = max(0.01, self.mid + d_mid)
+        self._settle(now)
+        return self.mid
 
+    def _news_drift(self, now: float) -> float:
         # news drift sum (directional), then clamp to prevent runaway trends
         drift = 0.0
         for s in self.shocks:
@@ -91,40 +125,80 @@ class ModeAEngine:
             drift += self.alpha * s.direction * s.impact * self._decay(age)
 
         drift = max(-0.25, min(0.25, drift))  # clamp drift per second
+        self.last_drift = drift
+        return drift
+
+    def _settle(self, now: float) -> None:
+        # after the mid moved: decay crowd flow, requote the book
+        self.flow_level *= self.flow_decay
+        if self.book is not None:
+            bid, ask, _, imp = self.quotes(now)
+            self.book.requote(MM_OWNER, bid, ask, imp)
+            self.fills = self.book.drain_fills()
+
+    def _book_fill(self, side: int, qty: int, p: Player) -> Tuple[int, float]:
+        """Walk the book for p; returns (filled, avg_px). Raises if nothing fills."""
+        filled, notional = self.book.market(side, qty, PLAYER_OWNER)
+        if filled == 0:
+            raise RuntimeError(f"order book has no {'asks' if side == BUY else 'bids'} to fill {qty} against")
+        p.cash -= side * notional + self.fee * filled
+        p.inv += side * filled
+        return filled, notional / filled
+
+    def apply_flow(self, net_qty: int, now: Optional[float] = None) -> None:
+        """
+        Net order flow from the simulated crowd: pushes the mid (linear
+        impact) and widens the spread until it decays. In book mode the flow
+        also takes liquidity from the book as one market order.
+        """
+        if self.book is not None and net_qty:
+            self.book.market(BUY if net_qty > 0 else SELL, abs(net_qty), NPC_OWNER)
+        self.mid = max(0.01, self.mid + self.flow_lambda * net_qty)
+        self.flow_level += abs(net_qty)
 
-        # volatility scales with active impact (including direction=0 news)
-        _, _, _, imp = self.quotes(now)
-        sigma = self.base_sigma * (1.0 + 2.5 * imp)
-
-        eps = random.gauss(0.0, 1.0)
-        d_mid = drift * self.dt + sigma * math.sqrt(self.dt) * eps
-        self.mid = max(0.01, self.mid + d_mid)
-
-        return self.mid
+    def submit_orders(self, orders):
+        """Batch of order_book.ORDER_DTYPE rows from bots/players (book mode only)."""
+        return self.book.submit_batch(orders)
 
-    def buy(self, qty: int = 1, now: Optional[float] = None) -> float:
+    def buy(self, qty: int = 1, now: Optional[float] = None, player: Optional[Player] = None) -> float:
+        """
+        Average fill price. In book mode the order walks the book's depth and
+        may fill only partly (see last_filled); RuntimeError if nothing fills.
+        """
         if now is None:
             now = time.time()
+        p = self.player if player is None else player
+        if self.book is not None:
+            self.last_filled, px = self._book_fill(BUY, qty, p)
+            return px
 
         bid, ask, _, imp = self.quotes(now)
         slippage = self.slip0 * imp
         px = ask + slippage
 
-        self.player.cash -= px * qty + self.fee * qty
-        self.player.inv += qty
+        p.cash -= px * qty + self.fee * qty
+        p.inv += qty
+        self.last_filled = qty
         return px
 
-    def sell(self, qty: int = 1, now: Optional[float] = None) -> float:
+    def sell(self, qty: int = 1, now: Optional[float] = None, player: Optional[Player] = None) -> float:
+        """Mirror of buy()."""
         if now is None:
             now = time.time()
+        p = self.player if player is None else player
+        if self.book is not None:
+            self.last_filled, px = self._book_fill(SELL, qty, p)
+            return px
 
         bid, ask, _, imp = self.quotes(now)
         slippage = self.slip0 * imp
         px = bid - slippage
 
-        self.player.cash += px * qty - self.fee * qty
-        self.player.inv -= qty
+        p.cash += px * qty - self.fee * qty
+        p.inv -= qty
+        self.last_filled = qty
         return px
 
-    def pnl(self) -> float:
-        return self.player.cash + self.player.inv * self.mid
+    def pnl(self, player: Optional[Player] = None) -> float:
+        p = self.player if player is None else player
+        return p.cash + p.inv * self.mid
@@ -0,0 +1,165 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Sequence
+
+import joblib
+import numpy as np
+
+import metrics
+
+# A family of impact models: one per symbol and per sector where there was
+# enough data to beat the fallback, plus the global model (impact_xgb.joblib).
+# train_regressor.py --family writes the models and a manifest:
+#
+#   data/models/family/manifest.json
+#   data/models/family/symbol_<id>.joblib, sector_<id>.joblib
+#
+# The manifest maps every symbol_id to the most specific model that exists
+# for it (symbol -> sector -> global). Models are loaded the first time a
+# batch routes to them and at most CACHE_SIZE stay in memory (LRU); the
+# global model is pinned, so start-up costs one model however big the family.
+FAMILY_DIR = "data/models/family"
+MANIFEST = "manifest.json"
+GLOBAL = "global"
+CACHE_SIZE = 32
+
+
+def manifest_path(family_dir: Optional[str] = None) -> str:
+    return os.path.join(family_dir or FAMILY_DIR, MANIFEST)
+
+
+def load_manifest(family_dir: Optional[str] = None) -> Optional[dict]:
+    p = manifest_path(family_dir)
+    if not os.path.exists(p):
+        return None
+    with open(p) as f:
+        return json.load(f)
+
+
+def _mtime(path: str) -> Optional[float]:
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+
+def save_manifest(manifest: dict, family_dir: Optional[str] = None) -> None:
+    os.makedirs(family_dir or FAMILY_DIR, exist_ok=True)
+    p = manifest_path(family_dir)
+    with open(p + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(p + ".tmp", p)
+
+
+class ModelRegistry:
+    """
+    predict(X, symbol_ids) splits a batch by the model each symbol routes
+    to, runs each model once on its rows and puts the results back in
+    order. `fallback` is the global model, or a path to load it from.
+    Picks up a new manifest (a retrained family) on the next batch, and
+    the global model when it is a path whose file changed (a plain or
+    --incremental retrain does not touch the manifest).
+    """
+
+    def __init__(self, fallback, family_dir: Optional[str] = None, cache_size: int = CACHE_SIZE):
+        self.family_dir = family_dir or FAMILY_DIR
+        self.cache_size = cache_size
+        self._fallback = fallback
+        self._global = None
+        self._cache: "OrderedDict[str, object]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._fallback_mtime = None
+        self.models: Dict[str, dict] = {}   # key -> manifest entry (path, rows, val_mae, ...)
+        self.routes: Dict[int, str] = {}    # symbol_id -> key
+        self.loads = 0
+        self._reload()
+
+    def _reload(self) -> None:
+        self._mtime = _mtime(manifest_path(self.family_dir))
+        m = load_manifest(self.family_dir) or {}
+        self.models = m.get("models", {})
+        self.routes = {int(k): v for k, v in m.get("routes", {}).items()}
+        self._cache.clear()
+        if isinstance(self._fallback, str):
+            # retrained with the family: load the global model from its path again too
+            self._global = None
+
+    def _check_manifest(self) -> None:
+        if _mtime(manifest_path(self.family_dir)) != self._mtime:
+            self._reload()
+        if isinstance(self._fallback, str) and _mtime(self._fallback) != self._fallback_mtime:
+            self._global = None
+
+    def route(self, symbol_id) -> str:
+        if symbol_id is None:
+            return GLOBAL
+        return self.routes.get(int(symbol_id), GLOBAL)
+
+    def get(self, key: str):
+        """The model for a route key, loading it on first use."""
+        if key == GLOBAL or key not in self.models:
+            if self._global is None:
+                if isinstance(self._fallback, str):
+                    self._fallback_mtime = _mtime(self._fallback)
+                    self._global = joblib.load(self._fallback)
+                else:
+                    self._global = self._fallback
+            return self._global
+        model = self._cache.get(key)
+        if model is not None:
+            self._cache.move_to_end(key)
+            metrics.count("registry.hit")
+            return model
+        metrics.count("registry.miss")
+        with metrics.timer("registry.load"):
+            model = joblib.load(self.models[key]["path"])
+        self.loads += 1
+        self._cache[key] = model
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return model
+
+    def predict(self, X, symbol_ids: Optional[Sequence] = None) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        with self._lock:
+            self._check_manifest()
+            if symbol_ids is None or not self.routes:
+                return np.asarray(self.get(GLOBAL).predict(X), dtype=float)
+            keys = np.array([self.route(s) for s in symbol_ids])
+            out = np.empty(len(X), dtype=float)
+            for key in np.unique(keys):
+                rows = np.flatnonzero(keys == key)
+                out[rows] = self.get(str(key)).predict(X[rows])
+            return out
+
+    def stats(self) -> dict:
+        return {"models": len(self.models), "routed_symbols": len(self.routes),
+                "loaded": len(self._cache), "loads": self.loads, "cache_size": self.cache_size}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Show the impact model family and where each symbol routes.")
+    ap.add_argument("--family-dir", default=None, help=f"default {FAMILY_DIR}")
+    ap.add_argument("--symbol-id", type=int, action="append", help="also show where this symbol routes")
+    args = ap.parse_args()
+
+    m = load_manifest(args.family_dir)
+    if m is None:
+        print(f"No model family under {args.family_dir or FAMILY_DIR}; train one with train_regressor.py --family.")
+        return
+    print(f"family trained {time.strftime('%Y-%m-%d %H:%M', time.localtime(m['created_at']))}, "
+          f"{len(m['models'])} models, {len(m['routes'])} routed symbols, "
+          f"{len(m.get('rejected', {}))} rejected (fallback was better)")
+    print(f"{'key':<14}{'rows':>8}{'val_mae':>11}{'fallback':>11}")
+    for key, e in sorted(m["models"].items()):
+        fb = e.get("fallback_mae")
+        print(f"{key:<14}{e['rows']:>8}{e['val_mae']:>11.5f}{(f'{fb:.5f}' if fb is not None else '-'):>11}")
+    if args.symbol_id:
+        for sid in args.symbol_id:
+            print(f"symbol {sid} -> {m['routes'].get(str(sid), GLOBAL)}")
+
+
+if __name__ == "__main__":
+    main()
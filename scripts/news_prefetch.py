@@ -0,0 +1,167 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import metrics
+
+# (news_id, headline, direction, impact) -- what every fetch_scored_pool returns
+Item = Tuple[int, str, int, float]
+
+EMPTY_RETRY_SEC = 5.0   # how long to wait before asking again after an empty pool
+
+
+class StratifiedSampler:
+    """
+    Picks n headlines from a fetched pool with a fixed share per impact band,
+    so a round gets a controlled mix of shock sizes. `mix` maps a band's
+    lower impact edge to its share, e.g. {0.3: 0.5, 0.5: 0.35, 0.7: 0.15}
+    (bands run to the next edge; the last one is open-ended). A band short of
+    items gives its slots to the others. Output order is shuffled.
+    Plain attributes only, so it pickles into a SimProcess.
+    """
+
+    def __init__(self, mix: Dict[float, float], n: int, seed: Optional[int] = None):
+        self.edges = sorted(mix)
+        total = float(sum(mix.values()))
+        self.shares = [mix[e] / total for e in self.edges]
+        self.n = int(n)
+        self.seed = seed
+        self._calls = 0
+
+    def band(self, impact: float) -> int:
+        b = -1
+        for i, e in enumerate(self.edges):
+            if impact >= e:
+                b = i
+        return b
+
+    def __call__(self, pool: Sequence[Item]) -> List[Item]:
+        self._calls += 1
+        rng = random.Random(None if self.seed is None else self.seed * 1_000_003 + self._calls)
+        bands: List[List[Item]] = [[] for _ in self.edges]
+        for it in pool:
+            b = self.band(it[3])
+            if b >= 0:
+                bands[b].append(it)
+        for b in bands:
+            rng.shuffle(b)
+
+        want = [int(round(s * self.n)) for s in self.shares]
+        out: List[Item] = []
+        for b, k in zip(bands, want):
+            out.extend(b[:k])
+            del b[:k]
+        # shortfall in one band is filled from whatever the others have left
+        spare = [it for b in bands for it in b]
+        rng.shuffle(spare)
+        out.extend(spare[: max(0, self.n - len(out))])
+        rng.shuffle(out)
+        return out
+
+
+class PoolPrefetcher:
+    """
+    Double-buffered news pool. `current` is served by next(); a daemon
+    thread keeps `pending` filled with the following pool, and when current
+    runs out the two are swapped under a lock (a reference swap). next()
+    never touches the DB, so running out of headlines costs the caller's
+    loop nothing; if the refill is not ready yet it returns None.
+    """
+
+    def __init__(self, pool_fn: Callable[..., List[Item]], pool_args: Tuple = (),
+                 sampler: Optional[Callable[[Sequence[Item]], List[Item]]] = None,
+                 timer_name: str = "news.pool_refresh"):
+        self.pool_fn = pool_fn
+        self.pool_args = pool_args
+        self.sampler = sampler
+        self.timer_name = timer_name
+        self._current: List[Item] = []
+        self._i = 0
+        self.last_size = 0   # size of the most recent fetch; 0 means the DB had nothing
+        self._pending: Optional[List[Item]] = None
+        self._lock = threading.Lock()
+        self._want = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _fetch(self) -> List[Item]:
+        with metrics.timer(self.timer_name):
+            pool = list(self.pool_fn(*self.pool_args))
+        pool = self.sampler(pool) if self.sampler is not None else pool
+        self.last_size = len(pool)
+        return pool
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._want.wait()
+            if self._stop.is_set():
+                break
+            self._want.clear()
+            try:
+                pool = self._fetch()
+            except Exception as e:   # keep serving what we have; try again later
+                print(f"news prefetch failed: {e}")
+                pool = []
+            with self._lock:
+                self._pending = pool
+            if not pool:
+                self._stop.wait(EMPTY_RETRY_SEC)
+
+    def start(self) -> "PoolPrefetcher":
+        """Fill the first pool synchronously (before the loop starts), then prefetch the next."""
+        self._current = self._fetch()
+        self._thread = threading.Thread(target=self._run, name="news-prefetch", daemon=True)
+        self._thread.start()
+        self._want.set()
+        return self
+
+    def next(self) -> Optional[Item]:
+        if self._i >= len(self._current):
+            with self._lock:
+                pool, self._pending = self._pending, None
+            if pool is None:
+                metrics.count("news.pool_starved")
+                return None
+            self._current, self._i = pool, 0
+            self._want.set()   # start on the one after
+            if not pool:
+                return None
+        it = self._current[self._i]
+        self._i += 1
+        return it
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._want.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+
+def prefetcher(pool_fn, pool_args=(), mix: Optional[Dict[float, float]] = None, sample_n: int = 0,
+               seed: Optional[int] = None) -> PoolPrefetcher:
+    """Convenience: a started PoolPrefetcher, stratified by `mix` when given."""
+    sampler = StratifiedSampler(mix, sample_n, seed) if mix else None
+    return PoolPrefetcher(pool_fn, pool_args, sampler).start()
+
+
+if __name__ == "__main__":
+    # quick check: sampler band counts, and a slow pool_fn never stalling next()
+    pool = [(i, f"h{i}", 1, (i % 100) / 100.0) for i in range(1000)]
+    s = StratifiedSampler({0.3: 0.5, 0.5: 0.35, 0.7: 0.15}, n=40, seed=1)
+    got = s(pool)
+    print(len(got), [sum(1 for it in got if s.band(it[3]) == b) for b in range(len(s.edges))])
+
+    def slow_pool(n):
+        time.sleep(0.2)
+        return pool[:n]
+
+    p = PoolPrefetcher(slow_pool, (10,)).start()
+    served, worst = 0, 0.0
+    for _ in range(100):
+        t0 = time.perf_counter()
+        served += p.next() is not None
+        worst = max(worst, time.perf_counter() - t0)
+        time.sleep(0.01)
+    p.stop()
+    print(f"served {served}/100, slowest next() {worst * 1e6:.0f} us")
@@ -0,0 +1,157 @@
+import argparse
+import time
+from typing import List, Optional, Sequence, Tuple
+
+import pandas as pd
+from sqlalchemy import bindparam, create_engine, text
+
+import article_store
+import metrics
+
+engine = create_engine("sqlite:///data/db/news.db")
+
+# FTS5 index news_fts(headline, body, symbol_id, source), kept by
+# article_store.py next to the compressed bodies it indexes. The porter
+# tokenizer lets "regulator" match "regulators". symbol_id and source are
+# indexed too, so a per-symbol theme query intersects posting lists instead
+# of ranking every match in the corpus.
+
+# bm25 column weights (headline, body, symbol_id, source): a hit in the
+# headline counts more than one in the body; the filter columns do not score
+BM25_WEIGHTS = (3.0, 1.0, 0.0, 0.0)
+
+# named themes for game rounds (FTS5 query syntax; anything else is used as a raw query)
+THEMES = {
+    "earnings": "earnings OR estimates OR guidance OR revenue OR eps OR quarter*",
+    "regulation": "regulator* OR probe OR lawsuit OR antitrust OR sec OR fine* OR investigation",
+    "deals": "acquire* OR acquisition OR merger OR buyout OR contract OR deal",
+    "analysts": "upgrade* OR downgrade* OR analyst* OR \"price target\"",
+    "products": "launch* OR recall* OR product* OR demand",
+}
+
+
+def ensure_fts(conn) -> None:
+    """Create or upgrade the index (see article_store.ensure) and bring it up to date."""
+    article_store.ensure(conn)
+
+
+def rebuild() -> None:
+    with engine.begin() as conn:
+        ensure_fts(conn)
+        article_store.reindex(conn)
+
+
+def theme_query(theme: str) -> str:
+    return THEMES.get(theme, theme)
+
+
+def _phrase(s: str) -> str:
+    return '"' + s.replace('"', '""') + '"'
+
+
+@metrics.timed("db.news_search")
+def search(query: str, symbol_id: Optional[int] = None, sources: Optional[Sequence[str]] = None,
+           min_impact: Optional[float] = None, since: Optional[int] = None, until: Optional[int] = None,
+           scored_only: bool = True, limit: int = 300) -> List[Tuple]:
+    """
+    Best-ranked headlines matching an FTS5 query (or THEMES name), filtered
+    by symbol, sources, impact and a published_at range:
+    [(news_id, headline, direction, impact, published_at, rank), ...].
+    Lower rank is better (bm25). With scored_only, unscored news is left out;
+    otherwise direction/impact are None for it.
+    """
+    match = f"({theme_query(query)})"
+    where = ["news_fts MATCH :q"]
+    params = {"lim": int(limit)}
+    # symbol/source narrow the FTS match itself; the SQL filters keep them exact
+    if symbol_id is not None:
+        match = f"symbol_id : {int(symbol_id)} AND {match}"
+        where.append("n.symbol_id = :sid")
+        params["sid"] = int(symbol_id)
+    if sources:
+        match = "source : (" + " OR ".join(_phrase(s) for s in sources) + f") AND {match}"
+        where.append("n.source IN :sources")
+        params["sources"] = list(sources)
+    if min_impact is not None:
+        where.append("p.impact_score >= :min_imp")
+        params["min_imp"] = float(min_impact)
+    if since is not None:
+        where.append("n.published_at >= :since")
+        params["since"] = int(since)
+    if until is not None:
+        where.append("n.published_at < :until")
+        params["until"] = int(until)
+    params["q"] = match
+
+    q = text(f"""
+        SELECT n.id, n.headline, p.direction, p.impact_score, n.published_at,
+               bm25(news_fts, {", ".join(map(str, BM25_WEIGHTS))}) AS rank
+        FROM news_fts
+        JOIN news_items n ON n.id = news_fts.rowid
+        {"JOIN" if scored_only else "LEFT JOIN"} news_predictions p ON p.news_id = n.id
+        WHERE {" AND ".join(where)}
+        ORDER BY rank
+        LIMIT :lim
+    """)
+    if sources:
+        q = q.bindparams(bindparam("sources", expanding=True))
+    with engine.begin() as conn:
+        return conn.execute(q, params).fetchall()
+
+
+def themed_pool(theme: str, symbol_id: Optional[int], limit: int, sources: Optional[Sequence[str]] = None,
+                min_impact: float = 0.0) -> List[Tuple[int, str, int, float]]:
+    """
+    Game pool in fetch_scored_pool()'s shape, [(news_id, headline, direction, impact)]:
+    the best `limit` matches for the theme, played oldest first.
+    """
+    rows = search(theme, symbol_id=symbol_id, sources=sources, min_impact=min_impact, limit=limit)
+    rows = sorted(rows, key=lambda r: r[0])
+    return [(int(r[0]), r[1], int(r[2]), float(r[3])) for r in rows if r[2]]
+
+
+def _ts(s: Optional[str]) -> Optional[int]:
+    return None if s is None else int(pd.Timestamp(s, tz="UTC").timestamp())
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Full-text search over news_items (SQLite FTS5).")
+    ap.add_argument("query", nargs="?", help=f"FTS5 query or theme ({', '.join(THEMES)})")
+    ap.add_argument("--symbol", default=None)
+    ap.add_argument("--source", action="append", default=None, help="repeatable")
+    ap.add_argument("--min-impact", type=float, default=None)
+    ap.add_argument("--since", default=None, help="YYYY-MM-DD")
+    ap.add_argument("--until", default=None, help="YYYY-MM-DD")
+    ap.add_argument("--all", action="store_true", help="include news without predictions")
+    ap.add_argument("--limit", type=int, default=20)
+    ap.add_argument("--rebuild", action="store_true", help="(re)build the index from news_items and news_bodies")
+    args = ap.parse_args()
+
+    if args.rebuild:
+        t0 = time.perf_counter()
+        rebuild()
+        print(f"Rebuilt news_fts in {time.perf_counter() - t0:.1f}s")
+    if not args.query:
+        return
+
+    sid = None
+    if args.symbol:
+        with engine.begin() as conn:
+            row = conn.execute(text("SELECT id FROM symbols WHERE symbol = :s"), {"s": args.symbol.upper()}).fetchone()
+        if not row:
+            raise SystemExit(f"Symbol {args.symbol} not found in symbols table.")
+        sid = int(row[0])
+
+    t0 = time.perf_counter()
+    rows = search(args.query, sid, args.source, args.min_impact, _ts(args.since), _ts(args.until),
+                  scored_only=not args.all, limit=args.limit)
+    dt = time.perf_counter() - t0
+    for nid, headline, d, imp, pub, rank in rows:
+        when = time.strftime("%Y-%m-%d %H:%M", time.gmtime(int(pub or 0)))
+        score = "" if imp is None else f"{int(d):+d} {float(imp):.2f}"
+        print(f"{rank:8.2f}  {nid:>8}  {when}  {score:>8}  {headline}")
+    print(f"{len(rows)} results in {dt * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+from typing import Optional, Sequence
+
+import numpy as np
+
+MOMENTUM, MEAN_REV, NEWS_MM = 0, 1, 2
+
+
+class NpcPopulation:
+    """
+    A crowd of simulated traders whose state lives in NumPy arrays.
+
+    Each tick every agent decides at once (no Python loop per agent):
+      - momentum: trade in the direction of the fast/slow EMA gap
+      - mean-reversion: fade deviations of mid from the slow EMA
+      - news-reactive market makers: lean with the active news drift, shade
+        against their own inventory, and pull size when impact is high
+    The net order flow is handed back to the engine via apply_flow(), which
+    moves the mid and widens the spread.
+    """
+
+    def __init__(
+        self,
+        n: int = 10_000,
+        mix: Sequence[float] = (0.4, 0.4, 0.2),   # momentum, mean-rev, news MM
+        max_pos: int = 50,
+        seed: Optional[int] = None,
+    ):
+        self.n = int(n)
+        self.rng = np.random.default_rng(seed)
+        rng = self.rng
+
+        self.kind = rng.choice(3, size=self.n, p=np.asarray(mix) / np.sum(mix)).astype(np.int8)
+        self.is_mom = self.kind == MOMENTUM
+        self.is_rev = self.kind == MEAN_REV
+        self.is_mm = self.kind == NEWS_MM
+
+        # per-agent parameters
+        self.threshold = rng.uniform(2e-5, 2e-4, self.n)    # relative signal needed to act
+        self.size = rng.integers(1, 4, self.n)               # shares per decision
+        self.activity = rng.uniform(0.01, 0.08, self.n)      # chance to act on a given tick
+        self.max_pos = int(max_pos)
+
+        # per-agent book-keeping
+        self.inv = np.zeros(self.n, dtype=np.int64)
+        self.cash = np.zeros(self.n)
+
+        # shared market view
+        self.ema_fast = None
+        self.ema_slow = None
+        self.fast_a = 0.2
+        self.slow_a = 0.02
+        self.last_net = 0
+
+    def decide(self, mid: float, news_drift: float, imp: float) -> np.ndarray:
+        """Signed order quantity for every agent this tick."""
+        if self.ema_fast is None:
+            self.ema_fast = self.ema_slow = mid
+        self.ema_fast += self.fast_a * (mid - self.ema_fast)
+        self.ema_slow += self.slow_a * (mid - self.ema_slow)
+
+        trend = (self.ema_fast - self.ema_slow) / mid
+        dev = (mid - self.ema_slow) / mid
+
+        signal = np.zeros(self.n)
+        signal[self.is_mom] = np.sign(trend) * (abs(trend) > self.threshold[self.is_mom])
+        signal[self.is_rev] = -np.sign(dev) * (abs(dev) > self.threshold[self.is_rev])
+
+        # market makers: news lean minus inventory skew, scaled down in fast markets
+        mm_inv = self.inv[self.is_mm] / self.max_pos
+        signal[self.is_mm] = (np.sign(news_drift) * min(1.0, abs(news_drift) * 20.0) - mm_inv) * (1.0 - 0.5 * imp)
+
+        active = self.rng.random(self.n) < self.activity * (1.0 + 2.0 * imp)
+        qty = np.rint(signal * self.size * active).astype(np.int64)
+
+        # position limits
+        return np.clip(qty, -self.max_pos - self.inv, self.max_pos - self.inv)
+
+    def step(self, eng, now: float) -> int:
+        """One vectorized decision round against a ModeAEngine; returns net flow."""
+        bid, ask, _, imp = eng.quotes(now)
+        qty = self.decide(eng.mid, eng.last_drift, imp)
+
+        # crowd trades at the touch
+        px = np.where(qty > 0, ask, bid)
+        self.cash -= qty * px
+        self.inv += qty
+
+        net = int(qty.sum())
+        self.last_net = net
+        if net:
+            eng.apply_flow(net, now)
+        return net
+
+    def pnl(self, mid: float) -> np.ndarray:
+        return self.cash + self.inv * mid
+
+    def pnl_by_kind(self, mid: float):
+        p = self.pnl(mid)
+        return {name: float(p[self.kind == k].sum()) for k, name in ((MOMENTUM, "momentum"), (MEAN_REV, "mean_rev"), (NEWS_MM, "news_mm"))}
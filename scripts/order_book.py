@@ -0,0 +1,342 @@
+from collections import deque
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+BUY, SELL = 1, -1
+LIMIT, MARKET, CANCEL = 0, 1, 2
+
+# owner ids reserved by the game; bots / players use anything >= 3
+MM_OWNER = 0
+PLAYER_OWNER = 1
+NPC_OWNER = 2
+
+# an order id is (slot generation << SLOT_BITS) | slot
+SLOT_BITS = 32
+SLOT_MASK = (1 << SLOT_BITS) - 1
+COMPACT_MIN_DEAD = 16   # cancelled ids a level may hold before its queue is compacted
+
+# one row per incoming order in submit_batch()
+ORDER_DTYPE = np.dtype([
+    ("kind", "i1"),    # LIMIT / MARKET / CANCEL
+    ("side", "i1"),    # BUY / SELL (ignored for CANCEL)
+    ("px", "f8"),      # limit price (ignored for MARKET / CANCEL)
+    ("qty", "i8"),
+    ("owner", "i8"),
+    ("oid", "i8"),     # order to cancel (CANCEL only)
+])
+
+FILL_DTYPE = np.dtype([
+    ("maker_oid", "i8"),
+    ("maker_owner", "i8"),
+    ("taker_owner", "i8"),
+    ("side", "i1"),    # taker side
+    ("px", "f8"),
+    ("qty", "i8"),
+])
+
+
+class OrderBook:
+    """
+    Price-level limit order book for one instrument.
+
+    Prices live on a fixed tick grid centred on mid0. Aggregate size per level
+    is kept in NumPy arrays (bid_qty / ask_qty) so best-price search and depth
+    snapshots are vectorized; each level also has a FIFO deque of slots for
+    time priority. Order state is held in flat arrays indexed by slot.
+    Cancels are lazy: the order is zeroed and skipped when it reaches the
+    front of its queue (or dropped when most of a queue is dead). A slot is
+    reused once its order is gone from the queue, so a book requoted every
+    tick stays the same size; the id handed out carries the slot's
+    generation, and a stale id can not cancel the slot's next order.
+    """
+
+    def __init__(self, mid0: float, tick: float = 0.01, n_levels: int = 20000, order_capacity: int = 1 << 14):
+        self.tick = float(tick)
+        self.n_levels = int(n_levels)
+        self.base = int(round(mid0 / self.tick)) - self.n_levels // 2
+
+        self.bid_qty = np.zeros(self.n_levels, dtype=np.int64)
+        self.ask_qty = np.zeros(self.n_levels, dtype=np.int64)
+        self._queues: Dict[Tuple[int, int], deque] = {}
+        self.best_bid = -1
+        self.best_ask = self.n_levels
+
+        self._cap = int(order_capacity)
+        self.o_qty = np.zeros(self._cap, dtype=np.int64)
+        self.o_side = np.zeros(self._cap, dtype=np.int8)
+        self.o_level = np.zeros(self._cap, dtype=np.int64)
+        self.o_owner = np.zeros(self._cap, dtype=np.int64)
+        self._gen = [0] * self._cap   # per slot; a list, it is only ever read one at a time
+        self.n_slots = 0
+        self._free: List[int] = []
+        self._dead: Dict[Tuple[int, int], int] = {}   # (side, level) -> cancelled slots still queued
+        self._by_owner: Dict[int, Set[int]] = {}      # owner -> ids of its live orders
+
+        self._fills: List[tuple] = []
+
+    # ---- price grid ----
+    def level_of(self, px: float) -> int:
+        return int(round(px / self.tick)) - self.base
+
+    def price_of(self, level: int) -> float:
+        return round((level + self.base) * self.tick, 8)
+
+    def best_bid_px(self) -> Optional[float]:
+        return self.price_of(self.best_bid) if self.best_bid >= 0 else None
+
+    def best_ask_px(self) -> Optional[float]:
+        return self.price_of(self.best_ask) if self.best_ask < self.n_levels else None
+
+    def depth(self, n: int = 5):
+        """Top-n (price, qty) per side: ([(bid_px, qty)...], [(ask_px, qty)...])."""
+        bids = np.flatnonzero(self.bid_qty[: self.best_bid + 1])[::-1][:n]
+        asks = self.best_ask + np.flatnonzero(self.ask_qty[self.best_ask:])[:n]
+        return (
+            [(self.price_of(int(l)), int(self.bid_qty[l])) for l in bids],
+            [(self.price_of(int(l)), int(self.ask_qty[l])) for l in asks],
+        )
+
+    # ---- internals ----
+    def _grow(self) -> None:
+        self._cap *= 2
+        self._gen.extend([0] * (self._cap - len(self._gen)))
+        for name in ("o_qty", "o_side", "o_level", "o_owner"):
+            old = getattr(self, name)
+            new = np.zeros(self._cap, dtype=old.dtype)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+    def _oid(self, slot: int) -> int:
+        return (self._gen[slot] << SLOT_BITS) | slot
+
+    def _slot(self, oid: int) -> int:
+        """Slot of a live id, or -1 (unknown, or the slot has moved on to another order)."""
+        slot = oid & SLOT_MASK
+        if oid < 0 or slot >= self.n_slots or self._gen[slot] != oid >> SLOT_BITS:
+            return -1
+        return slot
+
+    def _release(self, slot: int) -> None:
+        # only once the slot has left its queue
+        self._gen[slot] += 1
+        self._free.append(slot)
+
+    def _forget(self, slot: int) -> None:
+        # the order is done (filled or cancelled): drop it from its owner's set
+        owner = int(self.o_owner[slot])
+        ids = self._by_owner.get(owner)
+        if ids is not None:
+            ids.discard(self._oid(slot))
+            if not ids:
+                del self._by_owner[owner]
+
+    def _clear_level(self, key: Tuple[int, int]) -> None:
+        # the level's size is 0, so every slot still queued there is dead
+        q = self._queues[key]
+        for slot in q:
+            self._release(slot)
+        q.clear()
+        self._dead.pop(key, None)
+
+    # the next level is almost always within a few ticks, so scan outward in
+    # small vectorized chunks instead of over the whole side
+    def _next_ask(self, level: int, chunk: int = 64) -> int:
+        for start in range(max(0, level), self.n_levels, chunk):
+            nz = np.flatnonzero(self.ask_qty[start:start + chunk])
+            if len(nz):
+                return start + int(nz[0])
+        return self.n_levels
+
+    def _next_bid(self, level: int, chunk: int = 64) -> int:
+        for stop in range(min(level, self.n_levels - 1) + 1, 0, -chunk):
+            start = max(0, stop - chunk)
+            nz = np.flatnonzero(self.bid_qty[start:stop])
+            if len(nz):
+                return start + int(nz[-1])
+        return -1
+
+    def _match(self, side: int, qty: int, owner: int, limit_level: Optional[int]) -> Tuple[int, float]:
+        """Take liquidity from the opposite side; returns (filled, notional)."""
+        filled = 0
+        notional = 0.0
+        if side == BUY:
+            book_qty, key_side = self.ask_qty, SELL
+        else:
+            book_qty, key_side = self.bid_qty, BUY
+        o_qty = self.o_qty
+
+        while qty > 0:
+            level = self.best_ask if side == BUY else self.best_bid
+            if level < 0 or level >= self.n_levels:
+                break
+            if limit_level is not None and (level > limit_level if side == BUY else level < limit_level):
+                break
+            key = (key_side, level)
+            q = self._queues[key]
+            px = self.price_of(level)
+            while qty > 0 and q:
+                slot = q[0]
+                avail = int(o_qty[slot])
+                if avail == 0:  # cancelled
+                    q.popleft()
+                    self._release(slot)
+                    self._dead[key] -= 1
+                    continue
+                take = avail if avail < qty else qty
+                o_qty[slot] = avail - take
+                book_qty[level] -= take
+                qty -= take
+                filled += take
+                notional += take * px
+                self._fills.append((self._oid(slot), int(self.o_owner[slot]), owner, side, px, take))
+                if take == avail:
+                    q.popleft()
+                    self._forget(slot)
+                    self._release(slot)
+            if book_qty[level] == 0:
+                self._clear_level(key)
+                if side == BUY:
+                    self.best_ask = self._next_ask(level + 1)
+                else:
+                    self.best_bid = self._next_bid(level - 1)
+        return filled, notional
+
+    def _rest(self, side: int, level: int, qty: int, owner: int) -> int:
+        if self._free:
+            slot = self._free.pop()
+        else:
+            if self.n_slots >= self._cap:
+                self._grow()
+            slot = self.n_slots
+            self.n_slots += 1
+        self.o_qty[slot] = qty
+        self.o_side[slot] = side
+        self.o_level[slot] = level
+        self.o_owner[slot] = owner
+        oid = self._oid(slot)
+        self._by_owner.setdefault(owner, set()).add(oid)
+
+        q = self._queues.get((side, level))
+        if q is None:
+            q = self._queues[(side, level)] = deque()
+        q.append(slot)
+        if side == BUY:
+            self.bid_qty[level] += qty
+            if level > self.best_bid:
+                self.best_bid = level
+        else:
+            self.ask_qty[level] += qty
+            if level < self.best_ask:
+                self.best_ask = level
+        return oid
+
+    # ---- public API ----
+    def limit(self, side: int, px: float, qty: int, owner: int) -> Tuple[int, int, float]:
+        """
+        Limit order: crosses what it can at px or better, rests the remainder.
+        Returns (oid or -1 if fully filled / off-grid, filled, notional).
+        """
+        level = self.level_of(px)
+        filled, notional = self._match(side, int(qty), owner, level)
+        rest = int(qty) - filled
+        if rest <= 0 or not 0 <= level < self.n_levels:
+            return -1, filled, notional
+        return self._rest(side, level, rest, owner), filled, notional
+
+    def market(self, side: int, qty: int, owner: int) -> Tuple[int, float]:
+        """Market order: walks the opposite side. Returns (filled, notional)."""
+        return self._match(side, int(qty), owner, None)
+
+    def cancel(self, oid: int) -> bool:
+        slot = self._slot(oid)
+        if slot < 0:
+            return False
+        left = int(self.o_qty[slot])
+        if left == 0:
+            return False
+        self.o_qty[slot] = 0
+        self._forget(slot)
+        level = int(self.o_level[slot])
+        side = int(self.o_side[slot])
+        key = (side, level)
+        book_qty = self.bid_qty if side == BUY else self.ask_qty
+        book_qty[level] -= left
+        if book_qty[level] == 0:
+            # only dead ids remain on this level; drop them now
+            self._clear_level(key)
+            if side == BUY and level == self.best_bid:
+                self.best_bid = self._next_bid(level - 1)
+            elif side == SELL and level == self.best_ask:
+                self.best_ask = self._next_ask(level + 1)
+            return True
+        dead = self._dead.get(key, 0) + 1
+        q = self._queues[key]
+        if dead >= COMPACT_MIN_DEAD and 2 * dead > len(q):
+            # e.g. quotes reposted every tick behind someone's resting order
+            live = deque()
+            for s in q:
+                if self.o_qty[s]:
+                    live.append(s)
+                else:
+                    self._release(s)
+            self._queues[key] = live
+            self._dead.pop(key, None)
+        else:
+            self._dead[key] = dead
+        return True
+
+    def cancel_owner(self, owner: int) -> int:
+        n = 0
+        for oid in self._by_owner.pop(owner, ()):
+            n += self.cancel(oid)
+        return n
+
+    def submit_batch(self, orders: np.ndarray) -> np.ndarray:
+        """
+        Process a whole ORDER_DTYPE array in arrival order (one call per tick).
+        Returns an array of (oid, filled, notional) per input row.
+        """
+        res = []
+        kinds = orders["kind"].tolist()
+        sides = orders["side"].tolist()
+        pxs = orders["px"].tolist()
+        qtys = orders["qty"].tolist()
+        owners = orders["owner"].tolist()
+        oids = orders["oid"].tolist()
+        for i in range(len(kinds)):
+            k = kinds[i]
+            if k == LIMIT:
+                res.append(self.limit(sides[i], pxs[i], qtys[i], owners[i]))
+            elif k == MARKET:
+                f, n = self.market(sides[i], qtys[i], owners[i])
+                res.append((-1, f, n))
+            else:
+                res.append((oids[i], int(self.cancel(oids[i])), 0.0))
+        return np.array(res, dtype=[("oid", "i8"), ("filled", "i8"), ("notional", "f8")])
+
+    def drain_fills(self) -> np.ndarray:
+        """All fills since the last drain as a FILL_DTYPE array."""
+        fills = np.array(self._fills, dtype=FILL_DTYPE) if self._fills else np.zeros(0, dtype=FILL_DTYPE)
+        self._fills = []
+        return fills
+
+    def requote(self, owner: int, bid: float, ask: float, imp: float,
+                levels: int = 5, base_depth: int = 50, step_ticks: int = 2) -> None:
+        """
+        Designated liquidity from the engine's spread/impact model: replace
+        owner's quotes with a ladder starting at (bid, ask). Depth thins out
+        as impact rises, so large orders slip more during news.
+        """
+        self.cancel_owner(owner)
+        depth = max(1, int(base_depth * (1.0 - 0.7 * min(1.0, imp))))
+        b0 = self.level_of(bid)
+        a0 = max(self.level_of(ask), b0 + 1)
+        for k in range(levels):
+            size = max(1, depth * (k + 1))  # deeper levels carry more size
+            bl = b0 - k * step_ticks
+            al = a0 + k * step_ticks
+            if 0 <= bl < self.n_levels and bl < self.best_ask:
+                self._rest(BUY, bl, size, owner)
+            if 0 <= al < self.n_levels and al > self.best_bid:
+                self._rest(SELL, al, size, owner)
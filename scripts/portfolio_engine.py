@@ -0,0 +1,191 @@
+import math
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class SpilloverMatrix:
+    """
+    Sparse n x n matrix (COO triplets) mapping per-symbol news state to the
+    state each symbol actually feels: its own news plus spillover from sector
+    peers / correlated names. matvec is a single np.bincount, so the cost is
+    O(nnz) per tick with no Python loop over symbols.
+    """
+
+    def __init__(self, n: int, rows, cols, vals):
+        self.n = int(n)
+        self.rows = np.asarray(rows, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.vals = np.asarray(vals, dtype=np.float64)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.vals)
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        return np.bincount(self.rows, weights=self.vals * x[self.cols], minlength=self.n)
+
+
+def build_spillover(
+    sector_ids: Sequence[Optional[int]],
+    sector_weight: float = 0.25,
+    corr_pairs: Iterable[Tuple[int, int, float]] = (),
+) -> SpilloverMatrix:
+    """
+    Identity (own news) + sector_weight between every pair of names in the
+    same sector + any explicit (i, j, w) correlation pairs (applied both ways).
+    Names with sector_id None only feel their own news and explicit pairs.
+    """
+    n = len(sector_ids)
+    rows: List[np.ndarray] = [np.arange(n)]
+    cols: List[np.ndarray] = [np.arange(n)]
+    vals: List[np.ndarray] = [np.ones(n)]
+
+    by_sector = {}
+    for i, sec in enumerate(sector_ids):
+        if sec is not None:
+            by_sector.setdefault(sec, []).append(i)
+
+    for members in by_sector.values():
+        if len(members) < 2:
+            continue
+        m = np.asarray(members)
+        r, c = np.meshgrid(m, m, indexing="ij")
+        off = r != c
+        rows.append(r[off])
+        cols.append(c[off])
+        vals.append(np.full(int(off.sum()), float(sector_weight)))
+
+    for i, j, w in corr_pairs:
+        rows.append(np.array([i, j]))
+        cols.append(np.array([j, i]))
+        vals.append(np.array([w, w], dtype=float))
+
+    return SpilloverMatrix(n, np.concatenate(rows), np.concatenate(cols), np.concatenate(vals))
+
+
+class PortfolioEngine:
+    """
+    Multi-symbol version of ModeAEngine.
+
+    Same dynamics, but vectorized over the universe and expressed relative to
+    each name's price (defaults match ModeAEngine at mid=200). Because every
+    shock shares one half-life, the sum of decaying shocks is kept as a state
+    vector that is multiplied by a constant decay factor each tick instead of
+    re-summing a shock list; spillover is then one sparse mat-vec.
+    """
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        mids0: Sequence[float],
+        spill: SpilloverMatrix,
+        dt: float = 0.05,
+        base_sigma: float = 1e-4,      # relative, per sqrt(second)
+        alpha: float = 7.5e-4,         # relative drift scale per second
+        max_drift: float = 1.25e-3,    # clamp on relative drift per second
+        half_life: float = 5.0,        # seconds
+        base_spread: float = 1e-4,     # relative
+        fee_per_share: float = 0.001,
+        slip0: float = 1.5e-4,         # relative slippage at full impact
+        seed: Optional[int] = None,
+    ):
+        self.symbols = list(symbols)
+        self.index = {s: i for i, s in enumerate(self.symbols)}
+        self.n = len(self.symbols)
+        self.mids = np.asarray(mids0, dtype=np.float64).copy()
+        self.spill = spill
+        self.dt = float(dt)
+        self.base_sigma = float(base_sigma)
+        self.alpha = float(alpha)
+        self.max_drift = float(max_drift)
+        self.base_spread = float(base_spread)
+        self.fee = float(fee_per_share)
+        self.slip0 = float(slip0)
+        self.decay = math.exp(-math.log(2.0) / float(half_life) * self.dt)
+        self.rng = np.random.default_rng(seed)
+
+        # own-name news state (already scaled by alpha for drift)
+        self.drift_state = np.zeros(self.n)
+        self.imp_state = np.zeros(self.n)
+
+        # effective (post-spillover) state, refreshed every tick
+        self.drift = np.zeros(self.n)
+        self.imp = np.zeros(self.n)
+
+        self.inv = np.zeros(self.n, dtype=np.int64)
+        self.cash = 0.0
+
+    def add_news(self, sym_idx: int, direction: int, impact: float) -> None:
+        if impact <= 0:
+            return
+        self.imp_state[sym_idx] += impact
+        if direction != 0:
+            self.drift_state[sym_idx] += self.alpha * direction * impact
+        self._refresh()
+
+    def add_sector_news(self, mask: np.ndarray, direction: int, impact: float) -> None:
+        """Sector/global headline: applies directly to every name in mask."""
+        if impact <= 0:
+            return
+        self.imp_state[mask] += impact
+        if direction != 0:
+            self.drift_state[mask] += self.alpha * direction * impact
+        self._refresh()
+
+    def _refresh(self) -> None:
+        self.drift = np.clip(self.spill.matvec(self.drift_state), -self.max_drift, self.max_drift)
+        self.imp = np.minimum(1.0, self.spill.matvec(self.imp_state))
+
+    def quotes(self):
+        spread = self.base_spread * self.mids * (1.0 + 3.0 * self.imp)
+        bid = self.mids - spread / 2.0
+        ask = self.mids + spread / 2.0
+        return bid, ask, spread, self.imp
+
+    def tick(self) -> np.ndarray:
+        self._refresh()
+        sigma = self.base_sigma * (1.0 + 2.5 * self.imp)
+        eps = self.rng.standard_normal(self.n)
+        r = self.drift * self.dt + sigma * math.sqrt(self.dt) * eps
+        self.mids = np.maximum(0.01, self.mids * np.exp(r))
+
+        self.drift_state *= self.decay
+        self.imp_state *= self.decay
+        return self.mids
+
+    def buy(self, sym_idx: int, qty: int = 1) -> float:
+        bid, ask, _, imp = self.quotes()
+        px = float(ask[sym_idx] * (1.0 + self.slip0 * imp[sym_idx]))
+        self.cash -= px * qty + self.fee * qty
+        self.inv[sym_idx] += qty
+        return px
+
+    def sell(self, sym_idx: int, qty: int = 1) -> float:
+        bid, ask, _, imp = self.quotes()
+        px = float(bid[sym_idx] * (1.0 - self.slip0 * imp[sym_idx]))
+        self.cash += px * qty - self.fee * qty
+        self.inv[sym_idx] -= qty
+        return px
+
+    def flatten(self) -> None:
+        for i in np.flatnonzero(self.inv):
+            q = int(self.inv[i])
+            if q > 0:
+                self.sell(i, q)
+            else:
+                self.buy(i, -q)
+
+    def position_values(self) -> np.ndarray:
+        return self.inv * self.mids
+
+    def pnl(self) -> float:
+        return self.cash + float(self.inv @ self.mids)
+
+    def gross_exposure(self) -> float:
+        return float(np.abs(self.position_values()).sum())
+
+
+def inv_penalty_vec(inv: np.ndarray, lam: float, power: float) -> float:
+    """Sum of per-symbol inventory penalties (same shape as the single-symbol game)."""
+    return float(lam * (np.abs(inv) ** power).sum())
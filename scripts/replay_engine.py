@@ -0,0 +1,356 @@
+import argparse
+import math
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from mode_a_engine import ModeAEngine
+
+engine = create_engine("sqlite:///data/db/news.db")
+
+# Replay mode: the mid follows a symbol's real closes instead of random
+# noise. Bars come from a tape, one structured .npy per symbol and source:
+#
+#   data/replay/<SYMBOL>.daily.npy    from price_candles
+#   data/replay/<SYMBOL>.minute.npy   from the intraday store (intraday_store.py)
+#
+# built once with SQL and opened memory-mapped, so a round touches only the
+# rows it replays. Each bar's close-to-close move is played out over
+# SECONDS_PER_BAR of game time as a Brownian bridge in log price: it starts
+# at the previous close, ends exactly on this close, and wanders in between
+# with the bar's own volatility (its high/low range when the source has one,
+# else recent close-to-close returns). The headlines published during a bar
+# fire as news shocks when the replay clock passes their published_at.
+# A tick is an index into the bar's precomputed path plus a pointer step
+# through the news, so it costs the same however long the history is.
+TAPE_DIR = "data/replay"
+DAY = 86400
+SOURCES = {"daily": DAY, "minute": 60}   # source -> seconds one bar covers
+TAPE_DTYPE = np.dtype([("ts", "<i8"), ("close", "<f8"), ("volume", "<f8"), ("sigma", "<f8")])
+SIGMA_WINDOW = 20      # bars of close-to-close returns behind a bar's sigma
+SIGMA_FLOOR = 1e-4     # log-price sigma per bar, so a flat bar still moves a little
+SECONDS_PER_BAR = 6.0  # game seconds one bar takes
+LEAD_BARS = 2          # bars replayed before a themed episode's headline
+EPISODE_BARS = 8
+FLOW_REF_MID = 200.0   # price flow_lambda is calibrated at (ModeAEngine's default mid0)
+
+
+def tape_path(symbol: str, source: str = "daily", tape_dir: Optional[str] = None) -> str:
+    return os.path.join(tape_dir or TAPE_DIR, f"{symbol.upper()}.{source}.npy")
+
+
+def _rolling_sigma(close: np.ndarray) -> np.ndarray:
+    r = np.diff(np.log(close), prepend=math.log(close[0]))
+    s = pd.Series(r).rolling(SIGMA_WINDOW, min_periods=3).std().to_numpy()
+    fill = np.nanmedian(s) if np.isfinite(s).any() else SIGMA_FLOOR
+    return np.where(np.isfinite(s), s, fill)
+
+
+def _load_daily(symbol: str):
+    with engine.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT c.ts, c.close, COALESCE(c.volume, 0)
+            FROM price_candles c JOIN symbols s ON s.id = c.symbol_id
+            WHERE s.symbol = :s AND c.close > 0
+            ORDER BY c.ts
+        """), {"s": symbol}).fetchall()
+    a = np.array(rows, dtype=float).reshape(-1, 3)
+    return a[:, 0].astype(np.int64), a[:, 1], a[:, 2], _rolling_sigma(a[:, 1]) if len(a) else a[:, 1]
+
+
+def _load_minute(symbol: str, root: Optional[str]):
+    from intraday_store import ROOT, IntradayStore
+
+    store = IntradayStore(root or ROOT)
+    parts = [store.day(symbol, int(d)) for d in store.days(symbol)]
+    cols = {c: np.concatenate([np.asarray(p[c]) for p in parts]) if parts else np.empty(0)
+            for c in ("ts", "high", "low", "close", "volume")}
+    ok = cols["close"] > 0
+    cols = {c: v[ok] for c, v in cols.items()}
+    sigma = _rolling_sigma(cols["close"]) if len(cols["close"]) else cols["close"]
+    # Parkinson: ln(high/low) / sqrt(4 ln 2) per bar, where the bar has a range
+    with np.errstate(divide="ignore", invalid="ignore"):
+        park = np.log(cols["high"] / cols["low"]) / math.sqrt(4.0 * math.log(2.0))
+    sigma = np.where(np.isfinite(park) & (park > 0), park, sigma)
+    return cols["ts"].astype(np.int64), cols["close"], cols["volume"], sigma
+
+
+def build_tape(symbol: str, source: str = "daily", tape_dir: Optional[str] = None,
+               intraday_root: Optional[str] = None) -> int:
+    """Write the tape for one symbol (replacing any old one). Returns bars written."""
+    symbol = symbol.upper()
+    if source == "daily":
+        ts, close, volume, sigma = _load_daily(symbol)
+    elif source == "minute":
+        ts, close, volume, sigma = _load_minute(symbol, intraday_root)
+    else:
+        raise ValueError(f"unknown tape source {source!r} (one of {', '.join(SOURCES)})")
+    tape = np.empty(len(ts), dtype=TAPE_DTYPE)
+    tape["ts"], tape["close"], tape["volume"] = ts, close, volume
+    tape["sigma"] = np.maximum(sigma, SIGMA_FLOOR)
+    path = tape_path(symbol, source, tape_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, tape)
+    os.replace(path + ".tmp", path)
+    return len(tape)
+
+
+def load_tape(symbol: str, source: str = "daily", tape_dir: Optional[str] = None, rebuild: bool = False) -> np.ndarray:
+    """The symbol's tape, memory-mapped; built on first use."""
+    path = tape_path(symbol, source, tape_dir)
+    if rebuild or not os.path.exists(path):
+        build_tape(symbol, source, tape_dir)
+    return np.load(path, mmap_mode="r")
+
+
+# ---- episodes ----
+@dataclass
+class ReplayNews:
+    ts: int             # published_at
+    news_id: int
+    headline: str
+    direction: int
+    impact: float
+
+
+@dataclass
+class Episode:
+    symbol: str
+    source: str
+    start: int          # first tape row replayed: the path runs from close[start - 1] to close[start]
+    bars: int
+
+    def span(self, tape: np.ndarray):
+        """Market time (unix seconds) the episode covers: from the close of the bar before start to the last close."""
+        bar_sec = SOURCES[self.source]
+        last = min(len(tape) - 1, self.start + self.bars - 1)
+        return int(tape["ts"][self.start - 1]) + bar_sec, int(tape["ts"][last]) + bar_sec
+
+
+def pick_episode(tape: np.ndarray, symbol: str, source: str = "daily", bars: int = EPISODE_BARS,
+                 symbol_id: Optional[int] = None, theme: Optional[str] = None, start_day: Optional[str] = None,
+                 seed: Optional[int] = None) -> Episode:
+    """
+    Where a replay starts: the bar containing start_day (YYYY-MM-DD), or a
+    few bars before a random headline matching theme (news_search.THEMES
+    name or FTS query) for the symbol, or else a random stretch of the tape.
+    A start_day outside the tape raises ValueError.
+    """
+    if len(tape) < 2:
+        raise ValueError(f"{symbol} tape has {len(tape)} bars; need at least 2 (backfill candles first)")
+    ends = np.asarray(tape["ts"]) + SOURCES[source]
+    rng = random.Random(seed)
+    bars = max(1, min(int(bars), len(tape) - 1))
+    start = None
+    if start_day is not None:
+        day = int(pd.Timestamp(start_day, tz="UTC").timestamp())
+        start = int(np.searchsorted(ends, day, side="right"))
+        if day < int(tape["ts"][0]) or start >= len(tape):
+            raise ValueError(f"{symbol} {source} tape covers {_when(tape['ts'][0], source)} .. "
+                             f"{_when(ends[-1] - 1, source)}; {start_day} is outside it")
+        if start > len(tape) - bars:
+            print(f"replay: {start_day} is within {bars} bars of the tape's end; starting earlier so the episode fits")
+    elif theme is not None:
+        from news_search import search
+
+        t0, t1 = int(ends[0]), int(ends[-1])
+        hits = [int(r[4]) for r in search(theme, symbol_id=symbol_id, since=t0, until=t1, scored_only=True, limit=200)]
+        if hits:
+            start = int(np.searchsorted(ends, rng.choice(hits), side="left")) - LEAD_BARS
+        else:
+            print(f"replay: no {theme!r} headlines for {symbol} inside the tape; picking a random stretch")
+    if start is None:
+        start = rng.randint(1, len(tape) - bars)
+    start = max(1, min(start, len(tape) - bars))
+    return Episode(symbol.upper(), source, start, bars)
+
+
+def fetch_episode_news(symbol_id: int, t0: int, t1: int, min_impact: float = 0.0) -> List[ReplayNews]:
+    """Scored headlines for the symbol published in [t0, t1), oldest first (one query per round)."""
+    with engine.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT n.published_at, n.id, n.headline, p.direction, p.impact_score
+            FROM news_items n
+            JOIN news_predictions p ON p.news_id = n.id
+            WHERE n.symbol_id = :sid AND n.published_at >= :t0 AND n.published_at < :t1
+              AND p.impact_score >= :imp
+            ORDER BY n.published_at, n.id
+        """), {"sid": symbol_id, "t0": t0, "t1": t1, "imp": min_impact}).fetchall()
+    return [ReplayNews(int(r[0]), int(r[1]), r[2], int(r[3]), float(r[4])) for r in rows]
+
+
+# ---- engine ----
+class ReplayEngine(ModeAEngine):
+    """
+    ModeAEngine whose mid replays an Episode of a tape. Quotes, fills, the
+    order book and crowd flow work as in ModeAEngine; news shocks come from
+    `news` (ReplayNews, oldest first) as the replay clock reaches them and
+    still widen the spread and raise the noise inside a bar, but every bar
+    ends on its real close. Crowd flow (apply_flow) displaces the mid from
+    the historical path in log price, so the same flow moves a $20 and a
+    $2000 stock by the same fraction; the displacement decays with
+    flow_half_life. The player's own trades fill at the quotes and do not
+    move the mid, as in ModeAEngine.
+
+    After each tick, `fired` holds the headlines that tick released,
+    `market_ts` the replay clock and `done` whether the last close is in.
+    """
+
+    def __init__(self, tape: np.ndarray, episode: Episode, news: Sequence[ReplayNews] = (),
+                 seconds_per_bar: float = SECONDS_PER_BAR, **kw):
+        self.tape = tape
+        self.episode = episode
+        self.first = max(1, int(episode.start))
+        self.last = min(len(tape) - 1, self.first + int(episode.bars) - 1)
+        self.bar_sec = SOURCES[episode.source]
+        super().__init__(mid0=float(tape["close"][self.first - 1]), **kw)
+        self.seconds_per_bar = float(seconds_per_bar)
+        self.steps = max(1, int(round(self.seconds_per_bar / self.dt)))
+        self.np_rng = np.random.default_rng(self.rng.getrandbits(64))
+
+        t0 = int(tape["ts"][self.first - 1]) + self.bar_sec
+        self.news = [n for n in news if n.ts >= t0]
+        self.news_i = 0
+        self.fired: List[ReplayNews] = []
+        self.flow_offset = 0.0   # log-price displacement from crowd flow
+        self.market_ts = float(t0)
+        self.done = False
+        self.t0 = None
+        self.bar = None
+        self._frac = 0.0
+        self._line = self._bridge = None
+
+    def _segment(self, k: int) -> None:
+        # log-price path close[k-1] -> close[k] in `steps` ticks; the bridge is 0 at both ends
+        a, b = math.log(self.tape["close"][k - 1]), math.log(self.tape["close"][k])
+        t = np.linspace(0.0, 1.0, self.steps + 1)
+        w = np.concatenate(([0.0], np.cumsum(self.np_rng.standard_normal(self.steps))))
+        w *= float(self.tape["sigma"][k]) / math.sqrt(self.steps)
+        self._line = a + (b - a) * t
+        self._bridge = w - t * w[-1]
+        self.bar = k
+
+    def progress(self) -> float:
+        if self.t0 is None:
+            return 0.0
+        return 1.0 if self.done else (self.bar - self.first + self._frac) / (self.last - self.first + 1)
+
+    def tick(self, now: Optional[float] = None) -> float:
+        if now is None:
+            now = time.time()
+        if self.t0 is None:
+            self.t0 = now
+
+        pos = max(0.0, now - self.t0) / self.seconds_per_bar
+        k = self.first + int(pos)
+        if k > self.last:
+            k, frac, self.done = self.last, 1.0, True
+        else:
+            frac = pos - int(pos)
+        if k != self.bar:
+            self._segment(k)
+        self._frac = frac
+
+        # replay clock inside the bar, and the headlines it has passed
+        t_prev = int(self.tape["ts"][k - 1]) + self.bar_sec
+        t_this = int(self.tape["ts"][k]) + self.bar_sec
+        self.market_ts = t_prev + frac * (t_this - t_prev)
+        self.fired = []
+        while self.news_i < len(self.news) and self.news[self.news_i].ts <= self.market_ts:
+            n = self.news[self.news_i]
+            self.news_i += 1
+            self.add_news(n.direction, n.impact, now)
+            self.fired.append(n)
+
+        self._cleanup_shocks(now)
+        self._news_drift(now)   # the crowd reads last_drift
+        _, _, _, imp = self.quotes(now)
+        j = min(self.steps, int(frac * self.steps))
+        x = self._line[j] + (1.0 + 2.5 * imp) * self._bridge[j]
+        self.flow_offset *= self.flow_decay
+        self.mid = max(0.01, math.exp(x + self.flow_offset))
+        self._settle(now)
+        return self.mid
+
+    def apply_flow(self, net_qty: int, now: Optional[float] = None) -> None:
+        mid = self.mid
+        super().apply_flow(net_qty, now)   # book and spread as usual
+        # its linear impact, taken as a fraction of FLOW_REF_MID instead of dollars
+        dx = self.flow_lambda * net_qty / FLOW_REF_MID
+        self.flow_offset += dx
+        self.mid = max(0.01, mid * math.exp(dx))
+
+
+def symbol_id(symbol: str) -> int:
+    with engine.begin() as conn:
+        row = conn.execute(text("SELECT id FROM symbols WHERE symbol = :s"), {"s": symbol.upper()}).fetchone()
+    if not row:
+        raise SystemExit(f"Symbol {symbol} not found in symbols table.")
+    return int(row[0])
+
+
+def _when(ts: float, source: str) -> str:
+    return time.strftime("%Y-%m-%d" if source == "daily" else "%Y-%m-%d %H:%M", time.gmtime(ts))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay tapes: real closes for the replay game mode.")
+    ap.add_argument("--tape-dir", default=None, help=f"default {TAPE_DIR}")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("build", help="(re)build tapes from price_candles or the intraday store")
+    p.add_argument("symbols", nargs="+")
+    p.add_argument("--source", choices=tuple(SOURCES), default="daily")
+    p.add_argument("--intraday-root", default=None)
+    p = sub.add_parser("preview", help="run an episode headless at full speed and print the path")
+    p.add_argument("symbol")
+    p.add_argument("--source", choices=tuple(SOURCES), default="daily")
+    p.add_argument("--theme", default=None, help="start just before a headline matching this theme/query")
+    p.add_argument("--start", default=None, help="YYYY-MM-DD")
+    p.add_argument("--bars", type=int, default=EPISODE_BARS)
+    p.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args()
+
+    if args.cmd == "build":
+        for s in args.symbols:
+            t0 = time.perf_counter()
+            n = build_tape(s, args.source, args.tape_dir, args.intraday_root)
+            print(f"{s.upper():8s} {n:8d} bars -> {tape_path(s, args.source, args.tape_dir)} ({time.perf_counter() - t0:.2f}s)")
+        return
+
+    sid = symbol_id(args.symbol)
+    tape = load_tape(args.symbol, args.source, args.tape_dir)
+    try:
+        ep = pick_episode(tape, args.symbol, args.source, args.bars, sid, args.theme, args.start, args.seed)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    t0, t1 = ep.span(tape)
+    eng = ReplayEngine(tape, ep, fetch_episode_news(sid, t0, t1), seed=args.seed)
+    print(f"{ep.symbol} {args.source} bars {ep.start}..{eng.last} ({_when(t0, ep.source)} .. {_when(t1, ep.source)}), "
+          f"{len(eng.news)} headlines, mid0={eng.mid:.2f}")
+
+    now, cost, ticks, bar = 0.0, 0.0, 0, None
+    while not eng.done:
+        c = time.perf_counter()
+        eng.tick(now)
+        cost += time.perf_counter() - c
+        ticks += 1
+        for n in eng.fired:
+            print(f"  [NEWS {_when(n.ts, ep.source)}] dir={n.direction:+d} impact={n.impact:.2f} :: {n.headline}")
+        if eng.bar != bar:
+            if bar is not None:
+                print(f"  bar {bar}: close {tape['close'][bar]:.2f}")
+            bar = eng.bar
+        now += eng.dt
+    print(f"  bar {bar}: close {tape['close'][bar]:.2f}  (mid {eng.mid:.2f})")
+    print(f"{ticks} ticks, {cost / ticks * 1e6:.1f} us/tick")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+
+HOST = "127.0.0.1"
+PORT = 8765
+
+
+class Stats:
+    def __init__(self):
+        self.connected = 0
+        self.snaps = 0
+        self.fills = 0
+        self.over = 0
+        self.errors = 0
+        self.order_lat = []  # seconds from send to fill
+
+
+async def bot(i: int, args, stats: Stats) -> None:
+    try:
+        reader, writer = await asyncio.open_connection(args.host, args.port, limit=1 << 16)
+    except OSError:
+        stats.errors += 1
+        return
+    stats.connected += 1
+    writer.write((json.dumps({"op": "join", "round": f"r{i % args.rounds}", "name": f"bot{i}"}) + "\n").encode())
+    sent = {}
+
+    async def trade():
+        n = 0
+        while True:
+            await asyncio.sleep(random.expovariate(args.orders_per_sec))
+            n += 1
+            sent[n] = time.perf_counter()
+            msg = {"op": "order", "qty": random.choice((-10, -1, 1, 10)), "id": n}
+            writer.write((json.dumps(msg) + "\n").encode())
+
+    trader = asyncio.create_task(trade())
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            msg = json.loads(line)
+            t = msg.get("type")
+            if t == "snap":
+                stats.snaps += 1
+            elif t == "fill":
+                stats.fills += 1
+                t0 = sent.pop(msg.get("id"), None)
+                if t0 is not None:
+                    stats.order_lat.append(time.perf_counter() - t0)
+            elif t == "over":
+                stats.over += 1
+                break
+    except (ConnectionError, ValueError):
+        stats.errors += 1
+    finally:
+        trader.cancel()
+        writer.close()
+
+
+async def run(args) -> None:
+    stats = Stats()
+    tasks = []
+    for i in range(args.clients):
+        tasks.append(asyncio.create_task(bot(i, args, stats)))
+        if i % 200 == 199:
+            await asyncio.sleep(0.05)  # don't SYN-flood the listen backlog
+
+    t0 = time.perf_counter()
+    done, pending = await asyncio.wait(tasks, timeout=args.duration)
+    elapsed = time.perf_counter() - t0
+    for t in pending:
+        t.cancel()
+
+    lat = sorted(stats.order_lat)
+    print(f"clients={args.clients} rounds={args.rounds} connected={stats.connected} errors={stats.errors}")
+    print(f"snapshots/sec={stats.snaps / elapsed:,.0f} (per client {stats.snaps / elapsed / max(1, stats.connected):.1f})")
+    print(f"fills={stats.fills} rounds finished for {stats.over} clients")
+    if lat:
+        p = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1e3
+        print(f"order->fill ms: p50={p(0.5):.1f} p95={p(0.95):.1f} p99={p(0.99):.1f} mean={statistics.mean(lat) * 1e3:.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Load-test client for round_server.py")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--clients", type=int, default=2000)
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--orders-per-sec", type=float, default=0.5, help="per client")
+    ap.add_argument("--duration", type=float, default=30.0, help="seconds before the test stops waiting")
+    asyncio.run(run(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
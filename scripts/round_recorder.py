@@ -0,0 +1,198 @@
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Optional
+
+import numpy as np
+
+# File layout: HEADER, then fixed-size little-endian records until EOF.
+MAGIC = b"NITR"
+VERSION = 1
+HEADER = struct.Struct("<4sHxxq")          # magic, version, created_at (unix seconds)
+RECORD = struct.Struct("<B3xi5d")          # kind, i, t, a, b, c, d  (48 bytes)
+
+# record kinds and what their fields hold
+START = 1   # i=symbol_id  a=round_seconds  b=dt  c=mid0
+QUOTE = 2   # i=tick       a=mid  b=bid  c=ask  d=impact
+TRADE = 3   # i=qty(+buy/-sell)  a=px  b=inv after  c=cash after
+NEWS = 4    # i=news_id    a=direction  b=impact
+SCORE = 5   # final:       a=pnl  b=risk_cost  c=score
+
+KIND_NAMES = {START: "start", QUOTE: "quote", TRADE: "trade", NEWS: "news", SCORE: "score"}
+
+# same layout as RECORD, for zero-copy views over the mapped file
+REC_DTYPE = np.dtype({
+    "names": ["kind", "i", "t", "a", "b", "c", "d"],
+    "formats": ["u1", "<i4", "<f8", "<f8", "<f8", "<f8", "<f8"],
+    "offsets": [0, 4, 8, 16, 24, 32, 40],
+    "itemsize": RECORD.size,
+})
+
+
+class RoundRecorder:
+    """
+    Append-only binary event log for one round.
+
+    The game loop only packs a 48-byte record and appends it to a deque; a
+    background thread pops what is there and writes it in one call, so disk
+    latency never lands on a tick. deque append/popleft are thread-safe, so
+    a record appended mid-flush is written by the next flush, never lost.
+    """
+
+    def __init__(self, path: str, flush_sec: float = 0.25):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._f = open(path, "wb")
+        self._f.write(HEADER.pack(MAGIC, VERSION, int(time.time())))
+        self._buf: Deque[bytes] = deque()
+        self._stop = threading.Event()
+        self._flush_sec = float(flush_sec)
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def _writer(self) -> None:
+        while not self._stop.wait(self._flush_sec):
+            self._flush()
+        self._flush()
+
+    def _flush(self) -> None:
+        buf = [self._buf.popleft() for _ in range(len(self._buf))]
+        if buf:
+            self._f.write(b"".join(buf))
+            self._f.flush()
+
+    def _rec(self, kind: int, i: int, t: float, a=0.0, b=0.0, c=0.0, d=0.0) -> None:
+        self._buf.append(RECORD.pack(kind, int(i), float(t), float(a), float(b), float(c), float(d)))
+
+    def start(self, t: float, symbol_id: int, round_seconds: float, dt: float, mid0: float) -> None:
+        self._rec(START, symbol_id, t, round_seconds, dt, mid0)
+
+    def quote(self, t: float, tick: int, mid: float, bid: float, ask: float, imp: float) -> None:
+        self._rec(QUOTE, tick, t, mid, bid, ask, imp)
+
+    def trade(self, t: float, qty: int, px: float, inv: int, cash: float) -> None:
+        self._rec(TRADE, qty, t, px, inv, cash)
+
+    def news(self, t: float, news_id: int, direction: int, impact: float) -> None:
+        self._rec(NEWS, news_id, t, direction, impact)
+
+    def score(self, t: float, pnl: float, risk_cost: float) -> None:
+        self._rec(SCORE, 0, t, pnl, risk_cost, pnl - risk_cost)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._f.close()
+
+
+class RoundLog:
+    """Memory-mapped, read-only view of a recorded round."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            head = f.read(HEADER.size)
+            magic, version, created = HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a round log (magic={magic!r} version={version})")
+            self.created_at = created
+            size = os.fstat(f.fileno()).st_size
+            n = (size - HEADER.size) // RECORD.size  # ignore a torn last record
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if n else None
+        self.records = (
+            np.frombuffer(self._mm, dtype=REC_DTYPE, count=n, offset=HEADER.size)
+            if n else np.zeros(0, dtype=REC_DTYPE)
+        )
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def of_kind(self, kind: int) -> np.ndarray:
+        return self.records[self.records["kind"] == kind]
+
+    def final_score(self) -> Optional[float]:
+        s = self.of_kind(SCORE)
+        return float(s["c"][-1]) if len(s) else None
+
+    def play(self, on_event: Callable[[np.void], None], speed: float = 1.0) -> None:
+        """
+        Re-emit records on the original timeline scaled by `speed` (1x-1000x).
+        Records that are already due are emitted back to back; we only sleep
+        when the replay is ahead of schedule, so high speeds stay cheap.
+        """
+        recs = self.records
+        if not len(recs):
+            return
+        t0 = float(recs["t"][0])
+        due = (recs["t"] - t0) / float(speed)
+        wall0 = time.perf_counter()
+        for k in range(len(recs)):
+            ahead = due[k] - (time.perf_counter() - wall0)
+            if ahead > 0.001:
+                time.sleep(ahead)
+            on_event(recs[k])
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        df = pd.DataFrame(self.records.copy())
+        df["kind"] = df["kind"].map(KIND_NAMES)
+        return df
+
+    def to_parquet(self, out_path: str) -> None:
+        # needs pyarrow (or fastparquet) installed
+        self.to_dataframe().to_parquet(out_path, index=False)
+
+    def close(self) -> None:
+        self.records = None
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # a caller still holds a view; the map goes away with it
+
+
+def _print_event(r) -> None:
+    kind = int(r["kind"])
+    t = float(r["t"])
+    if kind == QUOTE:
+        print(f"t={t:8.2f} mid={r['a']:.4f} bid={r['b']:.4f} ask={r['c']:.4f} impact~{r['d']:.3f}")
+    elif kind == TRADE:
+        side = "BUY" if r["i"] > 0 else "SELL"
+        print(f"t={t:8.2f} [TRADE] {side} {abs(int(r['i']))} @ {r['a']:.4f} inv={int(r['b'])}")
+    elif kind == NEWS:
+        print(f"t={t:8.2f} [NEWS] id={int(r['i'])} dir={int(r['a'])} impact={r['b']:.3f}")
+    elif kind == SCORE:
+        print(f"t={t:8.2f} FINAL pnl={r['a']:.2f} risk={r['b']:.2f} score={r['c']:.2f}")
+    elif kind == START:
+        print(f"t={t:8.2f} START symbol_id={int(r['i'])} round={r['a']:.0f}s dt={r['b']}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Replay or export a recorded round.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("replay")
+    p.add_argument("log")
+    p.add_argument("--speed", type=float, default=10.0)
+    p.add_argument("--quotes", action="store_true", help="also print every quote")
+    p = sub.add_parser("export")
+    p.add_argument("log")
+    p.add_argument("out", help="output .parquet path")
+    args = ap.parse_args()
+
+    log = RoundLog(args.log)
+    if args.cmd == "replay":
+        show = _print_event if args.quotes else (lambda r: r["kind"] != QUOTE and _print_event(r))
+        log.play(show, speed=args.speed)
+    else:
+        log.to_parquet(args.out)
+        print(f"Wrote {len(log)} records to {args.out}")
+    log.close()
+
+
+if __name__ == "__main__":
+    main()
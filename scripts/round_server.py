@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from sqlalchemy import create_engine, text
+from mode_a_engine import ModeAEngine, Player
+from news_prefetch import PoolPrefetcher
+
+DB = "sqlite:///data/db/news.db"
+db = create_engine(DB)
+
+HOST = "0.0.0.0"
+PORT = 8765
+
+# GAME SETTINGS (longer rounds and more frequent, stronger news than
+# run_round_mode_a.py's 30s / 15s / 0.15; the inventory penalty is the same)
+SYMBOL = "AMZN"
+ROUND_SECONDS = 90
+DT = 0.05
+NEWS_INTERVAL_SEC = 5.0
+MIN_IMPACT = 0.3
+NEWS_POOL_SIZE = 300
+
+INV_PENALTY_LAMBDA = 0.02
+INV_PENALTY_POWER = 1.3
+
+BROADCAST_HZ = 10       # snapshots per second per client (latest wins)
+MAX_ORDER_QTY = 100
+MAX_PENDING_MSGS = 64   # non-snapshot messages queued per client before we drop it
+
+
+def inv_penalty(inv: int) -> float:
+    return INV_PENALTY_LAMBDA * (abs(inv) ** INV_PENALTY_POWER)
+
+
+def get_symbol_id(symbol: str) -> int:
+    with db.begin() as conn:
+        row = conn.execute(text("SELECT id FROM symbols WHERE symbol=:s"), {"s": symbol}).fetchone()
+    if not row:
+        raise RuntimeError(f"Symbol {symbol} not found. Run seed_sym.py first.")
+    return int(row[0])
+
+
+def fetch_scored_pool(symbol_id: int, limit: int):
+    """
+    Returns list of (news_id, headline, direction, impact_score) sorted oldest->newest,
+    filtered to inject-ready items.
+    """
+    with db.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT n.id, n.headline, p.direction, p.impact_score
+            FROM news_items n
+            JOIN news_predictions p ON p.news_id = n.id
+            WHERE n.symbol_id = :sid
+            ORDER BY n.id DESC
+            LIMIT :lim
+        """), {"sid": symbol_id, "lim": limit}).fetchall()
+
+    pool = [(int(r[0]), r[1], int(r[2]), float(r[3])) for r in rows][::-1]
+    pool = [x for x in pool if x[2] != 0 and x[3] >= MIN_IMPACT]
+    return pool
+
+
+class Client:
+    """
+    One connection. Snapshots are coalesced: the round overwrites `latest`
+    and the writer task sends whatever is newest when the socket is ready,
+    so a slow client skips frames instead of growing a backlog.
+    """
+
+    def __init__(self, name: str, writer: asyncio.StreamWriter):
+        self.name = name
+        self.writer = writer
+        self.player = Player()
+        self.risk_cost = 0.0
+        self.latest: Optional[bytes] = None
+        self.pending = deque()   # fills / round-over: never coalesced
+        self.wake = asyncio.Event()
+        self.closed = False
+
+    def push_snapshot(self, msg: bytes) -> None:
+        self.latest = msg
+        self.wake.set()
+
+    def push(self, obj: dict) -> None:
+        if len(self.pending) >= MAX_PENDING_MSGS:
+            self.close()
+            return
+        self.pending.append((json.dumps(obj) + "\n").encode())
+        self.wake.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self.wake.set()
+
+    async def writer_loop(self) -> None:
+        try:
+            while not self.closed or self.pending:
+                await self.wake.wait()
+                self.wake.clear()
+                while self.pending:
+                    self.writer.write(self.pending.popleft())
+                if self.latest is not None:
+                    self.writer.write(self.latest)
+                    self.latest = None
+                await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.closed = True
+            self.writer.close()
+
+
+class Round:
+    """One shared ModeAEngine and every player connected to it."""
+
+    def __init__(self, name: str, symbol_id: int):
+        self.name = name
+        self.symbol_id = symbol_id
+        self.eng = ModeAEngine(mid0=200.0, dt=DT)
+        self.clients: Dict[str, Client] = {}
+        self.headline = "Waiting for first headline..."
+        self.start = time.time()
+        self.end = self.start + ROUND_SECONDS
+        self.over = False
+        self.task: Optional[asyncio.Task] = None
+
+    def join(self, client: Client) -> None:
+        self.clients[client.name] = client
+
+    def leave(self, client: Client) -> None:
+        if self.clients.get(client.name) is client:
+            del self.clients[client.name]
+
+    def order(self, client: Client, qty: int, now: float, req_id=None) -> None:
+        if qty > 0:
+            px = self.eng.buy(qty=qty, now=now, player=client.player)
+        elif qty < 0:
+            px = self.eng.sell(qty=-qty, now=now, player=client.player)
+        else:
+            return
+        filled = self.eng.last_filled if qty > 0 else -self.eng.last_filled
+        client.push({"type": "fill", "id": req_id, "qty": filled, "px": px, "inv": client.player.inv})
+
+    def flatten(self, client: Client, now: float, req_id=None) -> None:
+        self.order(client, -client.player.inv, now, req_id)
+
+    def _broadcast(self, now: float) -> None:
+        bid, ask, _, imp = self.eng.quotes(now)
+        t_left = max(0.0, self.end - now)
+        # shared part encoded once per round; per-player fields appended as text
+        common = json.dumps({
+            "type": "snap", "t_left": round(t_left, 2), "mid": self.eng.mid,
+            "bid": bid, "ask": ask, "headline": self.headline,
+        })[:-1]
+        mid = self.eng.mid
+        for c in self.clients.values():
+            p = c.player
+            pnl = p.cash + p.inv * mid
+            c.push_snapshot(
+                f'{common}, "inv": {p.inv}, "cash": {p.cash:.4f}, "pnl": {pnl:.4f}, '
+                f'"risk": {c.risk_cost:.4f}, "score": {pnl - c.risk_cost:.4f}}}\n'.encode()
+            )
+
+    async def run(self) -> None:
+        news_pool = None
+        try:
+            news_pool = await asyncio.to_thread(PoolPrefetcher(fetch_scored_pool, (self.symbol_id, NEWS_POOL_SIZE)).start)
+            await self._play(news_pool)
+        except Exception as e:
+            # clients would otherwise wait for an "over" that never comes
+            print(f"round {self.name} aborted: {e!r}")
+            for c in self.clients.values():
+                c.push({"type": "error", "error": "round aborted"})
+            raise
+        finally:
+            if news_pool is not None:
+                news_pool.stop()
+            self.over = True
+            for c in self.clients.values():
+                c.close()
+
+    async def _play(self, news_pool: PoolPrefetcher) -> None:
+        next_news_ts = self.start + NEWS_INTERVAL_SEC
+        ticks_per_snap = max(1, int(round(1.0 / (BROADCAST_HZ * DT))))
+
+        k = 0
+        next_tick = time.time()
+        while True:
+            now = time.time()
+            if now >= self.end:
+                break
+
+            if now >= next_news_ts:
+                item = news_pool.next()
+                if item is not None:
+                    nid, headline, direction, impact = item
+                    self.eng.add_news(direction=direction, impact=impact, now=now)
+                    self.headline = headline
+                next_news_ts += NEWS_INTERVAL_SEC
+
+            self.eng.tick(now)
+            for c in self.clients.values():
+                c.risk_cost += inv_penalty(c.player.inv) * DT
+
+            if k % ticks_per_snap == 0:
+                self._broadcast(now)
+            k += 1
+
+            next_tick += DT
+            await asyncio.sleep(max(0.0, next_tick - time.time()))
+
+        # round over: flatten everyone and send the leaderboard
+        now = time.time()
+        self.over = True
+        board = []
+        for c in self.clients.values():
+            if c.player.inv:
+                self.flatten(c, now)
+            pnl = self.eng.pnl(c.player)
+            board.append({"name": c.name, "pnl": pnl, "risk": c.risk_cost, "score": pnl - c.risk_cost})
+        board.sort(key=lambda r: r["score"], reverse=True)
+        for c in self.clients.values():
+            mine = next(r for r in board if r["name"] == c.name)
+            c.push({"type": "over", "final": mine, "leaderboard": board[:10]})
+
+
+class RoundServer:
+    def __init__(self, symbol: str = SYMBOL):
+        self.symbol_id = get_symbol_id(symbol)
+        self.rounds: Dict[str, Round] = {}
+
+    def _round(self, name: str) -> Round:
+        r = self.rounds.get(name)
+        if r is None or r.over:
+            r = Round(name, self.symbol_id)
+            self.rounds[name] = r
+            r.task = asyncio.create_task(r.run())
+            r.task.add_done_callback(lambda _t: self._reap(r))
+        return r
+
+    def _reap(self, r: Round) -> None:
+        if self.rounds.get(r.name) is r:
+            del self.rounds[r.name]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # first line must be {"op": "join", "round": ..., "name": ...}
+        try:
+            hello = json.loads(await reader.readline())
+        except Exception:
+            hello = None
+        if not isinstance(hello, dict) or hello.get("op") != "join":
+            writer.close()
+            return
+
+        rnd = self._round(str(hello.get("round", "lobby")))
+        name = str(hello.get("name") or f"player{id(writer)}")
+        base, n = name, 1
+        while name in rnd.clients:   # never reuse a live client's name
+            n += 1
+            name = f"{base}#{n}"
+        client = Client(name, writer)
+        rnd.join(client)
+        wtask = asyncio.create_task(client.writer_loop())
+        client.push({"type": "joined", "round": rnd.name, "name": name, "t_left": max(0.0, rnd.end - time.time())})
+
+        try:
+            while not client.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                except ValueError:
+                    continue
+                if not isinstance(msg, dict):
+                    continue
+                if rnd.over:
+                    break
+                op = msg.get("op")
+                now = time.time()
+                if op == "order":
+                    try:
+                        qty = max(-MAX_ORDER_QTY, min(MAX_ORDER_QTY, int(msg.get("qty", 0))))
+                    except (TypeError, ValueError):   # "qty": null / "abc": ignore the message, keep the client
+                        continue
+                    rnd.order(client, qty, now, msg.get("id"))
+                elif op == "flatten":
+                    rnd.flatten(client, now, msg.get("id"))
+                elif op == "quit":
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            if not rnd.over:
+                rnd.leave(client)
+            client.close()
+            await wtask
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port, limit=1 << 16, backlog=4096)
+        print(f"Round server listening on {host}:{port}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Multiplayer Mode A round server (newline-delimited JSON over TCP).")
+    ap.add_argument("--host", default=HOST)
+    ap.add_argument("--port", type=int, default=PORT)
+    ap.add_argument("--symbol", default=SYMBOL)
+    args = ap.parse_args()
+    asyncio.run(RoundServer(args.symbol).serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+import time
+import msvcrt
+import numpy as np
+from sqlalchemy import create_engine, text
+from portfolio_engine import PortfolioEngine, build_spillover, inv_penalty_vec
+
+DB = "sqlite:///data/db/news.db"
+db = create_engine(DB)
+
+# GAME SETTINGS
+ROUND_SECONDS = 90
+DT = 0.05
+
+NEWS_INTERVAL_SEC = 2.0   # many names => more frequent headlines than single-symbol mode
+MIN_IMPACT = 0.3
+NEWS_POOL_SIZE = 2000
+
+SECTOR_WEIGHT = 0.25      # share of a name's news that each sector peer feels
+
+INV_PENALTY_LAMBDA = 0.02
+INV_PENALTY_POWER = 1.3
+
+
+def read_key():
+    if msvcrt.kbhit():
+        return msvcrt.getwch()
+    return None
+
+
+def load_universe():
+    """
+    Returns (symbol_ids, symbols, sector_ids, last_close) for every tradable
+    symbol (benchmark SPY excluded). Names without candles start at 100.
+    """
+    with db.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT s.id, s.symbol, s.sector_id,
+                   (SELECT close FROM price_candles c WHERE c.symbol_id = s.id ORDER BY ts DESC LIMIT 1)
+            FROM symbols s
+            WHERE s.symbol != 'SPY'
+            ORDER BY s.id
+        """)).fetchall()
+    if not rows:
+        raise RuntimeError("No symbols found. Run seed_sym.py first.")
+    ids = [int(r[0]) for r in rows]
+    syms = [r[1] for r in rows]
+    sectors = [None if r[2] is None else int(r[2]) for r in rows]
+    mids = [float(r[3]) if r[3] else 100.0 for r in rows]
+    return ids, syms, sectors, mids
+
+
+def fetch_portfolio_pool(limit: int):
+    """
+    Returns list of (news_id, symbol_id, headline, direction, impact_score)
+    across the whole universe, oldest->newest, filtered to inject-ready items.
+    """
+    with db.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT n.id, n.symbol_id, n.headline, p.direction, p.impact_score
+            FROM news_items n
+            JOIN news_predictions p ON p.news_id = n.id
+            WHERE n.symbol_id IS NOT NULL
+              AND p.direction != 0
+              AND p.impact_score >= :min_imp
+            ORDER BY n.id DESC
+            LIMIT :lim
+        """), {"min_imp": MIN_IMPACT, "lim": limit}).fetchall()
+    return [(int(r[0]), int(r[1]), r[2], int(r[3]), float(r[4])) for r in rows][::-1]
+
+
+def main():
+    ids, syms, sectors, mids = load_universe()
+    idx_of = {sid: i for i, sid in enumerate(ids)}
+
+    spill = build_spillover(sectors, sector_weight=SECTOR_WEIGHT)
+    eng = PortfolioEngine(syms, mids, spill, dt=DT)
+
+    news_pool = [x for x in fetch_portfolio_pool(NEWS_POOL_SIZE) if x[1] in idx_of]
+    pool_i = 0
+
+    round_start = time.time()
+    round_end = round_start + ROUND_SECONDS
+    next_news_ts = round_start + NEWS_INTERVAL_SEC
+    risk_cost = 0.0
+    prev_now = round_start
+    last_print = 0.0
+    sel = 0
+
+    print(f"\n=== PORTFOLIO ROUND: {len(syms)} symbols | {ROUND_SECONDS}s | spill nnz={spill.nnz} ===")
+    print("Controls: n/p next/prev symbol | b/B buy 1/10 | s/S sell 1/10 | f flatten all | q quit\n")
+
+    while True:
+        now = time.time()
+
+        dt_real = now - prev_now
+        prev_now = now
+        risk_cost += inv_penalty_vec(eng.inv, INV_PENALTY_LAMBDA, INV_PENALTY_POWER) * dt_real
+
+        if now >= round_end:
+            break
+
+        k = read_key()
+        if k in ("q", "Q"):
+            print("Quit.")
+            return
+        if k == "n":
+            sel = (sel + 1) % eng.n
+        elif k == "p":
+            sel = (sel - 1) % eng.n
+        elif k in ("b", "B"):
+            qty = 1 if k == "b" else 10
+            px = eng.buy(sel, qty)
+            print(f"[TRADE] BUY {qty} {syms[sel]} @ {px:.4f} inv={eng.inv[sel]} pnl={eng.pnl():.2f}")
+        elif k in ("s", "S"):
+            qty = 1 if k == "s" else 10
+            px = eng.sell(sel, qty)
+            print(f"[TRADE] SELL {qty} {syms[sel]} @ {px:.4f} inv={eng.inv[sel]} pnl={eng.pnl():.2f}")
+        elif k in ("f", "F"):
+            eng.flatten()
+            print(f"[TRADE] FLATTEN ALL pnl={eng.pnl():.2f}")
+
+        if now >= next_news_ts:
+            if pool_i >= len(news_pool):
+                news_pool = [x for x in fetch_portfolio_pool(NEWS_POOL_SIZE) if x[1] in idx_of]
+                pool_i = 0
+            if news_pool:
+                nid, sid, headline, direction, impact = news_pool[pool_i]
+                pool_i += 1
+                eng.add_news(idx_of[sid], direction, impact)
+                print(f"\n[NEWS] {syms[idx_of[sid]]} :: {headline}")
+            next_news_ts += NEWS_INTERVAL_SEC
+
+        eng.tick()
+
+        if now - last_print >= 0.5:
+            bid, ask, _, imp = eng.quotes()
+            t_left = max(0.0, round_end - now)
+            score = eng.pnl() - risk_cost
+            hot = int(np.argmax(imp))
+            print(
+                f"t_left={t_left:5.1f}s [{syms[sel]}] bid={bid[sel]:.4f} ask={ask[sel]:.4f} inv={eng.inv[sel]:4d} | "
+                f"gross={eng.gross_exposure():9.2f} pnl={eng.pnl():7.2f} risk={risk_cost:6.2f} score={score:7.2f} | "
+                f"hottest {syms[hot]} impact~{imp[hot]:.3f}"
+            )
+            last_print = now
+
+        time.sleep(DT)
+
+    eng.flatten()
+    final_pnl = eng.pnl()
+    final_score = final_pnl - risk_cost
+
+    print("\n=== ROUND OVER ===")
+    print(f"Final PnL:   {final_pnl:.2f}")
+    print(f"Risk Cost:   {risk_cost:.2f}")
+    print(f"FINAL SCORE: {final_score:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import time
+from replay_engine import ReplayEngine, fetch_episode_news, load_tape, pick_episode, symbol_id
+from npc_traders import NpcPopulation
+from run_round_mode_a import flatten, inv_penalty, read_key
+
+SYMBOL = "AMZN"
+
+# EPISODE: real closes from the replay tape (built on first use)
+SOURCE = "daily"          # "daily" (price_candles) or "minute" (intraday store)
+THEME = "earnings"        # start just before a headline like this (None = START_DAY or random)
+START_DAY = None          # "YYYY-MM-DD"
+BARS = 5
+SECONDS_PER_BAR = 6.0     # game seconds per bar
+MIN_IMPACT = 0.15
+SEED = None
+
+# GAME SETTINGS
+DT = 0.05
+NPC_COUNT = 2000  # simulated traders sharing the market (0 = off)
+
+
+def main():
+    sid = symbol_id(SYMBOL)
+    tape = load_tape(SYMBOL, SOURCE)
+    ep = pick_episode(tape, SYMBOL, SOURCE, BARS, sid, THEME, START_DAY, SEED)
+    t0, t1 = ep.span(tape)
+    # the episode's headlines, in one query before the round starts
+    eng = ReplayEngine(tape, ep, fetch_episode_news(sid, t0, t1, MIN_IMPACT),
+                       seconds_per_bar=SECONDS_PER_BAR, dt=DT, seed=SEED)
+    crowd = NpcPopulation(NPC_COUNT) if NPC_COUNT > 0 else None
+    fmt = "%Y-%m-%d" if SOURCE == "daily" else "%Y-%m-%d %H:%M"
+
+    round_start = time.time()
+    risk_cost = 0.0
+    prev_now = round_start
+    last_print = 0.0
+
+    print(f"\n=== REPLAY ROUND: {SYMBOL} {time.strftime(fmt, time.gmtime(t0))} .. {time.strftime(fmt, time.gmtime(t1))} "
+          f"| {eng.last - eng.first + 1} bars x {SECONDS_PER_BAR:.0f}s ===")
+    print("Controls: b/B buy 1/10 | s/S sell 1/10 | f flatten | q quit")
+    print(f"{len(eng.news)} headlines in the episode (impact >= {MIN_IMPACT})\n")
+
+    while True:
+        now = time.time()
+
+        # accumulate risk cost over real wall-clock time
+        dt_real = now - prev_now
+        prev_now = now
+        risk_cost += inv_penalty(eng.player.inv) * dt_real
+
+        # round end: the last bar's close is in
+        if eng.done:
+            break
+
+        # input
+        k = read_key()
+        if k in ("q", "Q"):
+            print("Quit.")
+            return
+
+        if k in ("b", "B"):
+            qty = 1 if k == "b" else 10
+            px = eng.buy(qty=qty, now=now)
+            print(f"[TRADE] BUY {qty} @ {px:.4f} inv={eng.player.inv} pnl={eng.pnl():.2f}")
+
+        elif k in ("s", "S"):
+            qty = 1 if k == "s" else 10
+            px = eng.sell(qty=qty, now=now)
+            print(f"[TRADE] SELL {qty} @ {px:.4f} inv={eng.player.inv} pnl={eng.pnl():.2f}")
+
+        elif k in ("f", "F"):
+            flatten(eng, now)
+            print(f"[TRADE] FLATTEN inv={eng.player.inv} pnl={eng.pnl():.2f}")
+
+        # tick the replay (releases the headlines it passed), then let the crowd trade on it
+        eng.tick(now)
+        for n in eng.fired:
+            when = time.strftime("%Y-%m-%d %H:%M", time.gmtime(n.ts))
+            print(f"\n[NEWS {when}] id={n.news_id} dir={n.direction} impact={n.impact:.3f} :: {n.headline}")
+        if crowd is not None:
+            crowd.step(eng, now)
+
+        # print status
+        if now - last_print >= 0.5:
+            bid, ask, spr, imp = eng.quotes(now)
+            score = eng.pnl() - risk_cost
+            print(
+                f"{time.strftime(fmt, time.gmtime(eng.market_ts))} [{eng.progress() * 100:3.0f}%] "
+                f"mid={eng.mid:.4f} bid={bid:.4f} ask={ask:.4f} "
+                f"inv={eng.player.inv:4d} pnl={eng.pnl():7.2f} risk={risk_cost:6.2f} score={score:7.2f} "
+                f"impact~{imp:.3f}" + (f" crowd={crowd.last_net:+d}" if crowd is not None else "")
+            )
+            last_print = now
+
+        time.sleep(DT)
+
+    # round over: flatten and final score
+    now = time.time()
+    flatten(eng, now)
+    final_pnl = eng.pnl()
+    final_score = final_pnl - risk_cost
+
+    print("\n=== ROUND OVER ===")
+    print(f"Last close:  {tape['close'][eng.last]:.2f}")
+    print(f"Final PnL:   {final_pnl:.2f}")
+    print(f"Risk Cost:   {risk_cost:.2f}")
+    print(f"FINAL SCORE: {final_score:.2f}")
+
+
+if __name__ == "__main__":
+    main()
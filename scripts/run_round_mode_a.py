@@ -2,6 +2,8 @@ import time
 import msvcrt
 from sqlalchemy import create_engine, text
 from mode_a_engine import ModeAEngine
+from npc_traders import NpcPopulation
+from news_prefetch import PoolPrefetcher
 
 DB = "sqlite:///data/db/news.db"
 db = create_engine(DB)
@@ -21,6 +23,8 @@ NEWS_POOL_SIZE = 300  # preload this many recent scored items
 INV_PENALTY_LAMBDA = 0.02
 INV_PENALTY_POWER = 1.3
 
+NPC_COUNT = 2000  # simulated traders sharing the market (0 = off)
+
 
 def read_key():
     if msvcrt.kbhit():
@@ -77,10 +81,10 @@ def main():
     sid = get_symbol_id(SYMBOL)
 
     eng = ModeAEngine(mid0=200.0, dt=DT)
+    crowd = NpcPopulation(NPC_COUNT) if NPC_COUNT > 0 else None
 
-    # Build pool for forced injections
-    news_pool = fetch_scored_pool(sid, NEWS_POOL_SIZE)
-    pool_i = 0
+    # Build pool for forced injections (next pool prefetched in the background)
+    news_pool = PoolPrefetcher(fetch_scored_pool, (sid, NEWS_POOL_SIZE)).start()
     next_news_ts = round_start + NEWS_INTERVAL_SEC
 
     last_print = 0.0
@@ -104,6 +108,7 @@ def main():
         # input
         k = read_key()
         if k in ("q", "Q"):
+            news_pool.stop()
             print("Quit.")
             return
 
@@ -123,24 +128,21 @@ def main():
 
         # FORCE NEWS: inject exactly once every 15 seconds
         if now >= next_news_ts:
-            # refresh pool if exhausted
-            if not news_pool or pool_i >= len(news_pool):
-                news_pool = fetch_scored_pool(sid, NEWS_POOL_SIZE)
-                pool_i = 0
-
-            if news_pool:
-                nid, headline, direction, impact = news_pool[pool_i]
-                pool_i += 1
+            item = news_pool.next()
+            if item is not None:
+                nid, headline, direction, impact = item
 
                 eng.add_news(direction=direction, impact=impact, now=now)
                 print(f"\n[NEWS@{int(NEWS_INTERVAL_SEC)}s] id={nid} dir={direction} impact={impact:.3f} :: {headline}")
-            else:
+            elif news_pool.last_size == 0:
                 print(f"\n[NEWS@{int(NEWS_INTERVAL_SEC)}s] No scored news available in DB for {SYMBOL}.")
 
             next_news_ts += NEWS_INTERVAL_SEC
 
-        # tick market
+        # tick market, then let the crowd trade on it
         eng.tick(now)
+        if crowd is not None:
+            crowd.step(eng, now)
 
         # print status
         if now - last_print >= 0.5:
@@ -150,13 +152,14 @@ def main():
             print(
                 f"t_left={t_left:5.1f}s mid={eng.mid:.4f} bid={bid:.4f} ask={ask:.4f} "
                 f"inv={eng.player.inv:4d} pnl={eng.pnl():7.2f} risk={risk_cost:6.2f} score={score:7.2f} "
-                f"impact~{imp:.3f}"
+                f"impact~{imp:.3f}" + (f" crowd={crowd.last_net:+d}" if crowd is not None else "")
             )
             last_print = now
 
         time.sleep(DT)
 
     # round over: flatten and final score
+    news_pool.stop()
     now = time.time()
     flatten(eng, now)
     final_pnl = eng.pnl()
@@ -1,26 +1,66 @@
 # scripts/score_news.py
+import os
 import time
-import joblib
 import numpy as np
 from sqlalchemy import create_engine, text
-from transformers import AutoTokenizer, AutoModelForSequenceClassification
-import torch
+import stub_models
+import article_store
+import lexicon
+import metrics
+import model_registry
 
 engine = create_engine("sqlite:///data/db/news.db")
 
 # FinBERT
 FINBERT = "ProsusAI/finbert"
-tok = AutoTokenizer.from_pretrained(FINBERT)
-mdl = AutoModelForSequenceClassification.from_pretrained(FINBERT)
-mdl.eval()
-
-device = "cuda" if torch.cuda.is_available() else "cpu"
-mdl.to(device)
-
-# XGB impact model
-impact_model = joblib.load("data/models/impact_xgb.joblib")
+IMPACT_MODEL_PATH = "data/models/impact_xgb.joblib"
+
+# scale: 2% abnormal move => impact 1.0 (tune later)
+IMPACT_DENOM = 0.02
+
+PREDICTION_UPSERT = text("""
+    INSERT OR REPLACE INTO news_predictions
+    (news_id, predicted_y, impact_score, direction, created_at)
+    VALUES(:nid,:y,:imp,:dir,:ts)
+""")
+
+# loaded on first use so importing this module (benchmarks, the UI) stays cheap;
+# NEWS_STUB_MODELS=1 swaps in stub_models for offline runs. impact_model is a
+# model_registry.ModelRegistry: the global model plus, when one has been
+# trained, the per-symbol/sector family, loaded as batches route to it
+tok = None
+mdl = None
+device = "cpu"
+impact_model = None
+
+def load_models(finbert: bool = True):
+    global tok, mdl, device, impact_model
+    if finbert and mdl is None and not stub_models.enabled():
+        from transformers import AutoTokenizer, AutoModelForSequenceClassification
+        import torch
+
+        tok = AutoTokenizer.from_pretrained(FINBERT)
+        mdl = AutoModelForSequenceClassification.from_pretrained(FINBERT)
+        mdl.eval()
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        mdl.to(device)
+
+    # XGB impact model
+    if impact_model is None:
+        if stub_models.enabled() and not os.path.exists(IMPACT_MODEL_PATH):
+            fallback = stub_models.StubImpactModel()
+        else:
+            fallback = IMPACT_MODEL_PATH
+        impact_model = model_registry.ModelRegistry(fallback)
+        impact_model.get(model_registry.GLOBAL)   # fail here, not on the first batch
 
 def finbert_probs(text: str):
+    if stub_models.enabled():
+        p_neg, p_neu, p_pos = (float(x) for x in stub_models.finbert_probs([text])[0])
+        return p_pos, p_neg, p_neu
+    import torch
+
     with torch.no_grad():
         enc = tok([text], padding=True, truncation=True, max_length=256, return_tensors="pt")
         enc = {k: v.to(device) for k, v in enc.items()}
@@ -30,60 +70,67 @@ def finbert_probs(text: str):
     return p_pos, p_neg, p_neu
 
 def direction_from_headline(headline: str) -> int:
-    h = (headline or "").lower()
-    pos = ["beats", "beat", "raises guidance", "upgrades", "record revenue", "surges", "wins", "strong demand", "jumps", "tops estimates"]
-    neg = ["misses", "miss", "cuts guidance", "downgrades", "lawsuit", "probe", "recall", "plunges", "falls", "weak demand", "misses estimates"]
-    if any(p in h for p in pos): return +1
-    if any(n in h for n in neg): return -1
-    return 0
+    # whole-word, weighted phrase lexicon (data/lexicon.json overrides the built-in one)
+    return lexicon.default().direction(headline)
+
+def predict_impact(probs, pubs, lex_dirs, symbol_ids=None):
+    """
+    Batch scoring: probs rows are FinBERT [neg, neu, pos], pubs unix seconds,
+    lex_dirs the lexicon's call per headline (0 = no call, fall back to
+    sentiment), symbol_ids picks each row's model (None = global).
+    Returns (predicted_y, impact_score, direction) arrays.
+    """
+    probs = np.asarray(probs, dtype=float).reshape(-1, 3)
+    p_neg, p_neu, p_pos = probs[:, 0], probs[:, 1], probs[:, 2]
+    sentiment = p_pos - p_neg
+    t = [time.gmtime(int(pub)) for pub in pubs]
+    hour = np.array([x.tm_hour for x in t], dtype=float)
+    dow = np.array([x.tm_wday for x in t], dtype=float)
+
+    # XGB expects: [sentiment_score, p_pos, p_neg, p_neu, hour, dow]
+    X = np.column_stack([sentiment, p_pos, p_neg, p_neu, hour, dow])
+    with metrics.timer("score.impact"):
+        y_hat = np.asarray(impact_model.predict(X) if symbol_ids is None else impact_model.predict(X, symbol_ids),
+                           dtype=float)
+    impact = np.clip(y_hat / IMPACT_DENOM, 0.0, 1.0)
+
+    lex = np.asarray(list(lex_dirs), dtype=int)
+    fallback = np.where(sentiment > 0.05, 1, np.where(sentiment < -0.05, -1, 0))
+    direction = np.where(lex != 0, lex, fallback)
+    return y_hat, impact, direction
 
 def main():
-    # scale: 2% abnormal move => impact 1.0 (tune later)
-    IMPACT_DENOM = 0.02
-
     with engine.begin() as conn:
         rows = conn.execute(text("""
-            SELECT n.id, n.headline, COALESCE(n.body,''), n.source, n.published_at
+            SELECT n.id, n.headline, n.source, n.published_at, n.symbol_id
             FROM news_items n
             WHERE n.id NOT IN (SELECT news_id FROM news_predictions)
               AND n.id IN (SELECT news_id FROM news_features)
             LIMIT 500
         """)).fetchall()
+        bodies = article_store.get_many(conn, [r[0] for r in rows])
 
     if not rows:
         print("No unscored news found.")
         return
 
+    load_models()
     now_ts = int(time.time())
     wrote = 0
+    lex_dirs = lexicon.default().classify(r[1] for r in rows)
 
-    for news_id, headline, body, source, pub in rows:
-        text_in = f"{headline}. {body}".strip()
-
-        p_pos, p_neg, p_neu = finbert_probs(text_in)
-        sentiment_score = p_pos - p_neg
-
-        t = time.gmtime(int(pub))
-        hour, dow = t.tm_hour, t.tm_wday
-
-        # XGB expects: [sentiment_score, p_pos, p_neg, p_neu, hour, dow]
-        X = np.array([[sentiment_score, p_pos, p_neg, p_neu, hour, dow]], dtype=float)
-        y_hat = float(impact_model.predict(X)[0])
-
-        impact = max(0.0, min(1.0, y_hat / IMPACT_DENOM))
+    for (news_id, headline, source, pub, symbol_id), lex_dir in zip(rows, lex_dirs):
+        text_in = f"{headline}. {bodies.get(int(news_id), '')}".strip()
 
-        direction = direction_from_headline(headline)
-        if direction == 0:
-            direction = +1 if sentiment_score > 0.05 else (-1 if sentiment_score < -0.05 else 0)
+        with metrics.timer("score.finbert"):
+            p_pos, p_neg, p_neu = finbert_probs(text_in)
+        y_hat, impact, direction = (float(v[0]) for v in predict_impact([[p_neg, p_neu, p_pos]], [pub], [lex_dir], [symbol_id]))
 
-        with engine.begin() as conn:
-            conn.execute(text("""
-                INSERT OR REPLACE INTO news_predictions
-                (news_id, predicted_y, impact_score, direction, created_at)
-                VALUES(:nid,:y,:imp,:dir,:ts)
-            """), {"nid": int(news_id), "y": y_hat, "imp": impact, "dir": int(direction), "ts": now_ts})
+        with metrics.timer("db.prediction_write"), engine.begin() as conn:
+            conn.execute(PREDICTION_UPSERT, {"nid": int(news_id), "y": y_hat, "imp": impact, "dir": int(direction), "ts": now_ts})
 
         wrote += 1
+        metrics.count("score.items")
 
     print(f"Scored {wrote} news items. device={device}")
 
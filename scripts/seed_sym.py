@@ -3,15 +3,24 @@ from sqlalchemy import create_engine, text
 engine = create_engine("sqlite:///data/db/news.db")
 
 SYMBOLS = [
-  ("AAPL","Apple Inc."), ("MSFT","Microsoft"), ("NVDA","NVIDIA"),
-  ("AMZN","Amazon"), ("GOOGL","Alphabet"), ("META","Meta"),
-  ("TSLA","Tesla"), ("JPM","JPMorgan"), ("XOM","Exxon"),
-  ("SPY","SPDR S&P 500 ETF")  # benchmark
+  ("AAPL","Apple Inc.","Technology"), ("MSFT","Microsoft","Technology"), ("NVDA","NVIDIA","Technology"),
+  ("AMZN","Amazon","Consumer Discretionary"), ("GOOGL","Alphabet","Communication Services"),
+  ("META","Meta","Communication Services"), ("TSLA","Tesla","Consumer Discretionary"),
+  ("JPM","JPMorgan","Financials"), ("XOM","Exxon","Energy"),
+  ("SPY","SPDR S&P 500 ETF",None)  # benchmark
 ]
 
 with engine.begin() as conn:
-    for sym,name in SYMBOLS:
+    for sym,name,sector in SYMBOLS:
+        sector_id = None
+        if sector:
+            conn.execute(text("INSERT OR IGNORE INTO sectors(name) VALUES(:n)"), {"n": sector})
+            sector_id = conn.execute(text("SELECT id FROM sectors WHERE name=:n"), {"n": sector}).scalar()
         conn.execute(text(
-            "INSERT OR IGNORE INTO symbols(symbol,name,sector_id) VALUES(:s,:n,NULL)"
-        ), {"s": sym, "n": name})
+            "INSERT OR IGNORE INTO symbols(symbol,name,sector_id) VALUES(:s,:n,:sec)"
+        ), {"s": sym, "n": name, "sec": sector_id})
+        # older DBs were seeded without sectors
+        conn.execute(text(
+            "UPDATE symbols SET sector_id=:sec WHERE symbol=:s AND sector_id IS NULL"
+        ), {"s": sym, "sec": sector_id})
 print("Seeded symbols.")
@@ -0,0 +1,350 @@
+import multiprocessing as mp
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from mode_a_engine import ModeAEngine
+from news_prefetch import PoolPrefetcher
+from npc_traders import NpcPopulation
+from round_recorder import RoundRecorder
+
+# Shared-memory layout (all little-endian, fixed at creation):
+#   header   int64[8]                       counters / flags (see H_* below)
+#   snaps    SNAP_DTYPE[SNAP_SLOTS]         ring of per-tick market snapshots
+#   orders   int64[ORDER_SLOTS]             SPSC ring: renderer -> simulation
+#   heads    uint8[HEADLINE_SLOTS, HEADLINE_BYTES]  utf-8 headline text slots
+SNAP_SLOTS = 4096
+ORDER_SLOTS = 1024
+HEADLINE_SLOTS = 16
+HEADLINE_BYTES = 512
+
+H_SNAP_COUNT = 0     # snapshots published so far
+H_ORDER_HEAD = 1     # orders written by the renderer
+H_ORDER_TAIL = 2     # orders consumed by the simulation
+H_HEADLINE_SEQ = 3   # headlines published so far
+H_STOP = 4           # renderer asks the simulation to stop
+
+ORDER_FLATTEN = np.iinfo(np.int64).min  # order slot value meaning "flatten"
+STALE_SEC = 5.0      # readers call a round dead after this long without a new snapshot
+
+SNAP_DTYPE = np.dtype([
+    ("seq", "<i8"),
+    ("t", "<f8"),            # simulated seconds since round start
+    ("mid", "<f8"),
+    ("bid", "<f8"),
+    ("ask", "<f8"),
+    ("imp", "<f8"),
+    ("inv", "<i8"),
+    ("cash", "<f8"),
+    ("pnl", "<f8"),
+    ("risk", "<f8"),
+    ("headline_seq", "<i8"),
+    ("done", "<i8"),
+    ("tick_us", "<f4"),      # wall time spent computing this tick
+    ("lag_us", "<f4"),       # how late the tick started vs. its schedule
+])
+
+
+@dataclass
+class SimConfig:
+    round_seconds: float = 90.0
+    dt: float = 0.05
+    mid0: float = 200.0
+    seed: Optional[int] = None
+    news_interval_sec: float = 5.0
+    inv_penalty_lambda: float = 0.02
+    inv_penalty_power: float = 1.3
+    # pool_fn(*pool_args) -> [(news_id, headline, direction, impact), ...]
+    # must be a module-level function so it can be sent to the child process
+    pool_fn: Optional[Callable] = None
+    pool_args: Tuple = ()
+    # optional pool -> pool reshaping done on the prefetch thread (e.g. news_prefetch.StratifiedSampler)
+    pool_sampler: Optional[Callable] = None
+    no_news_text: str = "No scored news available."
+    npc_count: int = 0           # simulated crowd size (0 = player alone vs. noise)
+    symbol_id: int = 0
+    record_path: Optional[str] = None  # binary event log of the round (see round_recorder.py)
+    max_catchup_ticks: int = 20  # after a long stall, resync instead of bursting
+
+
+def _layout():
+    off_header = 0
+    off_snaps = off_header + 8 * 8
+    off_orders = off_snaps + SNAP_DTYPE.itemsize * SNAP_SLOTS
+    off_heads = off_orders + 8 * ORDER_SLOTS
+    size = off_heads + HEADLINE_SLOTS * HEADLINE_BYTES
+    return off_header, off_snaps, off_orders, off_heads, size
+
+
+class SharedRound:
+    """NumPy views over the round's shared-memory block (no copies)."""
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        off_header, off_snaps, off_orders, off_heads, _ = _layout()
+        buf = shm.buf
+        self.header = np.ndarray((8,), dtype="<i8", buffer=buf, offset=off_header)
+        self.snaps = np.ndarray((SNAP_SLOTS,), dtype=SNAP_DTYPE, buffer=buf, offset=off_snaps)
+        self.orders = np.ndarray((ORDER_SLOTS,), dtype="<i8", buffer=buf, offset=off_orders)
+        self.heads = np.ndarray((HEADLINE_SLOTS, HEADLINE_BYTES), dtype=np.uint8, buffer=buf, offset=off_heads)
+
+    @classmethod
+    def create(cls) -> "SharedRound":
+        shm = shared_memory.SharedMemory(create=True, size=_layout()[-1])
+        r = cls(shm)
+        r.header[:] = 0
+        return r
+
+    @classmethod
+    def attach(cls, name: str, owned: bool = True) -> "SharedRound":
+        shm = shared_memory.SharedMemory(name=name)
+        if not owned:
+            # independent viewers must not let their resource tracker unlink the block on exit
+            try:
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(shm._name, "shared_memory")
+            except Exception:
+                pass
+        return cls(shm)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def close(self) -> None:
+        # drop the views before closing the mapping
+        self.header = self.snaps = self.orders = self.heads = None
+        self.shm.close()
+
+
+# -------------------------
+# simulation side (writer)
+# -------------------------
+class _Publisher:
+    def __init__(self, r: SharedRound):
+        self.r = r
+
+    def snapshot(self, t, eng: ModeAEngine, risk, headline_seq, done=0, tick_us=0.0, lag_us=0.0) -> None:
+        n = int(self.r.header[H_SNAP_COUNT])
+        slot = self.r.snaps[n % SNAP_SLOTS]
+        with metrics.timer("engine.quotes"):
+            bid, ask, _, imp = eng.quotes(t)
+        # seqlock-style: readers reject a slot whose seq does not match
+        slot["seq"] = -1
+        slot["t"] = t
+        slot["mid"] = eng.mid
+        slot["bid"] = bid
+        slot["ask"] = ask
+        slot["imp"] = imp
+        slot["inv"] = eng.player.inv
+        slot["cash"] = eng.player.cash
+        slot["pnl"] = eng.pnl()
+        slot["risk"] = risk
+        slot["headline_seq"] = headline_seq
+        slot["done"] = done
+        slot["tick_us"] = tick_us
+        slot["lag_us"] = lag_us
+        slot["seq"] = n
+        self.r.header[H_SNAP_COUNT] = n + 1
+
+    def headline(self, text_s: str) -> int:
+        seq = int(self.r.header[H_HEADLINE_SEQ]) + 1
+        raw = text_s.encode("utf-8")[: HEADLINE_BYTES - 1]
+        row = self.r.heads[seq % HEADLINE_SLOTS]
+        row[:] = 0
+        row[: len(raw)] = np.frombuffer(raw, dtype=np.uint8)
+        self.r.header[H_HEADLINE_SEQ] = seq
+        return seq
+
+    def drain_orders(self):
+        head = int(self.r.header[H_ORDER_HEAD])
+        tail = int(self.r.header[H_ORDER_TAIL])
+        out = [int(self.r.orders[i % ORDER_SLOTS]) for i in range(tail, head)]
+        self.r.header[H_ORDER_TAIL] = head
+        return out
+
+
+def _inv_penalty(inv: int, cfg: SimConfig) -> float:
+    return cfg.inv_penalty_lambda * (abs(inv) ** cfg.inv_penalty_power)
+
+
+def run_sim(shm_name: str, cfg: SimConfig) -> None:
+    """
+    Fixed-timestep simulation loop (runs in its own process).
+
+    The engine only ever sees simulated time t = k * dt, so the price path
+    depends on the seed and on which tick each order lands in, never on how
+    fast the renderer draws. Wall-clock pacing is just sleeping until the
+    next tick is due.
+    """
+    r = SharedRound.attach(shm_name)
+    pub = _Publisher(r)
+    eng = ModeAEngine(mid0=cfg.mid0, dt=cfg.dt, seed=cfg.seed)
+    crowd = NpcPopulation(cfg.npc_count, seed=cfg.seed) if cfg.npc_count > 0 else None
+    rec = RoundRecorder(cfg.record_path) if cfg.record_path else None
+    if rec is not None:
+        rec.start(0.0, cfg.symbol_id, cfg.round_seconds, cfg.dt, cfg.mid0)
+
+    def trade(qty: int, t: float) -> None:
+        if not qty:
+            return
+        with metrics.timer("engine.fill"):
+            px = eng.buy(qty=qty, now=t) if qty > 0 else eng.sell(qty=-qty, now=t)
+        if rec is not None:
+            rec.trade(t, eng.last_filled if qty > 0 else -eng.last_filled, px, eng.player.inv, eng.player.cash)
+
+    # the next pool is fetched on a background thread, so running out never stalls a tick
+    pool = PoolPrefetcher(cfg.pool_fn, cfg.pool_args, cfg.pool_sampler).start() if cfg.pool_fn is not None else None
+    next_news_t = cfg.news_interval_sec
+    headline_seq = pub.headline("Waiting for first headline...")
+    risk_cost = 0.0
+
+    n_ticks = int(round(cfg.round_seconds / cfg.dt))
+    next_wall = time.perf_counter()
+    try:
+        for k in range(n_ticks):
+            if r.header[H_STOP]:
+                break
+            t = k * cfg.dt
+            tick_start = time.perf_counter()
+
+            for qty in pub.drain_orders():
+                trade(-eng.player.inv if qty == ORDER_FLATTEN else qty, t)
+
+            if t >= next_news_t:
+                item = pool.next() if pool is not None else None
+                if item is not None:
+                    nid, headline, direction, impact = item
+                    eng.add_news(direction=direction, impact=impact, now=t)
+                    headline_seq = pub.headline(headline)
+                    if rec is not None:
+                        rec.news(t, nid, direction, impact)
+                elif pool is None or pool.last_size == 0:
+                    headline_seq = pub.headline(cfg.no_news_text)
+                next_news_t += cfg.news_interval_sec
+
+            with metrics.timer("engine.tick"):
+                eng.tick(t)
+            if crowd is not None:
+                with metrics.timer("crowd.step"):
+                    crowd.step(eng, t)
+            risk_cost += _inv_penalty(eng.player.inv, cfg) * cfg.dt
+            pub.snapshot(t, eng, risk_cost, headline_seq,
+                         tick_us=(time.perf_counter() - tick_start) * 1e6,
+                         lag_us=max(0.0, tick_start - next_wall) * 1e6)
+            if rec is not None:
+                bid, ask, _, imp = eng.quotes(t)
+                rec.quote(t, k, eng.mid, bid, ask, imp)
+
+            next_wall += cfg.dt
+            lag = next_wall - time.perf_counter()
+            if lag > 0:
+                time.sleep(lag)
+            elif -lag > cfg.max_catchup_ticks * cfg.dt:
+                next_wall = time.perf_counter()
+
+        t = n_ticks * cfg.dt
+        trade(-eng.player.inv, t)  # flatten
+        pub.snapshot(t, eng, risk_cost, headline_seq, done=1)
+        if rec is not None:
+            rec.score(t, eng.pnl(), risk_cost)
+    finally:
+        if pool is not None:
+            pool.stop()
+        if rec is not None:
+            rec.close()
+        r.close()
+
+
+# -------------------------
+# renderer side (readers)
+# -------------------------
+class SimReader:
+    """
+    Reads snapshots straight out of shared memory. Any number of readers can
+    attach; only the owning renderer should call send_order(). The snapshot
+    count doubles as a heartbeat (one per tick), so stalled() tells any
+    reader, spectators included, that the simulation died or hung.
+    """
+
+    def __init__(self, r: SharedRound):
+        self.r = r
+        self.last_seq = -1
+        self._heard = time.monotonic()
+        self._head_seq = -1
+        self._head_text = ""
+
+    def poll(self) -> np.ndarray:
+        """All snapshots published since the previous poll (oldest first)."""
+        count = int(self.r.header[H_SNAP_COUNT])
+        first = max(self.last_seq + 1, count - SNAP_SLOTS + 1)
+        if first >= count:
+            return np.empty(0, dtype=SNAP_DTYPE)
+        idx = np.arange(first, count) % SNAP_SLOTS
+        out = self.r.snaps[idx]  # fancy indexing copies just the new rows
+        ok = out["seq"] == np.arange(first, count)
+        if not ok.all():
+            # the newest slot may be mid-write; keep the consistent prefix
+            out = out[: int(np.argmin(ok))]
+        if len(out):
+            self.last_seq = int(out["seq"][-1])
+            self._heard = time.monotonic()
+        return out
+
+    def stalled(self, timeout: float = STALE_SEC) -> bool:
+        """No new snapshot for timeout seconds (a finished round ends on one with done=1)."""
+        return time.monotonic() - self._heard > timeout
+
+    def headline(self, seq: int) -> str:
+        if seq != self._head_seq:
+            raw = bytes(self.r.heads[seq % HEADLINE_SLOTS])
+            self._head_text = raw.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+            self._head_seq = seq
+        return self._head_text
+
+    def send_order(self, qty: int) -> bool:
+        head = int(self.r.header[H_ORDER_HEAD])
+        if head - int(self.r.header[H_ORDER_TAIL]) >= ORDER_SLOTS:
+            return False  # ring full; the simulation is not draining
+        self.r.orders[head % ORDER_SLOTS] = int(qty)
+        self.r.header[H_ORDER_HEAD] = head + 1
+        return True
+
+    def send_flatten(self) -> bool:
+        return self.send_order(ORDER_FLATTEN)
+
+
+class SimProcess:
+    """Owns the shared block and the simulation child process."""
+
+    def __init__(self, cfg: SimConfig):
+        self.cfg = cfg
+        self.shared = SharedRound.create()
+        ctx = mp.get_context("spawn")
+        self.proc = ctx.Process(target=run_sim, args=(self.shared.name, cfg), daemon=True)
+
+    @property
+    def name(self) -> str:
+        return self.shared.name
+
+    def start(self) -> SimReader:
+        self.proc.start()
+        return SimReader(self.shared)
+
+    def stop(self, timeout: float = 2.0) -> None:
+        if self.shared.header is not None:
+            self.shared.header[H_STOP] = 1
+        self.proc.join(timeout)
+        if self.proc.is_alive():
+            self.proc.terminate()
+        self.shared.close()
+        self.shared.shm.unlink()
+
+
+def spectate(name: str) -> SimReader:
+    """Read-only view of a running round, e.g. for a second display window."""
+    return SimReader(SharedRound.attach(name, owned=False))
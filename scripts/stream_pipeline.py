@@ -0,0 +1,459 @@
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, create_engine, text
+
+import article_store
+import finbert_features
+import http_cache
+import lexicon
+import metrics
+import score_news
+from backfill_news import PROVIDER, TOKEN, UPSERT, provider_id
+from init_db import ensure_provider_key
+
+# Continuous version of backfill_news -> finbert_features -> score_news:
+#
+#   poller -> q_raw -> dedupe -> q_new -> finbert -> q_feat -> impact -> q_scored -> writer
+#
+# One thread per stage. Queues are bounded, so a slow stage blocks the one
+# in front of it instead of growing memory; the poller is the last to feel
+# it and simply polls later. FinBERT and the impact model run on
+# micro-batches cut at BATCH_MAX items or BATCH_WAIT_SEC after the first
+# item arrived, whichever comes first. Every headline carries its stage
+# timestamps, and the writer turns them into per-stage and end-to-end
+# latency (stream.* timers; --verbose prints one line per headline).
+# A batch that raises in any stage is logged, counted (stream.errors) and
+# dropped; the stage keeps running and always passes the end marker on.
+# Its keys leave the dedupe LRU, so the finnhub poller's next sweep
+# retries them, and the tail poller rewinds to the lowest dropped news_id;
+# stdin lines are not replayed.
+engine = create_engine("sqlite:///data/db/news.db", connect_args={"timeout": 30})
+
+POLL_SEC = 30.0          # finnhub: pause between sweeps over all symbols
+SYMBOL_SLEEP_SEC = 0.3   # finnhub: between symbols within a sweep (rate limit)
+TAIL_POLL_SEC = 0.5      # tail: how often to look for new news_items rows
+QUEUE_MAX = 1024         # items (q_raw, q_new) or batches (q_feat, q_scored)
+BATCH_MAX = 32
+BATCH_WAIT_SEC = 0.05
+DEDUPE_BATCH = 256
+SEEN_MAX = 200_000       # (provider, id, symbol) keys remembered by the dedupe stage (LRU)
+REPORT_SEC = 10.0
+
+
+@dataclass
+class Headline:
+    provider: str
+    provider_id: str
+    symbol_id: Optional[int]
+    headline: str
+    body: str
+    source: Optional[str]
+    url: Optional[str]
+    published_at: int
+    news_id: Optional[int] = None   # set once the row is in news_items
+    seen: float = field(default_factory=time.perf_counter)   # when the poller picked it up
+    marks: List[Tuple[str, float]] = field(default_factory=list)  # (stage, perf_counter) on leaving it
+    probs: Optional[np.ndarray] = None
+    pred: Optional[Tuple[float, float, int]] = None   # (predicted_y, impact_score, direction)
+
+    def mark(self, stage: str) -> None:
+        self.marks.append((stage, time.perf_counter()))
+
+    @property
+    def text(self) -> str:
+        # same text finbert_features.py feeds the model
+        return ((self.headline or "") + ". " + (self.body or ""))[:2000]
+
+
+_DONE = object()   # end-of-stream marker, passed down the chain
+
+
+class Pipeline:
+    def __init__(self, source: str = "finnhub", verbose: bool = False, once: bool = False,
+                 since_id: Optional[int] = None):
+        self.source = source
+        self.verbose = verbose
+        self.once = once
+        self.since_id = since_id
+        self.stop = threading.Event()
+        self.q_raw = queue.Queue(QUEUE_MAX)
+        self.q_new = queue.Queue(QUEUE_MAX)
+        self.q_feat = queue.Queue(QUEUE_MAX)
+        self.q_scored = queue.Queue(QUEUE_MAX)
+        self.seen: "OrderedDict[Tuple[str, str, Optional[int]], None]" = OrderedDict()
+        self.seen_lock = threading.Lock()   # dedupe adds keys, _failed (any stage) evicts them
+        self.rewind: Optional[int] = None   # tail: lowest news_id of a dropped batch
+        self.scored = 0
+        self.threads: List[threading.Thread] = []
+
+    # ---- queue helpers ----
+    def _put(self, q: queue.Queue, item) -> None:
+        if q.full():
+            metrics.count("stream.backpressure")
+        q.put(item)
+
+    def _take(self, q: queue.Queue, max_n: int, wait_sec: float):
+        """
+        Block for one item, then keep taking until max_n items or wait_sec
+        after the first one. Returns (items, done).
+        """
+        first = q.get()
+        if first is _DONE:
+            return [], True
+        items = [first]
+        deadline = time.perf_counter() + wait_sec
+        while len(items) < max_n:
+            left = deadline - time.perf_counter()
+            try:
+                it = q.get(timeout=left) if left > 0 else q.get_nowait()
+            except queue.Empty:
+                break
+            if it is _DONE:
+                return items, True
+            items.append(it)
+        return items, False
+
+    # ---- sources ----
+    def _symbols(self):
+        with engine.begin() as conn:
+            return conn.execute(text("SELECT id, symbol FROM symbols WHERE symbol != 'SPY'")).fetchall()
+
+    def _poll_finnhub(self) -> None:
+        url = "https://finnhub.io/api/v1/company-news"
+        syms = self._symbols()
+        while not self.stop.is_set():
+            t0 = time.time()
+            day = 86400
+            _from = time.strftime("%Y-%m-%d", time.gmtime(t0 - day))
+            to = time.strftime("%Y-%m-%d", time.gmtime(t0))
+            for symbol_id, sym in syms:
+                if self.stop.is_set():
+                    break
+                try:
+                    # always live; the response still lands in the cache for later offline rebuilds
+                    items = http_cache.get_json("finnhub.company-news", url,
+                                                {"symbol": sym, "from": _from, "to": to, "token": TOKEN},
+                                                refresh=True)
+                except Exception as e:
+                    print(f"poll {sym} failed: {e}")
+                    items = []
+                for it in items:
+                    if not provider_id(it):
+                        continue
+                    self._put(self.q_raw, Headline(
+                        PROVIDER, provider_id(it), int(symbol_id),
+                        it.get("headline"), it.get("summary") or it.get("text") or "",
+                        it.get("source"), it.get("url"), int(it.get("datetime", 0))))
+                self.stop.wait(SYMBOL_SLEEP_SEC)
+            if self.once:
+                break
+            self.stop.wait(max(0.0, POLL_SEC - (time.time() - t0)))
+
+    def _poll_tail(self) -> None:
+        # rows written by someone else (backfill_news, a webhook, synth_corpus): score what is new
+        with engine.begin() as conn:
+            last = self.since_id if self.since_id is not None else \
+                int(conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM news_items")).scalar())
+        q = text("""
+            SELECT n.id, n.provider, n.provider_id, n.symbol_id, n.headline, n.source, n.url, n.published_at
+            FROM news_items n
+            WHERE n.id > :last
+              AND n.published_at > 0
+              AND n.id NOT IN (SELECT news_id FROM news_predictions WHERE news_id > :last)
+            ORDER BY n.id
+            LIMIT :lim
+        """)
+        while not self.stop.is_set():
+            with self.seen_lock:
+                if self.rewind is not None:
+                    # rows still in flight come back too; dedupe drops them as repeats
+                    last, self.rewind = min(last, self.rewind - 1), None
+            with engine.begin() as conn:
+                rows = conn.execute(q, {"last": last, "lim": QUEUE_MAX}).fetchall()
+                bodies = article_store.get_many(conn, [r[0] for r in rows])
+            for r in rows:
+                self._put(self.q_raw, Headline(r[1] or PROVIDER, str(r[2] or r[0]), r[3], r[4],
+                                               bodies.get(int(r[0]), ""), r[5], r[6], int(r[7]), news_id=int(r[0])))
+                last = int(r[0])
+            if self.once and len(rows) < QUEUE_MAX:
+                break
+            if len(rows) < QUEUE_MAX:
+                self.stop.wait(TAIL_POLL_SEC)
+
+    def _poll_stdin(self) -> None:
+        # one Finnhub-shaped JSON object per line, plus "symbol" (ticker) or "symbol_id"
+        with engine.begin() as conn:
+            ids = {s: int(i) for i, s in conn.execute(text("SELECT id, symbol FROM symbols")).fetchall()}
+        for line in sys.stdin:
+            if self.stop.is_set():
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                it = json.loads(line)
+                sid = it.get("symbol_id") or ids[str(it["symbol"]).upper()]
+            except (ValueError, KeyError) as e:
+                print(f"stdin: skipped line ({e!r})")
+                continue
+            if not provider_id(it):
+                print("stdin: skipped line (no id or url)")
+                continue
+            self._put(self.q_raw, Headline(
+                it.get("provider") or PROVIDER, provider_id(it), int(sid),
+                it.get("headline"), it.get("summary") or it.get("text") or "",
+                it.get("source"), it.get("url"), int(it.get("datetime") or time.time())))
+
+    def _poller(self) -> None:
+        try:
+            {"finnhub": self._poll_finnhub, "tail": self._poll_tail, "stdin": self._poll_stdin}[self.source]()
+        finally:
+            self.q_raw.put(_DONE)
+
+    def _failed(self, stage: str, batch: List[Headline], e: Exception) -> None:
+        """Log a dropped batch and forget its keys so the poller can bring it back."""
+        print(f"{stage}: dropped a batch of {len(batch)} ({e!r})")
+        metrics.count("stream.errors")
+        ids = [h.news_id for h in batch if h.news_id is not None]
+        with self.seen_lock:
+            for h in batch:
+                self.seen.pop((h.provider, h.provider_id, h.symbol_id), None)
+            if ids:
+                self.rewind = min(ids + ([self.rewind] if self.rewind is not None else []))
+
+    # ---- stages ----
+    def _dedupe(self) -> None:
+        # drops repeats across polls, upserts new articles and skips anything already scored
+        lookup = text("""
+            SELECT n.provider_id, n.symbol_id, n.id, p.news_id IS NOT NULL
+            FROM news_items n
+            LEFT JOIN news_predictions p ON p.news_id = n.id
+            WHERE n.provider = :prov AND n.provider_id IN :pids
+        """).bindparams(bindparam("pids", expanding=True))
+        done = False
+        try:
+            while not done:
+                # no deadline here: take whatever is already queued, the model stage does the batching
+                items, done = self._take(self.q_raw, DEDUPE_BATCH, 0.0)
+                try:
+                    self._dedupe_batch(items, lookup)
+                except Exception as e:
+                    self._failed("dedupe", items, e)
+        finally:
+            self.q_new.put(_DONE)
+
+    def _dedupe_batch(self, items: List[Headline], lookup) -> None:
+        fresh = {}
+        with self.seen_lock:
+            for h in items:
+                key = (h.provider, h.provider_id, h.symbol_id)
+                if key in fresh:
+                    metrics.count("stream.dup")
+                    continue
+                if key in self.seen:
+                    self.seen.move_to_end(key)
+                    metrics.count("stream.dup")
+                    continue
+                fresh[key] = h
+        keys = list(fresh)
+
+        pending = [h for h in fresh.values() if h.news_id is None]
+        if pending:
+            now = int(time.time())
+            with metrics.timer("stream.db_upsert"), engine.begin() as conn:
+                conn.execute(UPSERT, [{
+                    "prov": h.provider, "pid": h.provider_id, "sid": h.symbol_id, "h": h.headline,
+                    "src": h.source, "url": h.url, "pub": h.published_at, "ing": now,
+                } for h in pending])
+                by_prov = {}
+                for h in pending:
+                    by_prov.setdefault(h.provider, []).append(h.provider_id)
+                known = {}
+                for prov, pids in by_prov.items():
+                    for pid, sid, nid, scored in conn.execute(lookup, {"prov": prov, "pids": pids}):
+                        known[(prov, pid, sid)] = (int(nid), bool(scored))
+                article_store.put(conn, {known[k][0]: h.body for k, h in fresh.items()
+                                         if h.news_id is None and k in known})
+            for key, h in list(fresh.items()):
+                if h.news_id is not None:
+                    continue
+                nid, scored = known.get(key, (None, True))
+                if scored:
+                    metrics.count("stream.already_scored")
+                    fresh.pop(key)
+                else:
+                    h.news_id = nid
+        # only once the rows are in: a batch that failed above is retried by the next poll
+        with self.seen_lock:
+            for key in keys:
+                self.seen[key] = None
+            while len(self.seen) > SEEN_MAX:
+                self.seen.popitem(last=False)
+
+        for h in fresh.values():
+            h.mark("dedupe")
+            self._put(self.q_new, h)
+
+    def _finbert(self) -> None:
+        done = False
+        try:
+            while not done:
+                batch, done = self._take(self.q_new, BATCH_MAX, BATCH_WAIT_SEC)
+                if not batch:
+                    continue
+                try:
+                    with metrics.timer("stream.finbert_batch"):
+                        probs = finbert_features.finbert_probs([h.text for h in batch])
+                except Exception as e:
+                    self._failed("finbert", batch, e)
+                    continue
+                metrics.count("stream.finbert_items", len(batch))
+                for h, p in zip(batch, probs):
+                    h.probs = np.asarray(p, dtype=float)
+                    h.mark("finbert")
+                self._put(self.q_feat, batch)
+        finally:
+            self.q_feat.put(_DONE)
+
+    def _impact(self) -> None:
+        try:
+            lex = lexicon.default()
+            while True:
+                batch = self.q_feat.get()
+                if batch is _DONE:
+                    break
+                try:
+                    y_hat, impact, direction = score_news.predict_impact(
+                        np.stack([h.probs for h in batch]), [h.published_at for h in batch],
+                        lex.classify(h.headline or "" for h in batch), [h.symbol_id for h in batch])
+                except Exception as e:
+                    self._failed("impact", batch, e)
+                    continue
+                for h, y, imp, d in zip(batch, y_hat, impact, direction):
+                    h.pred = (float(y), float(imp), int(d))
+                    h.mark("impact")
+                self._put(self.q_scored, batch)
+        finally:
+            self.q_scored.put(_DONE)
+
+    def _writer(self) -> None:
+        done = False
+        while not done:
+            # coalesce whatever is waiting into one transaction
+            batch = self.q_scored.get()
+            if batch is _DONE:
+                break
+            items = list(batch)
+            while len(items) < DEDUPE_BATCH:
+                try:
+                    more = self.q_scored.get_nowait()
+                except queue.Empty:
+                    break
+                if more is _DONE:
+                    done = True
+                    break
+                items.extend(more)
+
+            now = int(time.time())
+            try:
+                with metrics.timer("stream.db_write"), engine.begin() as conn:
+                    conn.execute(finbert_features.FEATURES_UPSERT, [
+                        finbert_features.feature_params(h.news_id, h.probs, h.source, h.published_at) for h in items])
+                    conn.execute(score_news.PREDICTION_UPSERT, [
+                        {"nid": h.news_id, "y": h.pred[0], "imp": h.pred[1], "dir": h.pred[2], "ts": now} for h in items])
+            except Exception as e:
+                self._failed("writer", items, e)
+                continue
+            wall = time.time()
+            for h in items:
+                h.mark("write")
+                self._latency(h, wall)
+            self.scored += len(items)
+            metrics.count("stream.scored", len(items))
+
+    def _latency(self, h: Headline, wall: float) -> None:
+        e2e = h.marks[-1][1] - h.seen
+        metrics.hist("stream.e2e").observe(e2e)
+        if h.published_at:
+            # includes the provider's own delay and our poll interval
+            metrics.hist("stream.publish_to_scored").observe(max(0.0, wall - h.published_at))
+        prev = h.seen
+        parts = []
+        for stage, t in h.marks:
+            # time since the previous stage handed it over, queue wait included
+            d = t - prev
+            metrics.hist(f"stream.{stage}").observe(d)
+            parts.append(f"{stage} {d * 1000:.0f}")
+            prev = t
+        if self.verbose:
+            p = h.pred
+            print(f"[{e2e * 1000:6.0f} ms] id={h.news_id} dir={p[2]:+d} impact={p[1]:.3f} "
+                  f"({' / '.join(parts)}) :: {(h.headline or '')[:90]}")
+
+    def _report(self) -> None:
+        while not self.stop.wait(REPORT_SEC):
+            e2e = metrics.hist("stream.e2e")
+            print(f"scored={self.scored} e2e p50={e2e.quantile(0.5) * 1000:.0f}ms "
+                  f"p99={e2e.quantile(0.99) * 1000:.0f}ms max={e2e.max * 1000:.0f}ms | queues "
+                  f"raw={self.q_raw.qsize()} new={self.q_new.qsize()} "
+                  f"feat={self.q_feat.qsize()} scored={self.q_scored.qsize()}")
+
+    # ---- lifecycle ----
+    def start(self) -> "Pipeline":
+        with engine.begin() as conn:
+            if self.source != "tail" and not ensure_provider_key(conn):
+                raise SystemExit("news_items has duplicate articles; run compact_news.py first.")
+        with engine.connect() as conn:
+            # readers (live rounds) keep working while the writer commits; must run outside a transaction
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        finbert_features.load_models()
+        score_news.load_models(finbert=False)
+        for name, fn in (("poller", self._poller), ("dedupe", self._dedupe), ("finbert", self._finbert),
+                         ("impact", self._impact), ("writer", self._writer)):
+            t = threading.Thread(target=fn, name=f"stream-{name}", daemon=True)
+            t.start()
+            self.threads.append(t)
+        threading.Thread(target=self._report, name="stream-report", daemon=True).start()
+        return self
+
+    def join(self) -> None:
+        try:
+            while self.threads[-1].is_alive():
+                self.threads[-1].join(0.5)
+        except KeyboardInterrupt:
+            print("stopping: draining what is already in flight...")
+            self.stop.set()
+            self.threads[-1].join()
+        self.stop.set()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Continuously poll, featurize and score news into news_predictions.")
+    ap.add_argument("--source", choices=("finnhub", "tail", "stdin"), default="finnhub",
+                    help="finnhub: poll company-news for every symbol; tail: score rows other scripts "
+                         "insert into news_items; stdin: Finnhub-shaped JSON lines")
+    ap.add_argument("--since-id", type=int, default=None, help="tail: start after this news_items.id (default: current max)")
+    ap.add_argument("--once", action="store_true", help="one sweep (finnhub/tail), drain and exit")
+    ap.add_argument("--verbose", "-v", action="store_true", help="one latency line per scored headline")
+    args = ap.parse_args()
+
+    metrics.enable()
+    t0 = time.time()
+    p = Pipeline(args.source, verbose=args.verbose, once=args.once, since_id=args.since_id).start()
+    p.join()
+    e2e = metrics.hist("stream.e2e")
+    print(f"Scored {p.scored} headlines in {time.time() - t0:.1f}s. "
+          f"e2e p50={e2e.quantile(0.5) * 1000:.0f}ms p99={e2e.quantile(0.99) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import time
+import zlib
+
+import numpy as np
+
+# Drop-in stand-ins for FinBERT and the XGB impact model, for hosts that can
+# not download from Hugging Face. finbert_features.py and score_news.py use
+# them when NEWS_STUB_MODELS=1.
+STUB_ENV = "NEWS_STUB_MODELS"
+
+# per-call cost of the real models on a laptop CPU; NEWS_STUB_LATENCY scales
+# it (0 = as fast as possible, 2 = twice as slow)
+FINBERT_BATCH_MS = 5.0
+FINBERT_ITEM_MS = 6.0
+IMPACT_CALL_MS = 0.15
+IMPACT_ROW_US = 2.0
+
+POS_CUES = ("beats", "raises guidance", "upgrade", "record revenue", "surges", "wins", "strong demand", "jumps", "tops estimates")
+NEG_CUES = ("misses", "cuts guidance", "downgrade", "lawsuit", "probe", "recall", "plunges", "falls", "weak demand")
+
+
+def enabled() -> bool:
+    return os.getenv(STUB_ENV, "") not in ("", "0")
+
+
+def _latency_scale() -> float:
+    return float(os.getenv("NEWS_STUB_LATENCY", "1"))
+
+
+def _sleep_ms(ms: float) -> None:
+    ms *= _latency_scale()
+    if ms > 0:
+        time.sleep(ms / 1000.0)
+
+
+def finbert_probs(texts) -> np.ndarray:
+    """
+    Same contract as the FinBERT helpers: (n, 3) float32 [neg, neu, pos].
+    Cue words set the lean and a CRC of the text adds stable noise, so the
+    same headline always scores the same.
+    """
+    n = len(texts)
+    _sleep_ms(FINBERT_BATCH_MS + FINBERT_ITEM_MS * n)
+
+    logits = np.zeros((n, 3), dtype=np.float32)
+    for i, s in enumerate(texts):
+        h = (s or "").lower()
+        lean = sum(c in h for c in POS_CUES) - sum(c in h for c in NEG_CUES)
+        noise = (zlib.crc32(h.encode("utf-8")) & 0xFFFF) / 65535.0 - 0.5
+        logits[i] = (-1.5 * lean + noise, 0.8 - abs(lean) + 0.5 * noise, 1.5 * lean - noise)
+    e = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return e / e.sum(axis=1, keepdims=True)
+
+
+class StubImpactModel:
+    """predict() on [sentiment, p_pos, p_neg, p_neu, hour, dow] rows, like the trained XGBRegressor."""
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        _sleep_ms(IMPACT_CALL_MS + IMPACT_ROW_US * len(X) / 1000.0)
+        sentiment, hour = X[:, 0], X[:, 4]
+        market_hours = (hour >= 13) & (hour < 21)  # UTC
+        return 0.004 + 0.012 * np.abs(sentiment) * np.where(market_hours, 1.0, 0.6)
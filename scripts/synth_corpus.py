@@ -0,0 +1,352 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import create_engine, text
+
+from init_db import DDL, ensure_provider_key
+from news_search import ensure_fts
+
+DEFAULT_DB = "data/db/synth.db"
+SEED = 11
+
+SECTORS = [
+    "Technology", "Communication Services", "Consumer Discretionary", "Consumer Staples",
+    "Energy", "Financials", "Health Care", "Industrials", "Materials", "Real Estate", "Utilities",
+]
+SOURCES = ["CNBC", "DowJones", "SeekingAlpha", "Reuters", "Benzinga", "MarketWatch", "Yahoo"]
+SOURCE_P = [0.18, 0.14, 0.2, 0.16, 0.14, 0.1, 0.08]
+
+# headline templates: {co} company, {q} quarter, {pct} a move
+POS = [
+    "{co} beats Q{q} estimates on strong demand",
+    "{co} raises guidance after record revenue",
+    "{co} jumps {pct}% after analyst upgrade",
+    "{co} wins multi-year contract, stock surges",
+    "{co} tops estimates as margins expand",
+]
+NEG = [
+    "{co} misses Q{q} estimates as costs rise",
+    "{co} cuts guidance on weak demand",
+    "{co} falls {pct}% after downgrade",
+    "Regulators open probe into {co}",
+    "{co} faces lawsuit over product recall",
+]
+NEU = [
+    "{co} to present at industry conference",
+    "{co} announces board changes",
+    "{co} schedules Q{q} earnings call",
+    "What to watch for {co} this week",
+    "{co} files annual report",
+]
+BODY = "{co} said on {day} that {what}. Shares of {co} traded {pct}% {dirw} in early trading."
+
+DAY = 86400
+CHUNK = 50_000
+
+
+def _symbol_name(i: int) -> str:
+    # SAAAA, SAAAB, ... (up to 26**4 names)
+    s = ""
+    for _ in range(4):
+        s = chr(65 + i % 26) + s
+        i //= 26
+    return "S" + s
+
+
+def _weekdays(start_ts: int, n_days: int) -> np.ndarray:
+    days = start_ts + DAY * np.arange(int(n_days * 7 / 5) + 7)
+    dow = (days // DAY + 3) % 7  # 1970-01-01 was a Thursday
+    return days[dow < 5][:n_days]
+
+
+def generate(db_path: str, n_symbols: int, n_news: int, n_days: int, seed: int = SEED) -> dict:
+    """
+    Fill a fresh DB with sectors, n_symbols names (+ SPY), daily candles and
+    n_news headlines. Candle returns are market + sector + idiosyncratic
+    noise, and each directional headline adds a jump to its name's next-day
+    return, so build_labels/train_regressor have real signal to find.
+    """
+    Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+    eng = create_engine(f"sqlite:///{db_path}")
+    rng = np.random.default_rng(seed)
+    stats = {}
+
+    with eng.begin() as conn:
+        for s in (x.strip() for x in DDL.split(";")):
+            if s:
+                conn.execute(text(s))
+        if conn.execute(text("SELECT COUNT(*) FROM news_items")).scalar():
+            raise SystemExit(f"{db_path} already has news_items; generate into a fresh path.")
+
+    raw = eng.raw_connection()
+    try:
+        cur = raw.cursor()
+        # bulk load: no journal, no fsync; the file is disposable until we finish
+        cur.execute("PRAGMA journal_mode=OFF")
+        cur.execute("PRAGMA synchronous=OFF")
+
+        t0 = time.perf_counter()
+        cur.executemany("INSERT INTO sectors(id, name) VALUES (?, ?)", [(k + 1, s) for k, s in enumerate(SECTORS)])
+        sector = rng.integers(0, len(SECTORS), n_symbols)
+        names = [_symbol_name(i) for i in range(n_symbols)]
+        cur.executemany(
+            "INSERT INTO symbols(id, symbol, name, sector_id) VALUES (?, ?, ?, ?)",
+            [(i + 1, names[i], f"{names[i]} Corp", int(sector[i]) + 1) for i in range(n_symbols)],
+        )
+        spy_id = n_symbols + 1
+        cur.execute("INSERT INTO symbols(id, symbol, name) VALUES (?, 'SPY', 'SPDR S&P 500 ETF')", (spy_id,))
+
+        # ---- news: popularity is heavy-tailed, like real coverage ----
+        days = _weekdays(1_700_000_000 - 1_700_000_000 % DAY, n_days)
+        pop = rng.zipf(1.6, n_symbols).astype(float)
+        sym = rng.choice(n_symbols, size=n_news, p=pop / pop.sum())
+        day_i = rng.integers(0, n_days - 1, n_news)
+        # hour of day skewed toward the US session (UTC 12..21)
+        sec = np.where(rng.random(n_news) < 0.7, rng.integers(12 * 3600, 21 * 3600, n_news), rng.integers(0, DAY, n_news))
+        pub = days[day_i] + sec
+        order = np.argsort(pub, kind="stable")  # ids ascend with time, as ingestion would
+        sym, day_i, pub = sym[order], day_i[order], pub[order]
+        direction = rng.choice([-1, 0, 1], size=n_news, p=[0.3, 0.35, 0.35])
+        jump = direction * np.abs(rng.normal(0.0, 0.012, n_news))
+        src = rng.choice(len(SOURCES), size=n_news, p=SOURCE_P)
+        tmpl = rng.integers(0, 5, n_news)
+        q = rng.integers(1, 5, n_news)
+        pct = np.round(rng.uniform(0.5, 9.0, n_news), 1)
+
+        # ---- candles: log returns [symbol, day] ----
+        mkt = rng.normal(0.0003, 0.009, n_days)
+        sec_r = rng.normal(0.0, 0.006, (len(SECTORS), n_days))
+        beta = rng.uniform(0.6, 1.5, n_symbols)
+        vol = rng.uniform(0.008, 0.03, n_symbols)
+        r = beta[:, None] * mkt[None, :] + sec_r[sector] + vol[:, None] * rng.standard_normal((n_symbols, n_days))
+        np.add.at(r, (sym, day_i + 1), jump)  # news moves the next session's close
+        close = np.round(rng.uniform(10, 500, n_symbols)[:, None] * np.exp(np.cumsum(r, axis=1)), 4)
+        spy = np.round(400.0 * np.exp(np.cumsum(mkt)), 4)
+        volume = rng.integers(100_000, 20_000_000, (n_symbols, n_days)).astype(float)
+
+        for i in range(n_symbols):
+            cur.executemany(
+                "INSERT INTO price_candles(symbol_id, ts, close, volume) VALUES (?, ?, ?, ?)",
+                zip([i + 1] * n_days, days.tolist(), close[i].tolist(), volume[i].tolist()),
+            )
+        cur.executemany(
+            "INSERT INTO price_candles(symbol_id, ts, close, volume) VALUES (?, ?, ?, ?)",
+            zip([spy_id] * n_days, days.tolist(), spy.tolist(), [0.0] * n_days),
+        )
+        raw.commit()
+        stats["candles"] = (n_symbols + 1) * n_days
+        stats["candles_sec"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        now = int(time.time())
+        for lo in range(0, n_news, CHUNK):
+            hi = min(n_news, lo + CHUNK)
+            rows = []
+            for k in range(lo, hi):
+                co = names[sym[k]]
+                d = int(direction[k])
+                bank = POS if d > 0 else NEG if d < 0 else NEU
+                h = bank[tmpl[k]].format(co=co, q=int(q[k]), pct=pct[k])
+                b = BODY.format(
+                    co=co, day=time.strftime("%A", time.gmtime(int(pub[k]))), what=h,
+                    pct=pct[k], dirw="higher" if d > 0 else "lower" if d < 0 else "flat",
+                )
+                rows.append((f"synth-{k}", int(sym[k]) + 1, h, b, SOURCES[src[k]], f"https://example.com/n/{k}", int(pub[k]), now))
+            cur.executemany("""
+                INSERT INTO news_items(provider, provider_id, symbol_id, headline, body, source, url, published_at, ingested_at)
+                VALUES ('synth', ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            raw.commit()
+            print(f"  news {hi:,}/{n_news:,}", end="\r")
+        print()
+        stats["news"] = n_news
+        stats["news_sec"] = time.perf_counter() - t0
+    finally:
+        raw.close()
+
+    # bodies compressed and the full-text index built once over the finished
+    # table (faster than per-row triggers)
+    t0 = time.perf_counter()
+    with eng.begin() as conn:
+        ensure_fts(conn)
+        ensure_provider_key(conn)
+    stats["fts_sec"] = time.perf_counter() - t0
+    eng.dispose()
+    return stats
+
+
+SESSION_OPEN_SEC = 14 * 3600 + 1800   # 14:30 UTC
+SESSION_BARS = 390
+
+
+def generate_intraday(db_path: str, root: str, n_days: int, max_symbols: int = 0, seed: int = SEED) -> int:
+    """
+    Minute bars for the last n_days candle dates of every symbol in db_path
+    (optionally only the max_symbols most covered), written to an
+    IntradayStore. Each session starts at the previous daily close, and
+    headlines move the price over the five minutes after they publish.
+    """
+    from intraday_store import BAR_SEC, IntradayStore
+
+    eng = create_engine(f"sqlite:///{db_path}")
+    rng = np.random.default_rng(seed)
+    with eng.begin() as conn:
+        days = [int(r[0]) for r in conn.execute(text(
+            "SELECT DISTINCT ts FROM price_candles ORDER BY ts DESC LIMIT :n"), {"n": n_days + 1}).fetchall()][::-1]
+        syms = conn.execute(text("""
+            SELECT s.id, s.symbol FROM symbols s
+            LEFT JOIN news_items n ON n.symbol_id = s.id
+            GROUP BY s.id ORDER BY s.symbol = 'SPY' DESC, COUNT(n.id) DESC
+        """)).fetchall()
+        if max_symbols:
+            syms = syms[: max_symbols + 1]
+        closes = conn.execute(text("SELECT symbol_id, ts, close FROM price_candles WHERE ts >= :t"), {"t": days[0]}).fetchall()
+        news = conn.execute(text("""
+            SELECT n.symbol_id, n.published_at, COALESCE(p.direction, 0)
+            FROM news_items n LEFT JOIN news_predictions p ON p.news_id = n.id
+            WHERE n.published_at >= :t
+        """), {"t": days[1] if len(days) > 1 else days[0]}).fetchall()
+    eng.dispose()
+
+    close_of = {(int(s), int(t)): float(c) for s, t, c in closes}
+    shocks = {}
+    for sid, pub, d in news:
+        shocks.setdefault(int(sid), []).append((int(pub), int(d) or int(rng.choice((-1, 1)))))
+
+    store = IntradayStore(root)
+    offs = SESSION_OPEN_SEC + BAR_SEC * np.arange(SESSION_BARS)
+    n_bars = 0
+    for sid, sym in syms:
+        sid = int(sid)
+        vol = 0.0006 if sym == "SPY" else rng.uniform(0.0008, 0.002)
+        for prev, day in zip(days[:-1], days[1:]):
+            p0 = close_of.get((sid, prev))
+            if p0 is None:
+                continue
+            ts = day + offs
+            r = rng.normal(0.0, vol, SESSION_BARS)
+            for pub, d in shocks.get(sid, ()):
+                k = (pub - ts[0]) // BAR_SEC + 1
+                if 0 <= k < SESSION_BARS:
+                    r[k:k + 5] += d * abs(rng.normal(0.0, 0.004)) / 5.0
+            c = p0 * np.exp(np.cumsum(r))
+            o = np.concatenate([[p0], c[:-1]])
+            wig = np.abs(rng.normal(0.0, vol / 2, SESSION_BARS))
+            store.write_day(sym, day // DAY, {
+                "ts": ts, "open": o, "close": c,
+                "high": np.maximum(o, c) * (1 + wig), "low": np.minimum(o, c) * (1 - wig),
+                "volume": rng.integers(100, 50_000, SESSION_BARS).astype(float),
+            })
+            n_bars += SESSION_BARS
+    return n_bars
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / 2**20
+        except Exception:
+            return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def _count(eng, table: str) -> int:
+    with eng.begin() as conn:
+        return int(conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar())
+
+
+def run_pipeline(db_path: str, score_batches: int = 20) -> list:
+    """
+    features -> labels -> train -> score against db_path with stub FinBERT,
+    timing each stage. The trained model is written next to the DB so the
+    real data/models/impact_xgb.joblib is never touched.
+    """
+    os.environ["NEWS_STUB_MODELS"] = "1"
+    import build_labels
+    import finbert_features
+    import model_registry
+    import score_news
+    import train_regressor
+
+    eng = create_engine(f"sqlite:///{db_path}")
+    model_path = str(Path(db_path).with_suffix(".impact_xgb.joblib"))
+    for m in (finbert_features, build_labels, train_regressor, score_news):
+        m.engine = eng
+    train_regressor.MODEL_PATH = score_news.IMPACT_MODEL_PATH = model_path
+    model_registry.FAMILY_DIR = str(Path(db_path).with_suffix(".family"))
+    score_news.impact_model = None
+
+    def score_all():
+        # score_news.main() handles 500 rows per call
+        for _ in range(score_batches):
+            before = _count(eng, "news_predictions")
+            score_news.main()
+            if _count(eng, "news_predictions") == before:
+                break
+
+    stages = [
+        ("features", finbert_features.main, "news_features"),
+        ("labels", build_labels.main, "train_rows"),
+        ("train", train_regressor.main, "train_rows"),
+        ("score", score_all, "news_predictions"),
+    ]
+    report = []
+    for name, fn, table in stages:
+        before = _count(eng, table)
+        t0 = time.perf_counter()
+        fn()
+        sec = time.perf_counter() - t0
+        rows = _count(eng, table) - before if name != "train" else before
+        report.append({"stage": name, "rows": rows, "sec": sec, "rows_per_sec": rows / sec if sec else 0.0, "peak_rss_mb": peak_rss_mb()})
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Synthetic corpus + offline pipeline for scale tests.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("generate", help="fill a fresh DB with synthetic symbols, candles and news")
+    p.add_argument("--db", default=DEFAULT_DB)
+    p.add_argument("--symbols", type=int, default=2000)
+    p.add_argument("--news", type=int, default=1_000_000)
+    p.add_argument("--days", type=int, default=250, help="trading days of candles")
+    p.add_argument("--seed", type=int, default=SEED)
+    p = sub.add_parser("intraday", help="minute bars for the DB's symbols into the intraday store")
+    p.add_argument("--db", default=DEFAULT_DB)
+    p.add_argument("--root", default="data/intraday")
+    p.add_argument("--days", type=int, default=20, help="most recent sessions to cover")
+    p.add_argument("--max-symbols", type=int, default=0, help="0 = all")
+    p.add_argument("--seed", type=int, default=SEED)
+    p = sub.add_parser("pipeline", help="run features -> labels -> train -> score with stub models")
+    p.add_argument("--db", default=DEFAULT_DB)
+    p.add_argument("--score-batches", type=int, default=20, help="score_news.main() calls (500 rows each)")
+    args = ap.parse_args()
+
+    if args.cmd == "generate":
+        s = generate(args.db, args.symbols, args.news, args.days, args.seed)
+        print(f"candles: {s['candles']:,} in {s['candles_sec']:.1f}s ({s['candles'] / s['candles_sec']:,.0f}/s)")
+        print(f"news:    {s['news']:,} in {s['news_sec']:.1f}s ({s['news'] / s['news_sec']:,.0f}/s)")
+        print(f"fts:     indexed in {s['fts_sec']:.1f}s")
+        print(f"Wrote {args.db}  peak RSS {peak_rss_mb() or 0:.0f} MB")
+    elif args.cmd == "intraday":
+        t0 = time.perf_counter()
+        n = generate_intraday(args.db, args.root, args.days, args.max_symbols, args.seed)
+        print(f"Wrote {n:,} minute bars to {args.root} in {time.perf_counter() - t0:.1f}s")
+    else:
+        report = run_pipeline(args.db, args.score_batches)
+        print(f"\n{'stage':10s} {'rows':>10s} {'sec':>9s} {'rows/s':>11s} {'peak RSS MB':>12s}")
+        for r in report:
+            rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] is not None else "n/a"
+            print(f"{r['stage']:10s} {r['rows']:10,d} {r['sec']:9.2f} {r['rows_per_sec']:11,.0f} {rss:>12s}")
+
+
+if __name__ == "__main__":
+    main()
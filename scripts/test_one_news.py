@@ -1,14 +1,15 @@
-import joblib
 import numpy as np
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
+import model_registry
 
 MODEL = "ProsusAI/finbert"
 tok = AutoTokenizer.from_pretrained(MODEL)
 mdl = AutoModelForSequenceClassification.from_pretrained(MODEL)
 mdl.eval()
 
-impact_model = joblib.load("data/models/impact_xgb.joblib")
+impact_model = model_registry.ModelRegistry("data/models/impact_xgb.joblib")
+SYMBOL_ID = None  # score with this symbol's model from the family (None = global)
 
 def finbert_feats(text: str):
     with torch.no_grad():
@@ -18,16 +19,17 @@ def finbert_feats(text: str):
     sentiment_score = float(p_pos - p_neg)
     return float(p_pos), float(p_neg), float(p_neu), sentiment_score
 
-def predict_y(headline: str, hour=10, dow=1):
+def predict_y(headline: str, hour=10, dow=1, symbol_id=None):
     p_pos, p_neg, p_neu, s = finbert_feats(headline)
     X = np.array([[s, p_pos, p_neg, p_neu, hour, dow]], dtype=float)
-    y_hat = float(impact_model.predict(X)[0])
+    y_hat = float(impact_model.predict(X, [symbol_id])[0])
     return s, y_hat
 
 if __name__ == "__main__":
     headline = "Here's right now whats happening with tiktok deal"
-    s, y_hat = predict_y(headline, hour=10, dow=1)
+    s, y_hat = predict_y(headline, hour=10, dow=1, symbol_id=SYMBOL_ID)
     print("headline:", headline)
+    print("model:", impact_model.route(SYMBOL_ID))
     print("sentiment_score:", s)
     print("predicted y (abs abnormal log-return):", y_hat)
 
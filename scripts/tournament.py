@@ -0,0 +1,285 @@
+import argparse
+import importlib
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+from mode_a_engine import ModeAEngine, Player
+from npc_traders import NpcPopulation
+
+DB = "sqlite:///data/db/news.db"
+
+SYMBOL = "AMZN"
+NEWS_POOL_SIZE = 300
+
+
+@dataclass
+class RoundRules:
+    """Same rules as run_round_mode_a.py / the pygame UI, minus the wall clock."""
+    round_seconds: float = 30.0
+    dt: float = 0.05
+    mid0: float = 200.0
+    news_interval_sec: float = 15.0
+    min_impact: float = 0.15
+    inv_penalty_lambda: float = 0.02
+    inv_penalty_power: float = 1.3
+    max_order_qty: int = 100
+    npc_count: int = 0   # crowd flow is slow to simulate; leave off for large sweeps
+
+
+@dataclass
+class MarketView:
+    """What every strategy sees on a tick (shared, refreshed once per tick)."""
+    t: float = 0.0
+    t_left: float = 0.0
+    mid: float = 0.0
+    bid: float = 0.0
+    ask: float = 0.0
+    spread: float = 0.0
+    imp: float = 0.0
+    headline: str = ""
+    news: Optional[Tuple[int, float]] = None   # (direction, impact) on the injection tick only
+
+
+@dataclass
+class Seat(Player):
+    """One strategy's account in a round; `state` is scratch space for the strategy."""
+    risk: float = 0.0
+    trades: int = 0
+    max_abs_inv: int = 0
+    state: dict = field(default_factory=dict)
+
+
+# strategy(view, seat) -> signed order qty for this tick (0 = do nothing).
+# Must be a module-level function so worker processes can import it.
+Strategy = Callable[[MarketView, Seat], int]
+
+
+def fetch_pool(symbol: str = SYMBOL, limit: int = NEWS_POOL_SIZE, min_impact: float = RoundRules.min_impact):
+    """(news_id, headline, direction, impact) oldest->newest, inject-ready only."""
+    db = create_engine(DB)
+    with db.begin() as conn:
+        rows = conn.execute(text("""
+            SELECT n.id, n.headline, p.direction, p.impact_score
+            FROM news_items n
+            JOIN symbols s ON s.id = n.symbol_id
+            JOIN news_predictions p ON p.news_id = n.id
+            WHERE s.symbol = :sym
+            ORDER BY n.id DESC
+            LIMIT :lim
+        """), {"sym": symbol, "lim": limit}).fetchall()
+    pool = [(int(r[0]), r[1], int(r[2]), float(r[3])) for r in rows][::-1]
+    return [x for x in pool if x[2] != 0 and x[3] >= min_impact]
+
+
+def play_round(rules: RoundRules, strategies: Sequence[Tuple[str, Strategy]], pool: Sequence[tuple], seed: int) -> List[tuple]:
+    """
+    One scenario, every strategy at once. Player trades never move the mid
+    in ModeAEngine, so the price path depends only on the seed and all
+    strategies can share one engine, each trading its own Seat.
+    """
+    eng = ModeAEngine(mid0=rules.mid0, dt=rules.dt, seed=seed)
+    crowd = NpcPopulation(rules.npc_count, seed=seed) if rules.npc_count > 0 else None
+    rng = random.Random(seed)
+    pool_i = rng.randrange(len(pool)) if pool else 0
+
+    seats = [Seat() for _ in strategies]
+    fns = [fn for _, fn in strategies]
+    view = MarketView()
+    cap = rules.max_order_qty
+    lam, power, dt = rules.inv_penalty_lambda, rules.inv_penalty_power, rules.dt
+
+    n_ticks = int(round(rules.round_seconds / dt))
+    next_news_t = rules.news_interval_sec
+    for k in range(n_ticks):
+        t = k * dt
+
+        view.news = None
+        if t >= next_news_t:
+            if pool:
+                _, headline, direction, impact = pool[pool_i % len(pool)]
+                pool_i += 1
+                eng.add_news(direction=direction, impact=impact, now=t)
+                view.headline = headline
+                view.news = (direction, impact)
+            next_news_t += rules.news_interval_sec
+
+        eng.tick(t)
+        if crowd is not None:
+            crowd.step(eng, t)
+
+        bid, ask, spread, imp = eng.quotes(t)
+        view.t, view.t_left = t, rules.round_seconds - t
+        view.mid, view.bid, view.ask, view.spread, view.imp = eng.mid, bid, ask, spread, imp
+
+        for fn, s in zip(fns, seats):
+            qty = fn(view, s)
+            if qty:
+                qty = max(-cap, min(cap, int(qty)))
+                if qty > 0:
+                    eng.buy(qty=qty, now=t, player=s)
+                else:
+                    eng.sell(qty=-qty, now=t, player=s)
+                s.trades += 1
+                if abs(s.inv) > s.max_abs_inv:
+                    s.max_abs_inv = abs(s.inv)
+            if s.inv:
+                s.risk += lam * (abs(s.inv) ** power) * dt
+
+    # round over: flatten everyone at the close
+    t = n_ticks * dt
+    rows = []
+    for (name, _), s in zip(strategies, seats):
+        if s.inv > 0:
+            eng.sell(qty=s.inv, now=t, player=s)
+        elif s.inv < 0:
+            eng.buy(qty=-s.inv, now=t, player=s)
+        pnl = eng.pnl(s)
+        rows.append((name, seed, pnl, s.risk, pnl - s.risk, s.trades, s.max_abs_inv))
+    return rows
+
+
+def _run_chunk(rules: RoundRules, strategies, pool, seeds) -> List[tuple]:
+    rows = []
+    for seed in seeds:
+        rows.extend(play_round(rules, strategies, pool, seed))
+    return rows
+
+
+RESULT_COLUMNS = ["strategy", "seed", "pnl", "risk", "score", "trades", "max_abs_inv"]
+
+
+def run_tournament(
+    strategies: Dict[str, Strategy],
+    seeds: Sequence[int],
+    rules: Optional[RoundRules] = None,
+    pool: Optional[Sequence[tuple]] = None,
+    workers: Optional[int] = None,
+    chunk: int = 50,
+) -> pd.DataFrame:
+    """Every strategy on every seed; one row per (strategy, seed)."""
+    rules = rules or RoundRules()
+    if pool is None:
+        pool = fetch_pool(min_impact=rules.min_impact)
+    items = list(strategies.items())
+    seeds = list(seeds)
+    chunks = [seeds[i:i + chunk] for i in range(0, len(seeds), chunk)]
+
+    rows = []
+    if workers == 1:
+        for c in chunks:
+            rows.extend(_run_chunk(rules, items, pool, c))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as ex:
+            futs = [ex.submit(_run_chunk, rules, items, pool, c) for c in chunks]
+            for f in futs:
+                rows.extend(f.result())
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+def summarize(results: pd.DataFrame) -> pd.DataFrame:
+    """Per-strategy score distribution, best mean score first."""
+    g = results.groupby("strategy")["score"]
+    out = pd.DataFrame({
+        "rounds": g.size(),
+        "mean": g.mean(),
+        "std": g.std(),
+        "p05": g.quantile(0.05),
+        "p50": g.median(),
+        "p95": g.quantile(0.95),
+        "win_rate": g.apply(lambda s: float((s > 0).mean())),
+    })
+    out["sharpe"] = out["mean"] / out["std"].replace(0.0, np.nan)
+    out["avg_trades"] = results.groupby("strategy")["trades"].mean()
+    return out.sort_values("mean", ascending=False)
+
+
+# -------------------------
+# reference strategies
+# -------------------------
+HOLD_SEC = 3.0
+SIZE = 10
+
+
+def flat(view: MarketView, seat: Seat) -> int:
+    """Never trades; the zero line every strategy should beat."""
+    return 0
+
+
+def follow_news(view: MarketView, seat: Seat) -> int:
+    """Trade with the scored direction, flatten after HOLD_SEC."""
+    if view.news is not None:
+        seat.state["entry_t"] = view.t
+        return view.news[0] * SIZE - seat.inv
+    if seat.inv and view.t - seat.state.get("entry_t", 0.0) >= HOLD_SEC:
+        return -seat.inv
+    return 0
+
+
+def fade_news(view: MarketView, seat: Seat) -> int:
+    """Bet the move overshoots: take the other side once impact has decayed."""
+    if view.news is not None:
+        seat.state["dir"] = view.news[0]
+        seat.state["entry_t"] = None
+        return 0
+    d = seat.state.get("dir")
+    if d and seat.state["entry_t"] is None and view.imp < 0.2:
+        seat.state["entry_t"] = view.t
+        return -d * SIZE
+    if seat.inv and seat.state["entry_t"] is not None and view.t - seat.state["entry_t"] >= HOLD_SEC:
+        seat.state["dir"] = None
+        return -seat.inv
+    return 0
+
+
+def load_strategy(spec: str) -> Strategy:
+    """'module:function' (or a bare name from this module)."""
+    mod, _, fn = spec.rpartition(":")
+    return getattr(importlib.import_module(mod or __name__), fn)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Headless Mode A bot tournament on a simulated clock.")
+    ap.add_argument("--strategies", default="flat,follow_news,fade_news",
+                    help="comma-separated module:function list")
+    ap.add_argument("--rounds", type=int, default=1000, help="scenarios (seeds) per strategy")
+    ap.add_argument("--seed0", type=int, default=0)
+    ap.add_argument("--symbol", default=SYMBOL)
+    ap.add_argument("--workers", type=int, default=os.cpu_count())
+    ap.add_argument("--round-seconds", type=float, default=RoundRules.round_seconds)
+    ap.add_argument("--npc", type=int, default=0, help="simulated crowd size (slow)")
+    ap.add_argument("--out", default=None, help="write per-round results (.csv or .parquet)")
+    args = ap.parse_args()
+
+    rules = RoundRules(round_seconds=args.round_seconds, npc_count=args.npc)
+    strategies = {s.rpartition(":")[2]: load_strategy(s) for s in args.strategies.split(",")}
+    pool = fetch_pool(args.symbol, NEWS_POOL_SIZE, rules.min_impact)
+    if not pool:
+        print(f"No scored news for {args.symbol}; rounds will have no injections.")
+
+    t0 = time.perf_counter()
+    df = run_tournament(strategies, range(args.seed0, args.seed0 + args.rounds), rules, pool, args.workers)
+    dt = time.perf_counter() - t0
+    n = args.rounds * len(strategies)
+    print(f"{n} strategy-rounds in {dt:.1f}s ({n / dt:.0f}/s, {args.workers} workers)\n")
+
+    with pd.option_context("display.width", 160, "display.float_format", "{:.3f}".format):
+        print(summarize(df))
+
+    if args.out:
+        if args.out.endswith(".parquet"):
+            df.to_parquet(args.out, index=False)
+        else:
+            df.to_csv(args.out, index=False)
+        print(f"\nWrote {len(df)} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,409 @@
+import argparse
 import pandas as pd
+import numpy as np
 from sqlalchemy import create_engine, text
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error
+import xgboost as xgb
 from xgboost import XGBRegressor
 import joblib
+import metrics
 import os
+import hashlib
+import json
+import re
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import export_training_set as ets
+import model_registry
 
 engine = create_engine("sqlite:///data/db/news.db")
+MODEL_PATH = "data/models/impact_xgb.joblib"
+HORIZON_MIN = 1440     # train_rows horizon the model learns (--horizon); labels never mix horizons
+
+N_ESTIMATORS = 600
+PARAMS = dict(max_depth=5, learning_rate=0.05, subsample=0.9, colsample_bytree=0.9, random_state=42)
+VAL_FRAC = 0.2
 
-def main():
+def load_sql(min_id=0):
     q = """
-    SELECT tr.y,
+    SELECT tr.news_id, tr.y,
            nf.sentiment_score, nf.p_pos, nf.p_neg, nf.p_neu,
            nf.hour, nf.dow
     FROM train_rows tr
     JOIN news_features nf ON nf.news_id = tr.news_id
+    WHERE tr.news_id > :lo AND tr.horizon_min = :h
+    ORDER BY tr.news_id
     """
-    df = pd.read_sql(text(q), engine)
+    df = pd.read_sql(text(q), engine, params={"lo": int(min_id), "h": HORIZON_MIN})
 
     # basic cleanup
     df = df.dropna()
+    ids = df["news_id"].values
     y = df["y"].values
-    X = df.drop(columns=["y"]).values
+    X = df.drop(columns=["news_id", "y"]).values
+    return X, y, ids
+
+def load_rows(source, root, min_id=0):
+    """(X, y, news_id) ordered by news_id, for news_id > min_id."""
+    if source == "parquet":
+        check_export(root)
+        X, y, ids = ets.load_matrix(root)
+        keep = ids > min_id
+        return X[keep], y[keep], ids[keep]
+    return load_sql(min_id)
+
+def check_export(root):
+    h = ets.export_horizon(root)
+    if h is not None and h != HORIZON_MIN:
+        raise SystemExit(f"{root} holds {h}-minute labels, not {HORIZON_MIN}; export with --horizon {HORIZON_MIN} "
+                         f"to another --root, or train with --horizon {h}.")
+
+class ParquetIter(xgb.DataIter):
+    """Feeds the Parquet export to XGBoost block by block (external memory)."""
+
+    def __init__(self, root, id_range, cache_dir):
+        self.root = root
+        self.id_range = id_range
+        self._it = None
+        super().__init__(cache_prefix=os.path.join(cache_dir, "cache"))
+
+    def next(self, input_data):
+        if self._it is None:
+            self._it = ets.iter_batches(self.root, ets.FEATURES, self.id_range)
+        for X, y in self._it:
+            if len(y):
+                input_data(data=X, label=y)
+                return True
+        return False
+
+    def reset(self):
+        self._it = None
+
+def fit_in_memory(X, y, ids):
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=VAL_FRAC, shuffle=False)
+
+    model = XGBRegressor(n_estimators=N_ESTIMATORS, **PARAMS)
+    with metrics.timer("train.fit"):
+        model.fit(X_train, y_train)
+    mae = mean_absolute_error(y_val, model.predict(X_val))
+    return model, {"val_mae": mae, "rows": len(y_train), "val_rows": len(y_val),
+                   "max_news_id": int(ids[len(y_train) - 1])}
+
+def fit_external(root):
+    """
+    Train from the Parquet export without holding it in memory: the oldest
+    (1 - VAL_FRAC) of news_ids stream through a DataIter into XGBoost's
+    external-memory matrix; the newest slice is the validation set.
+    """
+    check_export(root)
+    ids = np.sort(ets.exported_ids(root))
+    if not len(ids):
+        raise SystemExit(f"No training set under {root}; run export_training_set.py first.")
+    cut = int(ids[int(len(ids) * (1 - VAL_FRAC))])
+
+    val = list(ets.iter_batches(root, ets.FEATURES, (cut, 1 << 62)))
+    X_val = np.vstack([b[0] for b in val])
+    y_val = np.concatenate([b[1] for b in val])
+
+    params = {"objective": "reg:squarederror", "tree_method": "hist", "max_depth": PARAMS["max_depth"],
+              "eta": PARAMS["learning_rate"], "subsample": PARAMS["subsample"],
+              "colsample_bytree": PARAMS["colsample_bytree"], "seed": PARAMS["random_state"]}
+    with tempfile.TemporaryDirectory() as cache_dir:
+        dtrain = xgb.ExtMemQuantileDMatrix(ParquetIter(root, (0, cut), cache_dir))
+        n_train = dtrain.num_row()
+        with metrics.timer("train.fit"):
+            booster = xgb.train(params, dtrain, num_boost_round=N_ESTIMATORS)
+        del dtrain   # release the cache pages before the directory goes
+
+    # same artifact type as the in-memory path, so score_news loads it unchanged
+    model = XGBRegressor()
+    model.load_model(bytearray(booster.save_raw("json")))
+    mae = mean_absolute_error(y_val, model.predict(X_val))
+    return model, {"val_mae": mae, "rows": n_train, "val_rows": len(y_val),
+                   "max_news_id": int(ids[ids < cut].max())}
+
+# ---- warm start ----
+# An incremental run adds WARM_ROUNDS trees to the current model, fitted on
+# the newest WINDOW_ROWS trained-eligible rows with weights halving every
+# HALF_LIFE_ROWS rows of age. The newest VAL_FRAC of the rows the current
+# model has never seen are held out to check it; the next run trains on them.
+WARM_ROUNDS = 60
+WINDOW_ROWS = 20_000
+HALF_LIFE_ROWS = 5_000
+MIN_NEW_ROWS = 50
+DRIFT_TOL = 0.25       # current model's MAE on new rows vs its own val MAE
+ACCEPT_TOL = 0.02      # warm-started model may be this much worse than the base on the slice
+MAX_TREES = 1_500      # past this a warm start is folded into a full refit
 
-    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, shuffle=False)
+def meta_path(model_path):
+    return os.path.splitext(model_path)[0] + ".json"
+
+def model_digest(model_path):
+    with open(model_path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def load_meta(model_path):
+    """Metadata of model_path, or None when missing or written for another model file."""
+    p = meta_path(model_path)
+    if not os.path.exists(p):
+        return None
+    with open(p) as f:
+        meta = json.load(f)
+    if "sha1" in meta and (not os.path.exists(model_path) or model_digest(model_path) != meta["sha1"]):
+        return None
+    return meta
+
+def save_model(model, meta):
+    """
+    Write data/models/versions/<name>.vNNNN.joblib (+ .json metadata) and
+    point MODEL_PATH at it; earlier versions stay for rollback. The version
+    number comes from the versions directory, so a stale live .json can not
+    make it reuse one.
+    """
+    stem = os.path.splitext(os.path.basename(MODEL_PATH))[0]
+    vdir = os.path.join(os.path.dirname(MODEL_PATH) or ".", "versions")
+    os.makedirs(vdir, exist_ok=True)
+    prev = load_meta(MODEL_PATH)
+    done = [int(m.group(1)) for m in (re.fullmatch(re.escape(stem) + r"\.v(\d+)\.joblib", n) for n in os.listdir(vdir)) if m]
+    meta["version"] = max(done, default=0) + 1
+    meta["parent"] = prev["version"] if prev else None
+    meta["created_at"] = int(time.time())
+    meta["n_trees"] = model.get_booster().num_boosted_rounds()
+    meta["params"] = dict(PARAMS)
 
-    model = XGBRegressor(
-        n_estimators=600,
-        max_depth=5,
-        learning_rate=0.05,
-        subsample=0.9,
-        colsample_bytree=0.9,
-        random_state=42
-    )
-    model.fit(X_train, y_train)
+    vpath = os.path.join(vdir, f"{stem}.v{meta['version']:04d}.joblib")
+    meta["path"] = vpath
+    joblib.dump(model, vpath)
+    meta["sha1"] = model_digest(vpath)
+    with open(meta_path(vpath), "w") as f:
+        json.dump(meta, f, indent=2)
 
-    pred = model.predict(X_val)
-    mae = mean_absolute_error(y_val, pred)
-    print("VAL MAE:", mae)
+    # two swaps, model first: in between (or after a crash there) the live
+    # .json still carries the old sha1, so load_meta ignores it and
+    # --incremental falls back to a full refit rather than trusting it
+    for src, dst in ((vpath, MODEL_PATH), (meta_path(vpath), meta_path(MODEL_PATH))):
+        shutil.copyfile(src, dst + ".tmp")
+        os.replace(dst + ".tmp", dst)
+    return meta
+
+def warm_start(source, root, base, meta):
+    """
+    (model, info) for a warm-started model, (None, reason) when a full
+    refit is needed instead, or (base, None) when there is too little new
+    data to bother.
+    """
+    if meta is None or "max_news_id" not in meta:
+        return None, "no metadata for the current model"
+    if meta.get("horizon_min", 1440) != HORIZON_MIN:
+        return None, f"current model was trained on {meta.get('horizon_min', 1440)}-minute labels"
+    if meta["n_trees"] + WARM_ROUNDS > MAX_TREES:
+        return None, f"model would exceed {MAX_TREES} trees"
+
+    # rows the model has not seen, plus enough older rows for the window
+    seen = int(meta["max_news_id"])
+    if source == "parquet":
+        # the export is read whole anyway: cut the window from its own ids, no DB needed
+        X, y, ids = load_rows(source, root)
+        old = np.flatnonzero(ids <= seen)
+        lo = int(ids[old[-WINDOW_ROWS - 1]]) if len(old) > WINDOW_ROWS else 0
+        keep = ids > lo
+        X, y, ids = X[keep], y[keep], ids[keep]
+    else:
+        with engine.begin() as conn:
+            lo = conn.execute(text("""
+                SELECT news_id FROM train_rows WHERE news_id <= :seen AND horizon_min = :h
+                ORDER BY news_id DESC LIMIT 1 OFFSET :w
+            """), {"seen": seen, "w": WINDOW_ROWS, "h": HORIZON_MIN}).scalar() or 0
+        X, y, ids = load_rows(source, root, lo)
+    new = ids > seen
+    n_new = int(new.sum())
+    if n_new < MIN_NEW_ROWS:
+        print(f"Only {n_new} new rows; keeping the current model.")
+        return base, None
+
+    # rolling validation slice: the newest rows nobody has trained on
+    n_val = max(1, int(n_new * VAL_FRAC))
+    X_fit, y_fit = X[:-n_val][-WINDOW_ROWS:], y[:-n_val][-WINDOW_ROWS:]
+    X_val, y_val = X[-n_val:], y[-n_val:]
+
+    old_mae = mean_absolute_error(y_val, base.predict(X_val))
+    drift = old_mae / meta["val_mae"] - 1.0 if meta.get("val_mae") else 0.0
+    if drift > DRIFT_TOL:
+        return None, f"drift {drift:+.1%} on new rows"
+
+    age = np.arange(len(y_fit))[::-1]
+    w = 0.5 ** (age / HALF_LIFE_ROWS)
+    model = XGBRegressor(n_estimators=WARM_ROUNDS, **PARAMS)
+    with metrics.timer("train.warm_fit"):
+        model.fit(X_fit, y_fit, sample_weight=w, xgb_model=base.get_booster())
+    mae = mean_absolute_error(y_val, model.predict(X_val))
+    if mae > old_mae * (1.0 + ACCEPT_TOL):
+        return None, f"warm start did not help (MAE {mae:.5f} vs {old_mae:.5f})"
+    return model, {"val_mae": mae, "base_val_mae": old_mae, "drift": drift,
+                   "rows": len(y_fit), "new_rows": n_new - n_val, "val_rows": n_val,
+                   "max_news_id": int(ids[len(ids) - n_val - 1])}
+
+# ---- model family ----
+# --family fits, across a process pool, one model per symbol and per sector
+# with at least FAMILY_MIN_ROWS rows, plus the global model. All of them use
+# the global news_id cut between train and validation, and a symbol or
+# sector model is kept only if it beats its fallback (the sector model, else
+# the global one) on its own validation rows. See model_registry.py.
+FAMILY_MIN_ROWS = 300
+FAMILY_MIN_VAL = 30
+
+def group_keys(ids):
+    """(symbol_id, sector_id) arrays for news_ids; -1 where unknown."""
+    with engine.begin() as conn:
+        sym = dict(conn.execute(text("SELECT news_id, symbol_id FROM train_rows WHERE horizon_min = :h"),
+                                {"h": HORIZON_MIN}).fetchall())
+        sec = dict(conn.execute(text("SELECT id, sector_id FROM symbols")).fetchall())
+    s = np.array([sym.get(int(i)) or -1 for i in ids], dtype=np.int64)
+    return s, np.array([sec.get(int(x)) or -1 for x in s], dtype=np.int64)
+
+def fit_group(key, X, y, ids, cut, n_jobs):
+    """One family member on rows with news_id <= cut (runs in a pool worker)."""
+    t0 = time.perf_counter()
+    train = ids <= cut
+    model = XGBRegressor(n_estimators=N_ESTIMATORS, n_jobs=n_jobs, **PARAMS)
+    model.fit(X[train], y[train])
+    return key, model, {"rows": int(train.sum()), "fit_sec": round(time.perf_counter() - t0, 3)}
+
+def train_family(source="sql", root=ets.ROOT, workers=None, min_rows=FAMILY_MIN_ROWS):
+    t0 = time.perf_counter()
+    X, y, ids = load_rows(source, root)
+    sym, sec = group_keys(ids)
+    n_train = len(ids) - int(np.ceil(len(ids) * VAL_FRAC))   # same split as fit_in_memory
+    cut = int(ids[n_train - 1])
+    val = ids > cut
+
+    jobs = [(model_registry.GLOBAL, np.ones(len(ids), dtype=bool))]
+    for prefix, col in (("sector", sec), ("symbol", sym)):
+        keys, counts = np.unique(col[col >= 0], return_counts=True)
+        jobs += [(f"{prefix}_{k}", col == k) for k, c in zip(keys, counts) if c >= min_rows]
+
+    workers = workers or os.cpu_count() or 1
+    n_jobs = max(1, (os.cpu_count() or 1) // workers)   # threads per model, so the pool does not oversubscribe
+    print(f"Training {len(jobs)} models ({len(jobs) - 1} symbol/sector + global) on {workers} workers...")
+    models, infos = {}, {}
+    with metrics.timer("train.family"), ProcessPoolExecutor(workers) as pool:
+        # biggest first, so the long global fit does not start last
+        futs = [pool.submit(fit_group, key, X[m], y[m], ids[m], cut, n_jobs)
+                for key, m in sorted(jobs, key=lambda j: -int(j[1].sum()))]
+        for f in futs:
+            key, model, info = f.result()
+            models[key], infos[key] = model, info
+    masks = dict(jobs)
+
+    def val_mae(model, mask):
+        rows = mask & val
+        return float(mean_absolute_error(y[rows], model.predict(X[rows]))) if rows.any() else None
+
+    glob = models[model_registry.GLOBAL]
+    info = dict(infos[model_registry.GLOBAL], val_mae=val_mae(glob, masks[model_registry.GLOBAL]),
+                val_rows=int(val.sum()), max_news_id=cut, mode="family", source=source, horizon_min=HORIZON_MIN)
+    kept, rejected = {}, {}
+    # sectors first: a symbol's fallback is its sector's model when that was kept
+    for key in sorted((k for k in models if k != model_registry.GLOBAL), key=lambda k: not k.startswith("sector")):
+        mask = masks[key]
+        if key.startswith("symbol"):
+            s = int(key.split("_")[1])
+            parent = f"sector_{sec[sym == s][0]}"
+            fallback = models[parent] if parent in kept else glob
+        else:
+            fallback = glob
+        mae, fb_mae = val_mae(models[key], mask), val_mae(fallback, mask)
+        entry = dict(infos[key], val_rows=int((mask & val).sum()), val_mae=mae, fallback_mae=fb_mae)
+        if mae is not None and entry["val_rows"] >= FAMILY_MIN_VAL and mae < fb_mae:
+            kept[key] = entry
+        else:
+            rejected[key] = entry
+
+    # the global model goes through the usual versioned save; the rest into the family dir
+    info["fit_sec"] = round(time.perf_counter() - t0, 3)
+    meta = save_model(glob, info)
+    fdir = model_registry.FAMILY_DIR
+    os.makedirs(fdir, exist_ok=True)
+    for key, entry in kept.items():
+        entry["path"] = os.path.join(fdir, f"{key}.joblib")
+        joblib.dump(models[key], entry["path"] + ".tmp")
+        os.replace(entry["path"] + ".tmp", entry["path"])
+
+    routes = {}
+    for s in np.unique(sym[sym >= 0]):
+        s_sec = sec[sym == s][0]
+        key = f"symbol_{s}" if f"symbol_{s}" in kept else f"sector_{s_sec}"
+        if key in kept:
+            routes[str(s)] = key
+    model_registry.save_manifest({
+        "created_at": int(time.time()), "global_version": meta["version"], "cut_news_id": cut,
+        "models": kept, "routes": routes, "rejected": rejected,
+    })
+    # models dropped from the family since the last run
+    for name in os.listdir(fdir):
+        if name.endswith(".joblib") and name[:-len(".joblib")] not in kept:
+            os.remove(os.path.join(fdir, name))
+
+    print("VAL MAE (global):", info["val_mae"])
+    print(f"Saved: {MODEL_PATH} (v{meta['version']}) + {len(kept)} family models in {fdir} "
+          f"({len(rejected)} rejected, {len(routes)} symbols routed, {info['fit_sec']:.1f}s)")
+
+def main(source="sql", root=ets.ROOT, external=False, incremental=False):
+    """
+    source: "sql" reads the DB join; "parquet" reads the export_training_set.py output.
+    incremental: warm-start the current model, falling back to a full refit.
+    """
+    t0 = time.perf_counter()
+    model = None
+    if incremental and os.path.exists(MODEL_PATH):
+        model, info = warm_start(source, root, joblib.load(MODEL_PATH), load_meta(MODEL_PATH))
+        if info is None:
+            return
+        if model is None:
+            print(f"Full refit: {info}")
+        else:
+            info["mode"] = "warm"
+    if model is None:
+        if source == "parquet" and external:
+            model, info = fit_external(root)
+        else:
+            model, info = fit_in_memory(*load_rows(source, root))
+        info["mode"] = "full"
+    info["source"] = source
+    info["horizon_min"] = HORIZON_MIN
+    info["fit_sec"] = round(time.perf_counter() - t0, 3)
+    print("VAL MAE:", info["val_mae"])
 
-    os.makedirs("data/models", exist_ok=True)
-    joblib.dump(model, "data/models/impact_xgb.joblib")
-    print("Saved: data/models/impact_xgb.joblib")
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+    meta = save_model(model, info)
+    print(f"Saved: {MODEL_PATH} (v{meta['version']}, {meta['mode']}, {meta['n_trees']} trees, {meta['fit_sec']:.1f}s)")
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="Train the impact regressor.")
+    ap.add_argument("--from-parquet", nargs="?", const=ets.ROOT, default=None, metavar="ROOT",
+                    help="train from the Parquet export instead of the DB (default root data/train_set)")
+    ap.add_argument("--external-memory", action="store_true",
+                    help="with --from-parquet, stream blocks into XGBoost instead of loading them all")
+    ap.add_argument("--horizon", type=int, default=HORIZON_MIN,
+                    help="label horizon in minutes to train on (train_rows.horizon_min; default 1440)")
+    ap.add_argument("--incremental", action="store_true",
+                    help="add trees to the current model on new rows; full refit on drift")
+    ap.add_argument("--family", action="store_true",
+                    help="also fit per-symbol and per-sector models in a process pool (see model_registry.py)")
+    ap.add_argument("--workers", type=int, default=None, help="with --family, pool size (default: all cores)")
+    ap.add_argument("--min-rows", type=int, default=FAMILY_MIN_ROWS,
+                    help="with --family, rows a symbol or sector needs for its own model")
+    args = ap.parse_args()
+    HORIZON_MIN = args.horizon
+    if args.family:
+        if args.external_memory or args.incremental:
+            ap.error("--family does not combine with --external-memory or --incremental")
+        train_family("parquet" if args.from_parquet else "sql", args.from_parquet or ets.ROOT,
+                     args.workers, args.min_rows)
+    else:
+        main("parquet" if args.from_parquet else "sql", args.from_parquet or ets.ROOT,
+             args.external_memory, args.incremental)
@@ -1,8 +1,14 @@
+import sys
 import time
+import numpy as np
 import pygame
 from sqlalchemy import create_engine, text
-from mode_a_engine import ModeAEngine
-from dataclasses import dataclass
+from candle_buffer import CandleRing, MultiResCandles
+from hud import Hud, MetricsOverlay, text_cache
+import metrics
+import news_search
+from sim_process import STALE_SEC, SimConfig, SimProcess, spectate
+from news_prefetch import StratifiedSampler
 from sqlalchemy import bindparam
 
 DB = "sqlite:///data/db/news.db"
@@ -21,15 +27,22 @@ NEWS_POOL_SIZE = 300
 INV_PENALTY_LAMBDA = 0.02
 INV_PENALTY_POWER = 1.3
 
+NPC_COUNT = 2000  # simulated traders sharing the market (0 = off)
+RECORD_DIR = "data/rounds"  # binary round logs for replay/analysis (None = off)
+
 # CANDLE SETTINGS (derived from eng.mid ticks)
-CANDLE_INTERVAL = 0.5  # seconds per candle (try 0.5 or 0.2 for faster candles)
-CANDLE_WINDOW = 500    # how many candles to display
-CANDLE_MAX_KEEP = 300   # internal buffer
+CANDLE_INTERVALS = (0.2, 1.0, 5.0)  # resolutions built side by side from the same ticks
+CANDLE_INTERVAL = 1.0  # resolution shown at start ("r" cycles through CANDLE_INTERVALS)
+CANDLE_WINDOW = 350    # how many candles to display (3 px each across CHART_RECT)
+CANDLE_MAX_KEEP = 300   # ring buffer capacity (raised to CANDLE_WINDOW if smaller)
 ALLOWED_SOURCES = ("CNBC", "DowJones", "SeekingAlpha")  # start tight
+IMPACT_MIX = None  # e.g. {0.3: 0.5, 0.5: 0.35, 0.7: 0.15}: share of each impact band per pool (None = pool as fetched)
+POOL_SAMPLE_SIZE = 60  # headlines drawn from each NEWS_POOL_SIZE fetch when IMPACT_MIX is set
+THEME = None  # e.g. "earnings", "regulation" or any FTS5 query (see news_search.THEMES); --theme overrides
 
-def inv_penalty(inv: int) -> float:
-    return INV_PENALTY_LAMBDA * (abs(inv) ** INV_PENALTY_POWER)
-
+BG = (18, 18, 22)
+CHART_RECT = (20, 70, 1060, 250)
+METRICS_RECT = (720, 330, 360, 118)  # "m" toggles the timing overlay here
 
 def get_symbol_id(symbol: str) -> int:
     with db.begin() as conn:
@@ -40,6 +53,7 @@ def get_symbol_id(symbol: str) -> int:
 
 
 
+@metrics.timed("db.fetch_scored_pool")
 def fetch_scored_pool(symbol_id: int, limit: int):
     with db.begin() as conn:
 
@@ -61,253 +75,237 @@ def fetch_scored_pool(symbol_id: int, limit: int):
     return pool
 
 
-def flatten(eng: ModeAEngine, now: float):
-    if eng.player.inv > 0:
-        eng.sell(qty=eng.player.inv, now=now)
-    elif eng.player.inv < 0:
-        eng.buy(qty=-eng.player.inv, now=now)
-
-
-def wrap_text(text_s: str, font, max_width: int):
-    """Simple word-wrap for pygame text surfaces."""
-    words = text_s.split(" ")
-    lines = []
-    cur = ""
-    for w in words:
-        test = (cur + " " + w).strip()
-        if font.size(test)[0] <= max_width:
-            cur = test
-        else:
-            if cur:
-                lines.append(cur)
-            cur = w
-    if cur:
-        lines.append(cur)
-    return lines
+@metrics.timed("db.fetch_themed_pool")
+def fetch_themed_pool(theme: str, symbol_id: int, limit: int):
+    """Same shape as fetch_scored_pool, from the best full-text matches for theme."""
+    return news_search.themed_pool(theme, symbol_id, limit, sources=ALLOWED_SOURCES, min_impact=MIN_IMPACT)
 
 
 # =========================
 # Candlesticks (from ticks)
 # =========================
-@dataclass
-class Candle:
-    t0: float
-    o: float
-    h: float
-    l: float
-    c: float
-
-
-def update_candles(candles, now, price, interval_sec=1.0, max_candles=300):
-    if not candles:
-        t0 = now - (now % interval_sec)
-        candles.append(Candle(t0=t0, o=price, h=price, l=price, c=price))
-        return
+_label_font = None
 
-    cur = candles[-1]
-    if now < cur.t0 + interval_sec:
-        cur.h = max(cur.h, price)
-        cur.l = min(cur.l, price)
-        cur.c = price
-    else:
-        t0 = now - (now % interval_sec)
-        candles.append(Candle(t0=t0, o=price, h=price, l=price, c=price))
-        if len(candles) > max_candles:
-            del candles[: len(candles) - max_candles]
 
+def _get_label_font():
+    # SysFont is slow (it scans system fonts); build it once, not every frame
+    global _label_font
+    if _label_font is None:
+        _label_font = pygame.font.SysFont("consolas", 16)
+    return _label_font
 
-def draw_candles(screen, candles, rect, window=60):
+
+def update_candles(candles, now, price):
+    """candles is a CandleRing or MultiResCandles; O(1) per tick."""
+    candles.update(now, price)
+
+
+def draw_candles(screen, candles: CandleRing, rect, window=60):
     if len(candles) < 2:
         return
 
-    view = candles[-window:] if len(candles) > window else candles
-    hi = max(c.h for c in view)
-    lo = min(c.l for c in view)
+    # never more candles than fit at 3 px each: the newest ones would land past the rect
+    window = min(window, rect.width // 3)
+    o, h, l, c = candles.view(window)
+    if window == candles.window:
+        hi, lo = candles.hi_lo()
+    else:
+        # ad-hoc window size: fall back to a scan of the view
+        hi, lo = float(h.max()), float(l.min())
     if hi == lo:
         hi += 1e-6
 
-    def y_of(p):
-        return rect.y + (hi - p) * rect.height / (hi - lo)
-
-    n = len(view)
+    # map prices to pixels in one vectorized pass
+    scale = rect.height / (hi - lo)
+    y_h = (rect.y + (hi - h) * scale).tolist()
+    y_l = (rect.y + (hi - l) * scale).tolist()
+    y_o = rect.y + (hi - o) * scale
+    y_c = rect.y + (hi - c) * scale
+    tops = np.minimum(y_o, y_c).astype(int).tolist()
+    body_hs = np.maximum(1, np.abs(y_o - y_c).astype(int)).tolist()
+    ups = (c >= o).tolist()
+
+    n = len(o)
     w = max(3, rect.width // max(1, n))
     gap = 1
     body_w = max(2, w - gap)
 
     pygame.draw.rect(screen, (60, 60, 70), rect, 1)
 
-    for i, c in enumerate(view):
+    for i in range(n):
         x = rect.x + i * w + (w - body_w) // 2
 
-        y_h = y_of(c.h)
-        y_l = y_of(c.l)
-        y_o = y_of(c.o)
-        y_c = y_of(c.c)
-
         # wick
         pygame.draw.line(
             screen, (180, 180, 190),
-            (x + body_w // 2, y_h),
-            (x + body_w // 2, y_l),
+            (x + body_w // 2, y_h[i]),
+            (x + body_w // 2, y_l[i]),
             1
         )
 
         # body
-        top = min(y_o, y_c)
-        bot = max(y_o, y_c)
-        body_h = max(1, int(bot - top))
-
-        up = c.c >= c.o
-        color = (90, 220, 140) if up else (240, 90, 90)
-        pygame.draw.rect(screen, color, pygame.Rect(x, int(top), body_w, body_h))
+        color = (90, 220, 140) if ups[i] else (240, 90, 90)
+        pygame.draw.rect(screen, color, pygame.Rect(x, tops[i], body_w, body_hs[i]))
 
     # price labels
-    font = pygame.font.SysFont("consolas", 16)
-    screen.blit(font.render(f"{hi:.2f}", True, (200, 200, 210)), (rect.x + 6, rect.y + 4))
-    screen.blit(font.render(f"{lo:.2f}", True, (200, 200, 210)), (rect.x + 6, rect.y + rect.height - 22))
-
+    font = _get_label_font()
+    screen.blit(text_cache.render(f"{hi:.2f}", font, (200, 200, 210)), (rect.x + 6, rect.y + 4))
+    screen.blit(text_cache.render(f"{lo:.2f}", font, (200, 200, 210)), (rect.x + 6, rect.y + rect.height - 22))
+
+
+def main(spectate_name: str = None, theme: str = THEME):
+    """
+    Renderer only: the market runs in a SimProcess at a fixed DT and we read
+    its snapshots from shared memory. With spectate_name we attach read-only
+    to someone else's round instead of starting one.
+    """
+    sim = None
+    if spectate_name:
+        reader = spectate(spectate_name)
+    else:
+        sid = get_symbol_id(SYMBOL)
+        sim = SimProcess(SimConfig(
+            round_seconds=ROUND_SECONDS,
+            dt=DT,
+            mid0=200.0,
+            news_interval_sec=NEWS_INTERVAL_SEC,
+            inv_penalty_lambda=INV_PENALTY_LAMBDA,
+            inv_penalty_power=INV_PENALTY_POWER,
+            pool_fn=fetch_themed_pool if theme else fetch_scored_pool,
+            pool_args=(theme, sid, NEWS_POOL_SIZE) if theme else (sid, NEWS_POOL_SIZE),
+            pool_sampler=StratifiedSampler(IMPACT_MIX, POOL_SAMPLE_SIZE) if IMPACT_MIX else None,
+            no_news_text=f"No scored {theme + ' ' if theme else ''}news available for {SYMBOL}.",
+            npc_count=NPC_COUNT,
+            symbol_id=sid,
+            record_path=f"{RECORD_DIR}/{SYMBOL}_{int(time.time())}.nitr" if RECORD_DIR else None,
+        ))
+        reader = sim.start()
+        print(f"Round running. Spectate with: python scripts/ui_py_game_mode.py --spectate {sim.name}")
 
-def main():
     pygame.init()
     W, H = 1100, 600
     screen = pygame.display.set_mode((W, H))
-    pygame.display.set_caption("Mode A - News Trader (Headline Only)")
+    caption = "Mode A - News Trader (Headline Only)"
+    pygame.display.set_caption(caption + (" [spectator]" if spectate_name else ""))
     clock = pygame.time.Clock()
 
     font_big = pygame.font.SysFont("consolas", 28)
     font = pygame.font.SysFont("consolas", 22)
     font_small = pygame.font.SysFont("consolas", 18)
 
-    sid = get_symbol_id(SYMBOL)
-    eng = ModeAEngine(mid0=200.0, dt=DT)
-
-    # candles
-    candles = []
-
-    # round state
-    round_start = time.time()
-    round_end = round_start + ROUND_SECONDS
-    risk_cost = 0.0
-    prev_now = round_start
-
-    # news forcing
-    news_pool = fetch_scored_pool(sid, NEWS_POOL_SIZE)
-    pool_i = 0
-    next_news_ts = round_start + NEWS_INTERVAL_SEC
-    last_headline = "Waiting for first headline..."
-
-    running = True
-    while running:
-        now = time.time()
-
-        # end round?
-        if now >= round_end:
-            running = False
-
-        # accumulate risk cost over time
-        dt_real = now - prev_now
-        prev_now = now
-        risk_cost += inv_penalty(eng.player.inv) * dt_real
-
-        # handle inputs/events
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                return
-            if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_q:
+    # retained-mode HUD: labels repaint only when their text changes
+    hud = Hud(bg=BG)
+    hud.label("title", (20, 18), font_big, (235, 235, 245))
+    y0 = 335
+    x1 = 360
+    for i, name in enumerate(("mid", "bid", "ask")):
+        hud.label(name, (20, y0 + 32 * i), font, (220, 220, 220))
+    for i, name in enumerate(("inv", "cash", "pnl", "score")):
+        hud.label(name, (x1, y0 + 32 * i), font, (220, 220, 220))
+    hx, hy = 20, 430
+    hud.label("headline_caption", (hx, hy), font_big, (235, 235, 245), "HEADLINE")
+    hud.text_block("headline", (hx, hy + 40), font, (245, 245, 245), max_width=W - 40, max_lines=3, line_h=26)
+    controls = "Controls: b=buy1  s=sell1  f=flatten  ↑=buy10  ↓=sell10  r=candle res  m=metrics  q=quit"
+    if spectate_name:
+        controls = "Spectating: r=candle res  m=metrics  q=quit"
+    hud.label("controls", (20, H - 34), font_small, (190, 190, 200), controls)
+    chart_rect = pygame.Rect(*CHART_RECT)
+    overlay = MetricsOverlay(METRICS_RECT, font_small, metrics.REG, ("ui.frame", "ui.frame_dt", "sim.tick", "sim.lag"), BG)
+
+    screen.fill(BG)
+    pygame.display.flip()
+
+    # candles (one ring per resolution, all fed from the same mid ticks)
+    candles = MultiResCandles(CANDLE_INTERVALS, capacity=CANDLE_MAX_KEEP, window=CANDLE_WINDOW)
+    shown_interval = CANDLE_INTERVAL
+
+    # orders go to the simulation; spectators never send any
+    keymap = {pygame.K_b: 1, pygame.K_s: -1, pygame.K_UP: 10, pygame.K_DOWN: -10}
+
+    last = None
+    prev_frame = None
+    try:
+        while True:
+            frame_start = time.perf_counter()
+            if prev_frame is not None and metrics.REG.enabled:
+                metrics.hist("ui.frame_dt").observe(frame_start - prev_frame)
+            prev_frame = frame_start
+
+            # handle inputs/events
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
                     return
-                if event.key == pygame.K_b:      # buy 1
-                    eng.buy(qty=1, now=now)
-                if event.key == pygame.K_s:      # sell 1
-                    eng.sell(qty=1, now=now)
-                if event.key == pygame.K_f:      # flatten
-                    flatten(eng, now)
-                if event.key == pygame.K_UP:     # buy 10
-                    eng.buy(qty=10, now=now)
-                if event.key == pygame.K_DOWN:   # sell 10
-                    eng.sell(qty=10, now=now)
-
-        # force headline every 15s (apply shock, but DO NOT show direction/impact in UI)
-        if now >= next_news_ts:
-            if not news_pool or pool_i >= len(news_pool):
-                news_pool = fetch_scored_pool(sid, NEWS_POOL_SIZE)
-                pool_i = 0
-
-            if news_pool:
-                nid, headline, direction, impact = news_pool[pool_i]
-                pool_i += 1
-                eng.add_news(direction=direction, impact=impact, now=now)
-                last_headline = headline
-            else:
-                last_headline = f"No scored news available for {SYMBOL}."
-
-            next_news_ts += NEWS_INTERVAL_SEC
-
-        # tick market
-        eng.tick(now)
-
-        # update candles from mid
-        update_candles(
-            candles=candles,
-            now=now,
-            price=eng.mid,
-            interval_sec=CANDLE_INTERVAL,
-            max_candles=CANDLE_MAX_KEEP,
-        )
-
-        # compute display stats
-        bid, ask, spr, imp = eng.quotes(now)
-        pnl = eng.pnl()
-        score = pnl - risk_cost
-        t_left = max(0.0, round_end - now)
-
-        # draw
-        screen.fill((18, 18, 22))
-
-        # header
-        title = font_big.render(f"MODE A  |  {SYMBOL}  |  time left: {t_left:0.1f}s", True, (235, 235, 245))
-        screen.blit(title, (20, 18))
-
-        # candlestick chart area
-        chart_rect = pygame.Rect(20, 70, 1060, 250)
-        draw_candles(screen, candles, chart_rect, window=CANDLE_WINDOW)
-
-        # price panel
-        y0 = 335
-        screen.blit(font.render(f"mid: {eng.mid:0.4f}", True, (220, 220, 220)), (20, y0))
-        screen.blit(font.render(f"bid: {bid:0.4f}", True, (220, 220, 220)), (20, y0 + 32))
-        screen.blit(font.render(f"ask: {ask:0.4f}", True, (220, 220, 220)), (20, y0 + 64))
-
-        # position panel
-        x1 = 360
-        screen.blit(font.render(f"inv: {eng.player.inv}", True, (220, 220, 220)), (x1, y0))
-        screen.blit(font.render(f"cash: {eng.player.cash:0.2f}", True, (220, 220, 220)), (x1, y0 + 32))
-        screen.blit(font.render(f"pnl:  {pnl:0.2f}", True, (220, 220, 220)), (x1, y0 + 64))
-        screen.blit(font.render(f"score:{score:0.2f}", True, (220, 220, 220)), (x1, y0 + 96))
-
-        # headline panel (ONLY headline)
-        hx, hy = 20, 430
-        screen.blit(font_big.render("HEADLINE", True, (235, 235, 245)), (hx, hy))
-        max_w = W - 40
-        lines = wrap_text(last_headline, font, max_w)
-        for i, line in enumerate(lines[:3]):  # limit lines to fit screen
-            surf = font.render(line, True, (245, 245, 245))
-            screen.blit(surf, (hx, hy + 40 + i * 26))
-
-        # controls
-        cy = H - 34
-        screen.blit(
-            font_small.render("Controls: b=buy1  s=sell1  f=flatten  ↑=buy10  ↓=sell10  q=quit", True, (190, 190, 200)),
-            (20, cy)
-        )
-
-        pygame.display.flip()
-        clock.tick(60)
-
-    # round over
-    now = time.time()
-    flatten(eng, now)
-    final_pnl = eng.pnl()
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_q:
+                        return
+                    if event.key == pygame.K_r:      # cycle candle resolution
+                        ivs = candles.intervals()
+                        shown_interval = ivs[(ivs.index(shown_interval) + 1) % len(ivs)]
+                    if event.key == pygame.K_m:      # timing overlay (turns collection on)
+                        metrics.enable()
+                        overlay.toggle()
+                    if sim is None:
+                        continue
+                    if event.key in keymap:          # buy/sell 1 or 10
+                        reader.send_order(keymap[event.key])
+                    if event.key == pygame.K_f:      # flatten
+                        reader.send_flatten()
+
+            # every tick the simulation published since the last frame
+            snaps = reader.poll()
+            if sim is not None and not len(snaps) and not sim.proc.is_alive():
+                # died before publishing its final snapshot (e.g. pool_fn raised): fail, don't freeze
+                raise RuntimeError(f"simulation process exited with code {sim.proc.exitcode}; see its traceback above")
+            if sim is None and not len(snaps) and reader.stalled():
+                # a spectator can't see the process; the snapshot heartbeat stopped instead
+                raise RuntimeError(f"round {spectate_name} published nothing for {STALE_SEC:g}s; its simulation has stopped")
+            for t, mid in zip(snaps["t"].tolist(), snaps["mid"].tolist()):
+                update_candles(candles, t, mid)
+            if len(snaps):
+                last = snaps[-1]
+                if metrics.REG.enabled:
+                    metrics.hist("sim.tick").observe_many((snaps["tick_us"] * 1e-6).tolist())
+                    metrics.hist("sim.lag").observe_many((snaps["lag_us"] * 1e-6).tolist())
+            if last is None:
+                clock.tick(60)
+                continue
+
+            score = float(last["pnl"]) - float(last["risk"])
+            t_left = max(0.0, ROUND_SECONDS - float(last["t"]))
+
+            # draw: the chart changes every frame; HUD labels only when their text does
+            screen.fill(BG, chart_rect)
+            with metrics.timer("ui.draw_candles"):
+                draw_candles(screen, candles[shown_interval], chart_rect, window=CANDLE_WINDOW)
+            dirty = [chart_rect]
+
+            hud.set("title", f"MODE A  |  {SYMBOL}  |  {shown_interval:g}s candles  |  time left: {t_left:0.1f}s")
+            hud.set("mid", f"mid: {last['mid']:0.4f}")
+            hud.set("bid", f"bid: {last['bid']:0.4f}")
+            hud.set("ask", f"ask: {last['ask']:0.4f}")
+            hud.set("inv", f"inv: {int(last['inv'])}")
+            hud.set("cash", f"cash: {last['cash']:0.2f}")
+            hud.set("pnl", f"pnl:  {last['pnl']:0.2f}")
+            hud.set("score", f"score:{score:0.2f}")
+            hud.set("headline", reader.headline(int(last["headline_seq"])))  # ONLY headline
+            with metrics.timer("ui.hud"):
+                dirty.extend(hud.draw(screen))
+            dirty.extend(overlay.draw(screen, frame_start))
+
+            pygame.display.update(dirty)
+            if metrics.REG.enabled:
+                metrics.hist("ui.frame").observe(time.perf_counter() - frame_start)
+
+            if last["done"]:
+                break
+            clock.tick(60)
+    finally:
+        if sim is not None:
+            sim.stop()
+
+    # round over (the simulation flattened and published the final snapshot)
+    final_pnl = float(last["pnl"])
+    risk_cost = float(last["risk"])
     final_score = final_pnl - risk_cost
 
     print("\n=== ROUND OVER ===")
@@ -317,4 +315,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) == 3 and sys.argv[1] == "--spectate":
+        main(spectate_name=sys.argv[2])
+    elif len(sys.argv) == 3 and sys.argv[1] == "--theme":
+        main(theme=sys.argv[2])
+    else:
+        main()